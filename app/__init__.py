@@ -2,8 +2,9 @@ import os
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from .database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app(test_config: dict | None = None):
@@ -11,63 +12,106 @@ def create_app(test_config: dict | None = None):
 	app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///inventory.db')
 	app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 	app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key')
+	app.config['REPORT_CACHE_TTL'] = int(os.environ.get('REPORT_CACHE_TTL', 30))
+	app.config['REPORT_CACHE_MAXSIZE'] = int(os.environ.get('REPORT_CACHE_MAXSIZE', 128))
+	app.config['REPORT_CACHE_URL'] = os.environ.get('REPORT_CACHE_URL')
+	app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+	app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+	app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+	app.config['DATABASE_REPLICA_URL'] = os.environ.get('DATABASE_REPLICA_URL')
+	app.config['REPLICA_COPY_INTERVAL'] = int(os.environ.get('REPLICA_COPY_INTERVAL', 0))
+	app.config['REPLICA_READ_YOUR_WRITES'] = int(os.environ.get('REPLICA_READ_YOUR_WRITES', 30))
+	app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+	app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))
+	app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))
+	app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+	app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 500))
+	app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+	app.config['JOBS_ENABLED'] = os.environ.get('JOBS_ENABLED', '1') != '0'
+	app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+	app.config['JOB_TIMEOUT'] = int(os.environ.get('JOB_TIMEOUT', 600))
+	app.config['REPORT_SNAPSHOT_INTERVAL'] = int(os.environ.get('REPORT_SNAPSHOT_INTERVAL', 300))
+	app.config['REPORT_SNAPSHOT_ON_CHANGE'] = os.environ.get('REPORT_SNAPSHOT_ON_CHANGE', '1') != '0'
+	app.config['LOW_STOCK_THRESHOLD'] = int(os.environ.get('LOW_STOCK_THRESHOLD', 10))
+	app.config['EVENTS_BUFFER'] = int(os.environ.get('EVENTS_BUFFER', 256))
+	app.config['EVENTS_KEEPALIVE'] = int(os.environ.get('EVENTS_KEEPALIVE', 15))
+	app.config['EVENTS_STREAM_SECONDS'] = int(os.environ.get('EVENTS_STREAM_SECONDS', 300))
+	app.config['EVENTS_MAX_STREAMS'] = int(os.environ.get('EVENTS_MAX_STREAMS', 4))
 	if test_config:
 		app.config.update(test_config)
 
+	from .database import REPLICA_BIND, engine_options, replica_url, init_engine
+	app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+	replica = replica_url(app.config)
+	if replica:
+		app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(REPLICA_BIND, replica)
 	db.init_app(app)
+	init_engine(app, db)
 	migrate.init_app(app, db)
 
+	from .replica import read_replica
+	read_replica.init_app(app)
+
+	from .cache import report_cache
+	report_cache.init_app(app)
+
+	from .metrics import request_metrics
+	request_metrics.init_app(app, db)
+
+	from .jobs import job_queue
+	job_queue.init_app(app)
+
+	from .events import live_events
+	live_events.init_app(app)
+
 	from . import models  # noqa: F401 ensure models are registered
 
 	from .routes.products import bp as products_bp
 	from .routes.locations import bp as locations_bp
 	from .routes.movements import bp as movements_bp
 	from .routes.reports import bp as reports_bp
+	from .routes.api import bp as api_bp
+	from .routes.events import bp as events_bp
 	app.register_blueprint(products_bp)
 	app.register_blueprint(locations_bp)
 	app.register_blueprint(movements_bp)
 	app.register_blueprint(reports_bp)
+	app.register_blueprint(api_bp)
+	app.register_blueprint(events_bp)
+
+	from .cli import register_commands
+	register_commands(app)
 
 	@app.route('/')
 	def index():
-		from .models import Product, Location, ProductMovement
-		
-		# Get actual counts from database
-		total_products = Product.query.count()
-		total_locations = Location.query.count()
-		total_movements = ProductMovement.query.count()
+		from .models import Product, Location, ProductMovement, InventoryCounter
 		
-		# Calculate active inventory (non-zero balances) with error handling
-		try:
-			balance_data = ProductMovement.balance_query()
-			active_inventory = len([item for item in balance_data if item.get('qty', 0) > 0])
-		except Exception:
-			active_inventory = 0
+		# Maintained counters instead of COUNT(*) over each table
+		counts = InventoryCounter.counts()
 		
 		# Get recent movements for activity feed
 		recent_movements = ProductMovement.query.order_by(ProductMovement.timestamp.desc()).limit(5).all()
 		
 		# Format recent movements with product and location names
+		product_names = Product.name_map(m.product_id for m in recent_movements)
+		location_names = Location.name_map(
+			[m.from_location_id for m in recent_movements] + [m.to_location_id for m in recent_movements])
 		formatted_movements = []
 		for movement in recent_movements:
-			product = Product.query.get(movement.product_id)
-			from_location = Location.query.get(movement.from_location_id) if movement.from_location_id else None
-			to_location = Location.query.get(movement.to_location_id) if movement.to_location_id else None
-			
 			formatted_movements.append({
 				'id': movement.id,
-				'product_name': product.name if product else movement.product_id,
-				'from_location_name': from_location.name if from_location else 'Stock Addition',
-				'to_location_name': to_location.name if to_location else 'Stock Removal',
+				'product_name': product_names.get(movement.product_id, movement.product_id),
+				'from_location_name': location_names.get(movement.from_location_id, 'Stock Addition'),
+				'to_location_name': location_names.get(movement.to_location_id, 'Stock Removal'),
 				'quantity': movement.qty,
 				'timestamp': movement.timestamp
 			})
 		
 		return render_template('index.html', 
-							 total_products=total_products,
-							 total_locations=total_locations, 
-							 total_movements=total_movements,
-							 active_inventory=active_inventory,
+							 total_products=counts['products'],
+							 total_locations=counts['locations'], 
+							 total_movements=counts['movements'],
+							 active_inventory=counts['active_balances'],
 							 recent_movements=formatted_movements)
 
 	return app
@@ -0,0 +1,121 @@
+"""Columnar balance analytics for the reports.
+
+Balances are loaded once into parallel columns (product code, location code,
+qty) with one low-stock threshold per product, and every chart aggregate is
+computed from them in one pass: totals per product and location, the
+stock-status buckets and the top-N products. NumPy is used when it is
+installed; otherwise the same pass runs over compact array('q') columns in
+pure Python.
+
+A balance is Out of Stock at qty <= 0, Low Stock up to its product's
+low_stock_threshold (LOW_STOCK_THRESHOLD by default) and Well Stocked above.
+"""
+import heapq
+from array import array
+
+try:
+	import numpy
+except ImportError:  # optional dependency
+	numpy = None
+
+STATUS_LABELS = ['Well Stocked', 'Low Stock', 'Out of Stock']
+TOP_N = 10
+
+
+class BalanceFrame:
+	"""Balance rows stored as columns. Products and locations are coded by
+	label in first-seen order; rows without a location name get code -1.
+	thresholds holds one low-stock threshold per product code."""
+
+	def __init__(self):
+		self.product_labels = []
+		self.location_labels = []
+		self.product_codes = array('q')
+		self.location_codes = array('q')
+		self.qty = array('q')
+		self.thresholds = array('q')
+
+	def __len__(self):
+		return len(self.qty)
+
+	@classmethod
+	def from_rows(cls, rows, thresholds=None, default_threshold=10):
+		"""Build a frame from (product_id, product_label, location_label, qty)
+		tuples; location_label is None for unknown locations. thresholds maps
+		product ids to their low-stock threshold."""
+		frame = cls()
+		rows = rows if isinstance(rows, list) else list(rows)
+		product_labels = [r[1] for r in rows]
+		location_labels = [r[2] for r in rows]
+		product_index = {label: code for code, label in enumerate(dict.fromkeys(product_labels))}
+		location_index = {label: code for code, label in enumerate(
+			label for label in dict.fromkeys(location_labels) if label is not None)}
+		frame.product_labels = list(product_index)
+		frame.location_labels = list(location_index)
+		location_index[None] = -1
+		frame.product_codes = array('q', [product_index[label] for label in product_labels])
+		frame.location_codes = array('q', [location_index[label] for label in location_labels])
+		frame.qty = array('q', [r[3] for r in rows])
+		# One threshold per product code; labels and product ids correspond one to one
+		if thresholds:
+			ids = {r[1]: r[0] for r in rows}
+			frame.thresholds = array('q', [thresholds.get(ids[label], default_threshold) for label in frame.product_labels])
+		else:
+			frame.thresholds = array('q', [default_threshold]) * len(frame.product_labels)
+		return frame
+
+	@classmethod
+	def from_dicts(cls, rows, thresholds=None, default_threshold=10):
+		"""Build a frame from balance dicts (product, product_id, location, qty)."""
+		return cls.from_rows(
+			((r['product_id'], r['product'], None if r['location'] == 'N/A' else r['location'], r['qty']) for r in rows),
+			thresholds, default_threshold)
+
+	def summarize(self, top_n=TOP_N):
+		"""Return product/location totals, status counts and the top products."""
+		if numpy is not None and len(self):
+			product_totals, location_totals, status = self._summarize_numpy()
+		else:
+			product_totals, location_totals, status = self._summarize_python()
+		top = heapq.nlargest(top_n, range(len(product_totals)), key=product_totals.__getitem__)
+		return {
+			'product_labels': self.product_labels,
+			'product_data': product_totals,
+			'location_labels': self.location_labels,
+			'location_data': location_totals,
+			'stock_status_labels': STATUS_LABELS,
+			'stock_status_data': status,
+			'top_product_labels': [self.product_labels[i] for i in top],
+			'top_product_data': [product_totals[i] for i in top],
+		}
+
+	def _summarize_numpy(self):
+		products = numpy.frombuffer(self.product_codes, dtype=numpy.int64)
+		locations = numpy.frombuffer(self.location_codes, dtype=numpy.int64)
+		qty = numpy.frombuffer(self.qty, dtype=numpy.int64)
+		thresholds = numpy.frombuffer(self.thresholds, dtype=numpy.int64)
+		# bincount sums in float64, exact for totals below 2**53
+		product_totals = numpy.bincount(products, weights=qty, minlength=len(self.product_labels)).astype(numpy.int64)
+		known = locations >= 0
+		location_totals = numpy.bincount(
+			locations[known], weights=qty[known], minlength=len(self.location_labels)).astype(numpy.int64)
+		out = int(numpy.count_nonzero(qty <= 0))
+		well = int(numpy.count_nonzero(qty > thresholds[products]))
+		return product_totals.tolist(), location_totals.tolist(), [well, len(qty) - well - out, out]
+
+	def _summarize_python(self):
+		product_totals = [0] * len(self.product_labels)
+		location_totals = [0] * len(self.location_labels)
+		thresholds = self.thresholds
+		well = low = out = 0
+		for product, location, qty in zip(self.product_codes, self.location_codes, self.qty):
+			product_totals[product] += qty
+			if location >= 0:
+				location_totals[location] += qty
+			if qty <= 0:
+				out += 1
+			elif qty > thresholds[product]:
+				well += 1
+			else:
+				low += 1
+		return product_totals, location_totals, [well, low, out]
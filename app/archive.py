@@ -0,0 +1,169 @@
+"""Ledger archival: move old movements out of product_movements.
+
+Movements before a cutoff are written to a gzip-compressed JSON-lines file
+(the import format plus the original id) and replaced by one opening-balance
+movement per product/location, stamped just before the cutoff. The work runs
+in one transaction and is verified before commit:
+
+* the archived rows net out to exactly the opening balances, and
+* the remaining ledger reproduces stock_balances as it was before.
+
+stock_balances and daily_movement_stats are left as they are: current stock
+does not change, and the rollup keeps trend history for the archived days.
+Checkpoints before the cutoff are dropped and the run is recorded in
+ledger_archives, so point-in-time reports refuse dates before the cutoff.
+Opening movements are inserted before the archived rows are deleted, so their
+ids are never ones the archive file already holds.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+from . import db
+from .database import write_connection
+from .models import (ProductMovement, StockBalance, StockCheckpoint, StockCheckpointBalance, InventoryCounter,
+					 LedgerArchive)
+
+# Opening movements sit this far before the cutoff
+OPENING_OFFSET = timedelta(microseconds=1)
+
+
+class ArchiveVerificationError(RuntimeError):
+	pass
+
+
+def write_archive(path, cutoff, yield_per=5000):
+	"""Stream movements before cutoff to path; return (row count, highest id, net qty per product/location)."""
+	net = {}
+	count = 0
+	last_id = 0
+	query = (db.session.query(ProductMovement.__table__)
+		.filter(ProductMovement.timestamp < cutoff)
+		.order_by(ProductMovement.timestamp, ProductMovement.id)
+		.yield_per(yield_per))
+	with gzip.open(path, 'wt', encoding='utf-8') as stream:
+		for m in query:
+			stream.write(json.dumps({
+				'id': m.id,
+				'timestamp': m.timestamp.isoformat(),
+				'product_id': m.product_id,
+				'from_location_id': m.from_location_id,
+				'to_location_id': m.to_location_id,
+				'qty': m.qty,
+			}) + '\n')
+			count += 1
+			last_id = max(last_id, m.id)
+			_add_net(net, m.product_id, m.from_location_id, m.to_location_id, m.qty)
+	return count, last_id, net
+
+
+def read_archive_net(path):
+	"""Re-read an archive file and return (row count, net qty per product/location)."""
+	net = {}
+	count = 0
+	with gzip.open(path, 'rt', encoding='utf-8') as stream:
+		for line in stream:
+			m = json.loads(line)
+			count += 1
+			_add_net(net, m['product_id'], m['from_location_id'], m['to_location_id'], m['qty'])
+	return count, net
+
+
+def _add_net(net, product_id, from_location_id, to_location_id, qty):
+	if from_location_id:
+		net[(product_id, from_location_id)] = net.get((product_id, from_location_id), 0) - qty
+	if to_location_id:
+		net[(product_id, to_location_id)] = net.get((product_id, to_location_id), 0) + qty
+
+
+def opening_movements(net, timestamp):
+	"""One receipt (or removal, for a negative legacy balance) per non-zero pair."""
+	return [
+		{
+			'timestamp': timestamp,
+			'product_id': product_id,
+			'from_location_id': None if qty > 0 else location_id,
+			'to_location_id': location_id if qty > 0 else None,
+			'qty': abs(qty),
+		}
+		for (product_id, location_id), qty in sorted(net.items())
+		if qty != 0
+	]
+
+
+def is_opening_movement(movement):
+	"""True for an opening-balance movement written by an archive run. These
+	stand in for archived rows that the trend rollup still counts, so they
+	cannot be deleted on their own."""
+	return db.session.query(LedgerArchive.query.filter(
+		LedgerArchive.cutoff == movement.timestamp + OPENING_OFFSET).exists()).scalar()
+
+
+def stored_balances():
+	return {(r.product_id, r.location_id): r.qty for r in db.session.query(
+		StockBalance.product_id, StockBalance.location_id, StockBalance.qty).filter(StockBalance.qty != 0)}
+
+
+def ledger_balances():
+	return {(r['product_id'], r['location_id']): r['qty']
+			for r in ProductMovement.ledger_balance_query() if r['qty'] != 0}
+
+
+def archive_movements(cutoff, path):
+	"""Archive movements before cutoff into path and replace them with opening
+	balances. Returns a summary dict; raises ArchiveVerificationError (after
+	rolling back and removing the file) if the checks fail. Commits on success.
+	"""
+	if os.path.exists(path):
+		raise FileExistsError(f'{path} already exists')
+	table = ProductMovement.__table__
+	opening_time = cutoff - OPENING_OFFSET
+	if not db.session.query(ProductMovement.query.filter(ProductMovement.timestamp < opening_time).exists()).scalar():
+		# Nothing older than the openings of a previous run with this cutoff
+		return {'archived': 0, 'openings': 0, 'path': None}
+	try:
+		before = stored_balances()
+		archived, last_id, net = write_archive(path, cutoff)
+		if not archived:
+			os.remove(path)
+			return {'archived': 0, 'openings': 0, 'path': None}
+
+		openings = opening_movements(net, opening_time)
+		# Core statements, so the ORM events do not re-apply these to the balances.
+		# Openings go in first: SQLite hands out max(id) + 1, which would reuse
+		# archived ids once they were deleted. Rows written after the archive was
+		# read (and the openings) have ids above last_id and stay in the ledger.
+		if openings:
+			db.session.execute(table.insert(), openings)
+		deleted = db.session.execute(table.delete().where(table.c.timestamp < cutoff, table.c.id <= last_id)).rowcount
+		InventoryCounter.bump(write_connection(db.session), movements=len(openings) - deleted)
+		stale = [c for (c,) in db.session.query(StockCheckpoint.id).filter(StockCheckpoint.cutoff < cutoff)]
+		if stale:
+			StockCheckpointBalance.query.filter(StockCheckpointBalance.checkpoint_id.in_(stale)).delete(synchronize_session=False)
+			StockCheckpoint.query.filter(StockCheckpoint.id.in_(stale)).delete(synchronize_session=False)
+		db.session.add(LedgerArchive(cutoff=cutoff, path=path, archived=archived, openings=len(openings)))
+
+		verify(path, archived, net, before)
+		db.session.commit()
+	except BaseException:
+		db.session.rollback()
+		if os.path.exists(path):
+			os.remove(path)
+		raise
+	return {'archived': archived, 'openings': len(openings), 'path': path}
+
+
+def verify(path, archived, net, before):
+	"""Check the archive file and the rewritten ledger inside the open transaction."""
+	count, file_net = read_archive_net(path)
+	if count != archived:
+		raise ArchiveVerificationError(f'Archive holds {count} rows, expected {archived}')
+	expected = {key: qty for key, qty in net.items() if qty != 0}
+	if {key: qty for key, qty in file_net.items() if qty != 0} != expected:
+		raise ArchiveVerificationError('Archived rows do not net out to the opening balances')
+	remaining = ledger_balances()
+	if remaining != before:
+		differing = len(set(remaining.items()) ^ set(before.items()))
+		raise ArchiveVerificationError(f'{differing} balances differ after archiving')
+	if stored_balances() != before:
+		raise ArchiveVerificationError('stock_balances changed while archiving; run the archive again')
@@ -0,0 +1,140 @@
+"""Cache for report and chart payloads.
+
+Payloads are kept in an in-process LRU by default, or in Redis when
+REPORT_CACHE_URL is set so several workers share one copy. Entries expire
+after REPORT_CACHE_TTL seconds and the whole cache is invalidated whenever a
+commit changes products, locations or movements.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class LRUCache:
+	"""Thread-safe in-process LRU with a per-entry TTL."""
+
+	def __init__(self, maxsize=128, ttl=30):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			entry = self._data.get(key)
+			if entry is None:
+				return None
+			expires, value = entry
+			if expires < time.monotonic():
+				del self._data[key]
+				return None
+			self._data.move_to_end(key)
+			return value
+
+	def set(self, key, value):
+		with self._lock:
+			self._data[key] = (time.monotonic() + self.ttl, value)
+			self._data.move_to_end(key)
+			while len(self._data) > self.maxsize:
+				self._data.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+
+
+class RedisCache:
+	"""Shared cache in Redis. Values must be JSON-serializable.
+	Invalidation bumps a generation counter that is part of every key, so
+	stale entries are simply never read again and expire on their own.
+	"""
+
+	def __init__(self, url, ttl=30, prefix='inventory:reports:'):
+		try:
+			import redis
+		except ImportError as exc:
+			raise RuntimeError('REPORT_CACHE_URL is set but the redis package is not installed') from exc
+		self.client = redis.Redis.from_url(url)
+		self.ttl = ttl
+		self.prefix = prefix
+
+	def _key(self, key):
+		generation = int(self.client.get(self.prefix + 'generation') or 0)
+		return f'{self.prefix}{generation}:{key}'
+
+	def get(self, key):
+		raw = self.client.get(self._key(key))
+		return json.loads(raw) if raw is not None else None
+
+	def set(self, key, value):
+		self.client.setex(self._key(key), self.ttl, json.dumps(value))
+
+	def clear(self):
+		self.client.incr(self.prefix + 'generation')
+
+
+class ReportCache:
+	"""Flask extension wrapping the configured cache backend."""
+
+	def init_app(self, app):
+		ttl = app.config['REPORT_CACHE_TTL']
+		if app.config.get('REPORT_CACHE_URL'):
+			backend = RedisCache(app.config['REPORT_CACHE_URL'], ttl=ttl)
+		else:
+			backend = LRUCache(maxsize=app.config['REPORT_CACHE_MAXSIZE'], ttl=ttl)
+		app.extensions['report_cache'] = backend
+
+	@property
+	def backend(self):
+		return current_app.extensions['report_cache']
+
+	def get_or_set(self, key, factory):
+		"""Return the cached value for key, computing and storing it on a miss."""
+		if current_app.config['REPORT_CACHE_TTL'] <= 0:
+			return factory()
+		value = self.backend.get(key)
+		if value is None:
+			value = factory()
+			self.backend.set(key, value)
+		return value
+
+	def invalidate(self):
+		self.backend.clear()
+
+
+report_cache = ReportCache()
+
+# Models whose changes make cached report payloads stale
+_TRACKED_TABLES = {'products', 'locations', 'product_movements', 'stock_balances'}
+
+
+def mark_inventory_changed(session):
+	"""Flag a session whose core statements changed inventory. They skip the
+	flush hooks that invalidate the report cache, queue a snapshot refresh and
+	tell live screens, so its commit does all three."""
+	session.info['inventory_changed'] = True
+	session.info['snapshots_stale'] = True
+	session.info['live_refresh'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_inventory_changes(session, flush_context):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if getattr(obj, '__tablename__', None) in _TRACKED_TABLES:
+			session.info['inventory_changed'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+	if session.info.pop('inventory_changed', False) and has_app_context() and 'report_cache' in current_app.extensions:
+		report_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+	session.info.pop('inventory_changed', None)
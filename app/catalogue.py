@@ -0,0 +1,112 @@
+"""Set-based deletion and deactivation of products and locations.
+
+Deleting runs as a handful of bulk statements in the caller's transaction
+instead of loading each movement through the ORM:
+
+* a product takes its whole ledger with it: movements, stock_balances,
+  daily_movement_stats, checkpoint rows, reorder points and alerts;
+* a location is detached from the ledger: movements that only involve it are
+  deleted, and transfers to or from other locations keep their other side
+  (so a transfer L -> M becomes a receipt at M, and M's stock is unchanged).
+  Its balances, rollup rows, checkpoint rows, reorder points and alerts are
+  deleted.
+
+The dashboard counters are adjusted to match, and report caches and
+snapshots are refreshed on commit.
+
+Deactivating only sets the active flag: the product or location disappears
+from lists and pickers but its ledger, balances and reports are untouched.
+"""
+from datetime import date
+from sqlalchemy import func, select
+from . import db
+from .cache import mark_inventory_changed
+from .database import write_connection
+from .models import (Product, Location, ProductMovement, StockBalance, DailyMovementStat,
+					 StockCheckpointBalance, InventoryCounter, ReorderThreshold, StockAlert)
+
+MAX_IDS = 1000
+ACTIONS = ('delete', 'deactivate', 'activate')
+
+
+def delete_products(ids):
+	"""Delete products and their ledger. Returns a summary dict; the caller commits."""
+	ids = sorted(set(ids))
+	movements = ProductMovement.__table__
+	balances = StockBalance.__table__
+	connection = write_connection(db.session)
+	active = connection.execute(select(func.count()).select_from(balances).where(
+		balances.c.product_id.in_(ids), balances.c.qty > 0)).scalar()
+	deleted = connection.execute(movements.delete().where(movements.c.product_id.in_(ids))).rowcount
+	connection.execute(balances.delete().where(balances.c.product_id.in_(ids)))
+	_delete_where(connection, DailyMovementStat, 'product_id', ids)
+	_delete_where(connection, StockCheckpointBalance, 'product_id', ids)
+	_delete_where(connection, ReorderThreshold, 'product_id', ids)
+	_delete_where(connection, StockAlert, 'product_id', ids)
+	products = _delete_where(connection, Product, 'id', ids)
+	InventoryCounter.bump(connection, products=-products, movements=-deleted, active_balances=-active)
+	mark_inventory_changed(db.session)
+	return {'deleted': products, 'movements_deleted': deleted}
+
+
+def delete_locations(ids):
+	"""Delete locations, detaching transfers from them. Returns a summary dict; the caller commits."""
+	ids = sorted(set(ids))
+	movements = ProductMovement.__table__
+	balances = StockBalance.__table__
+	from_gone = movements.c.from_location_id.is_(None) | movements.c.from_location_id.in_(ids)
+	to_gone = movements.c.to_location_id.is_(None) | movements.c.to_location_id.in_(ids)
+	connection = write_connection(db.session)
+	active = connection.execute(select(func.count()).select_from(balances).where(
+		balances.c.location_id.in_(ids), balances.c.qty > 0)).scalar()
+	deleted = connection.execute(movements.delete().where(from_gone & to_gone)).rowcount
+
+	# Transfers into a deleted location become removals from their source, which
+	# the rollup counts on the source row instead of the destination row
+	removals = connection.execute(select(
+		func.date(movements.c.timestamp), movements.c.product_id, movements.c.from_location_id,
+		func.count(), func.sum(movements.c.qty))
+		.where(movements.c.to_location_id.in_(ids))
+		.group_by(func.date(movements.c.timestamp), movements.c.product_id, movements.c.from_location_id))
+	DailyMovementStat.apply_totals(connection, {
+		(_as_date(day), product_id, location_id): [0, 0, count, qty]
+		for day, product_id, location_id, count, qty in removals})
+	detached = connection.execute(movements.update().where(movements.c.from_location_id.in_(ids))
+								  .values(from_location_id=None)).rowcount
+	detached += connection.execute(movements.update().where(movements.c.to_location_id.in_(ids))
+								   .values(to_location_id=None)).rowcount
+
+	connection.execute(balances.delete().where(balances.c.location_id.in_(ids)))
+	_delete_where(connection, DailyMovementStat, 'location_id', ids)
+	_delete_where(connection, StockCheckpointBalance, 'location_id', ids)
+	_delete_where(connection, ReorderThreshold, 'location_id', ids)
+	_delete_where(connection, StockAlert, 'location_id', ids)
+	locations = _delete_where(connection, Location, 'id', ids)
+	InventoryCounter.bump(connection, locations=-locations, movements=-deleted, active_balances=-active)
+	mark_inventory_changed(db.session)
+	return {'deleted': locations, 'movements_deleted': deleted, 'movements_detached': detached}
+
+
+def set_active(model, ids, active):
+	"""Activate or deactivate products or locations. Returns the number changed; the caller commits."""
+	table = model.__table__
+	return db.session.execute(table.update().where(table.c.id.in_(sorted(set(ids))), table.c.active != active)
+							  .values(active=active)).rowcount
+
+
+def apply_action(model, action, ids):
+	"""Run a bulk action ('delete', 'deactivate' or 'activate') on product or
+	location ids and return a summary dict; the caller commits."""
+	if action == 'delete':
+		return (delete_products if model is Product else delete_locations)(ids)
+	return {'changed': set_active(model, ids, action == 'activate')}
+
+
+def _delete_where(connection, model, column, ids):
+	table = model.__table__
+	return connection.execute(table.delete().where(table.c[column].in_(ids))).rowcount
+
+
+def _as_date(day):
+	# func.date() comes back as text on SQLite
+	return day if isinstance(day, date) else date.fromisoformat(day)
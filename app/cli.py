@@ -0,0 +1,245 @@
+import click
+from flask.cli import AppGroup
+from . import db
+
+balances_cli = AppGroup('balances', help='Maintain the stock_balances table.')
+movements_cli = AppGroup('movements', help='Bulk movement import and export.')
+rollups_cli = AppGroup('rollups', help='Maintain the daily_movement_stats rollup.')
+checkpoints_cli = AppGroup('checkpoints', help='Point-in-time stock checkpoints.')
+counters_cli = AppGroup('counters', help='Maintained dashboard counters.')
+search_cli = AppGroup('search', help='Catalogue search indexes.')
+alerts_cli = AppGroup('alerts', help='Reorder points and open stock alerts.')
+replica_cli = AppGroup('replica', help='Read replica for reports and listings.')
+
+
+@balances_cli.command('rebuild')
+def rebuild_balances():
+	"""Recompute stock_balances from the movement ledger."""
+	from .models import StockBalance, InventoryCounter, StockAlert
+	from .cache import report_cache
+	count = StockBalance.rebuild()
+	InventoryCounter.reconcile()
+	StockAlert.rebuild()
+	db.session.commit()
+	report_cache.invalidate()
+	click.echo(f'Rebuilt {count} balance rows from the ledger.')
+
+
+@balances_cli.command('verify')
+def verify_balances():
+	"""Check stock_balances against the movement ledger."""
+	from .models import StockBalance
+	mismatches = StockBalance.verify()
+	if not mismatches:
+		click.echo('Balances match the ledger.')
+		return
+	for product_id, location_id, stored, ledger in mismatches:
+		click.echo(f'{product_id} @ {location_id}: stored={stored} ledger={ledger}')
+	raise click.ClickException(f'{len(mismatches)} balance rows differ from the ledger. Run "flask balances rebuild".')
+
+
+@balances_cli.command('export')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='Defaults to stdout.')
+@click.option('--product', 'product_id', help='Only this product id.')
+@click.option('--location', 'location_id', help='Only this location id.')
+def export_balances(output, product_id, location_id):
+	"""Stream current balances as CSV."""
+	from .export import BALANCE_HEADER, balance_rows, csv_lines
+	for line in csv_lines(BALANCE_HEADER, balance_rows(product_id, location_id)):
+		output.write(line)
+
+
+@movements_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT transaction.')
+def import_movements_command(path, fmt, batch_size):
+	"""Import movements from a CSV or JSON-lines file."""
+	from .importer import import_movements, detect_format
+	with open(path, encoding='utf-8-sig', newline='') as stream:
+		result = import_movements(stream, fmt or detect_format(path), batch_size=batch_size)
+	for error in result['errors']:
+		click.echo(f'line {error["line"]}: {error["error"]}', err=True)
+	click.echo(f'Imported {result["imported"]} of {result["rows"]} rows '
+			   f'({result["error_count"]} errors) in {result["seconds"]}s, {result["rows_per_second"]} rows/s.')
+
+
+@movements_cli.command('export')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='Defaults to stdout.')
+@click.option('--product', 'product_id', help='Only this product id.')
+@click.option('--location', 'location_id', help='Movements from or to this location id.')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day to include.')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day to include.')
+def export_movements(output, product_id, location_id, start, end):
+	"""Stream the movement ledger as CSV, oldest first."""
+	from datetime import timedelta
+	from .export import MOVEMENT_HEADER, movement_rows, csv_lines
+	end = end + timedelta(days=1) if end else None
+	for line in csv_lines(MOVEMENT_HEADER, movement_rows(product_id, location_id, start, end)):
+		output.write(line)
+
+
+@movements_cli.command('archive')
+@click.option('--before', 'cutoff', required=True, type=click.DateTime(['%Y-%m-%d']),
+			  help='Archive movements before this day (midnight UTC).')
+@click.option('--output', '-o', type=click.Path(dir_okay=False),
+			  help='Archive file. Defaults to movements-before-<day>.jsonl.gz.')
+@click.option('--vacuum', is_flag=True, help='VACUUM the SQLite database afterwards to reclaim space.')
+def archive_movements_command(cutoff, output, vacuum):
+	"""Move old movements to a compressed archive, keeping opening balances."""
+	from .archive import archive_movements, ArchiveVerificationError
+	from .cache import report_cache
+	path = output or f'movements-before-{cutoff:%Y-%m-%d}.jsonl.gz'
+	try:
+		result = archive_movements(cutoff, path)
+	except (ArchiveVerificationError, FileExistsError) as exc:
+		raise click.ClickException(str(exc))
+	if not result['archived']:
+		click.echo('No movements before the cutoff.')
+		return
+	report_cache.invalidate()
+	click.echo(f'Archived {result["archived"]} movements to {result["path"]}, '
+			   f'replaced by {result["openings"]} opening balances. Balances verified.')
+	if vacuum and db.engine.dialect.name == 'sqlite':
+		with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+			connection.exec_driver_sql('VACUUM')
+		click.echo('Vacuumed the database.')
+
+
+@rollups_cli.command('backfill')
+def backfill_rollups():
+	"""Rebuild daily_movement_stats from the full movement ledger.
+
+	After 'movements archive' this replaces trend history before the cutoff
+	with the opening balances, so only run it if the rollup is damaged.
+	"""
+	from .cache import report_cache
+	from .models import DailyMovementStat
+	count = DailyMovementStat.rebuild()
+	db.session.commit()
+	report_cache.invalidate()
+	click.echo(f'Wrote {count} daily rollup rows from the ledger.')
+
+
+def _period_starts(first, last, period):
+	"""Yield day or month boundaries (midnight UTC) in (first, last]."""
+	from datetime import datetime, timedelta
+	current = datetime(first.year, first.month, first.day)
+	while True:
+		if period == 'monthly':
+			current = datetime(current.year + current.month // 12, current.month % 12 + 1, 1)
+		else:
+			current = current + timedelta(days=1)
+		if current > last:
+			return
+		yield current
+
+
+@checkpoints_cli.command('create')
+@click.option('--cutoff', type=click.DateTime(['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']),
+			  help='Instant to checkpoint (movements before it). Defaults to today 00:00 UTC.')
+def create_checkpoint(cutoff):
+	"""Store a balance checkpoint, e.g. nightly from cron."""
+	from datetime import datetime
+	from .models import StockCheckpoint, StockCheckpointBalance
+	if cutoff is None:
+		cutoff = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+	checkpoint = StockCheckpoint.create(cutoff)
+	db.session.commit()
+	rows = StockCheckpointBalance.query.filter_by(checkpoint_id=checkpoint.id).count()
+	click.echo(f'Checkpoint {checkpoint.id} at {cutoff} with {rows} balance rows.')
+
+
+@checkpoints_cli.command('backfill')
+@click.option('--period', type=click.Choice(['daily', 'monthly']), default='monthly', show_default=True)
+def backfill_checkpoints(period):
+	"""Create checkpoints at every period boundary across the ledger history."""
+	from datetime import datetime
+	from sqlalchemy import func
+	from .models import ProductMovement, StockCheckpoint
+	first = db.session.query(func.min(ProductMovement.timestamp)).scalar()
+	if first is None:
+		click.echo('No movements recorded.')
+		return
+	count = 0
+	for cutoff in _period_starts(first, datetime.utcnow(), period):
+		StockCheckpoint.create(cutoff)
+		db.session.commit()
+		count += 1
+	click.echo(f'Created {count} {period} checkpoints.')
+
+
+@checkpoints_cli.command('list')
+def list_checkpoints():
+	"""Show stored checkpoints."""
+	from .models import StockCheckpoint
+	for checkpoint in StockCheckpoint.query.order_by(StockCheckpoint.cutoff):
+		click.echo(f'{checkpoint.id}\t{checkpoint.cutoff}\tcreated {checkpoint.created_at:%Y-%m-%d %H:%M}')
+
+
+@counters_cli.command('reconcile')
+def reconcile_counters():
+	"""Recompute the dashboard counters from the tables."""
+	from .models import InventoryCounter
+	differences = InventoryCounter.reconcile()
+	db.session.commit()
+	for name, stored, actual in differences:
+		click.echo(f'{name}: stored={stored} actual={actual}')
+	click.echo(f'Reconciled counters ({len(differences)} corrected).')
+
+
+@counters_cli.command('show')
+def show_counters():
+	"""Print the maintained counters."""
+	from .models import InventoryCounter
+	for name, value in sorted(InventoryCounter.counts().items()):
+		click.echo(f'{name}\t{value}')
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+	"""Create the product and location search indexes and refill them."""
+	from .search import rebuild
+	for table, installed in rebuild().items():
+		click.echo(f'{table}: ' + ('indexed' if installed else 'no FTS5 support, using LIKE search'))
+
+
+@alerts_cli.command('set')
+@click.argument('product_id')
+@click.argument('location_id')
+@click.argument('threshold', required=False, type=click.IntRange(min=0))
+def set_reorder_point(product_id, location_id, threshold):
+	"""Set a product's reorder point at a location; omit THRESHOLD to remove it."""
+	from .models import ReorderThreshold
+	ReorderThreshold.set_many({(product_id, location_id): threshold})
+	db.session.commit()
+	click.echo(f'{product_id} @ {location_id}: ' + (f'reorder at {threshold}' if threshold is not None else 'no reorder point'))
+
+
+@alerts_cli.command('rebuild')
+def rebuild_alerts():
+	"""Recompute the open alerts from the reorder points and balances."""
+	from .models import StockAlert
+	count = StockAlert.rebuild()
+	db.session.commit()
+	click.echo(f'{count} open alerts.')
+
+
+@replica_cli.command('refresh')
+def refresh_replica():
+	"""Copy the primary SQLite database into the replica file now."""
+	from .replica import refresh_copy
+	if not refresh_copy():
+		raise click.ClickException('DATABASE_REPLICA_URL is not a separate SQLite file.')
+	click.echo('Replica refreshed.')
+
+
+def register_commands(app):
+	app.cli.add_command(balances_cli)
+	app.cli.add_command(movements_cli)
+	app.cli.add_command(rollups_cli)
+	app.cli.add_command(checkpoints_cli)
+	app.cli.add_command(counters_cli)
+	app.cli.add_command(search_cli)
+	app.cli.add_command(alerts_cli)
+	app.cli.add_command(replica_cli)
@@ -0,0 +1,133 @@
+"""Engine configuration: connection pooling, SQLite pragmas and read routing.
+
+Values come from app config (and the environment through create_app):
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE for pooled servers, and
+SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE for SQLite, which
+is also switched to WAL with synchronous=NORMAL so readers never wait behind
+a writer.
+
+DATABASE_REPLICA_URL adds a read-only 'replica' bind; RoutingSession sends
+plain SELECTs there when a view asks for it (see app.replica).
+"""
+import os
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DisconnectionError
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+	"""Session that sends plain SELECTs to the replica bind while
+	info['read_replica'] is set and nothing has been written through it yet.
+	Flushes, DML, session.connection() and raw SQL always use the primary;
+	writers that run DML on a connection take it from write_connection()."""
+
+	def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+		if bind is None:
+			if self._flushing or getattr(clause, 'is_dml', False):
+				self.info['wrote_primary'] = True
+			elif (self.info.get('read_replica') and not self.info.get('wrote_primary')
+				  and getattr(clause, 'is_select', False) and REPLICA_BIND in self._db.engines):
+				return self._db.engines[REPLICA_BIND]
+		return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def write_connection(session):
+	"""The session's primary connection, for core DML run on it directly.
+	Such statements bypass get_bind, so this records the write itself."""
+	session.info['wrote_primary'] = True
+	return session.connection()
+
+
+def engine_options(config):
+	"""Build SQLALCHEMY_ENGINE_OPTIONS for the configured database URI."""
+	url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+	options = {
+		'pool_pre_ping': True,
+		'pool_recycle': config['DB_POOL_RECYCLE'],
+	}
+	in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+	if not in_memory:
+		options['pool_size'] = config['DB_POOL_SIZE']
+		options['max_overflow'] = config['DB_MAX_OVERFLOW']
+	return options
+
+
+def replica_url(config):
+	"""URL for the replica bind from DATABASE_REPLICA_URL, or None. 'readonly'
+	means the primary SQLite file; SQLite replicas are opened with mode=ro."""
+	value = config.get('DATABASE_REPLICA_URL')
+	if not value:
+		return None
+	url = make_url(config['SQLALCHEMY_DATABASE_URI'] if value == 'readonly' else value)
+	if url.get_backend_name() != 'sqlite':
+		if value == 'readonly':
+			raise ValueError("DATABASE_REPLICA_URL=readonly needs a SQLite DATABASE_URL")
+		return value
+	if url.database in (None, '', ':memory:'):
+		raise ValueError('A SQLite read replica needs a database file')
+	if url.query.get('uri'):
+		return url.update_query_dict({'mode': 'ro'}).render_as_string(hide_password=False)
+	return url.set(database=f'file:{url.database}').update_query_dict({'mode': 'ro', 'uri': 'true'}).render_as_string(
+		hide_password=False)
+
+
+def sqlite_file(engine):
+	"""Absolute path of a SQLite engine's database file, or None."""
+	if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+		return None
+	path = engine.url.database
+	return os.path.abspath(path[5:] if path.startswith('file:') else path)
+
+
+def sqlite_pragmas(config, readonly=False):
+	"""Return the PRAGMA statements to run on every new SQLite connection.
+	Read-only connections keep the file's journal mode and refuse writes."""
+	pragmas = ['PRAGMA query_only=ON'] if readonly else ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL']
+	return pragmas + [
+		f'PRAGMA busy_timeout={int(config["SQLITE_BUSY_TIMEOUT_MS"])}',
+		f'PRAGMA cache_size={int(config["SQLITE_CACHE_SIZE"])}',
+		f'PRAGMA mmap_size={int(config["SQLITE_MMAP_SIZE"])}',
+	]
+
+
+def init_engine(app, db):
+	"""Install the SQLite pragma hooks on the app's engines."""
+	with app.app_context():
+		for key, engine in db.engines.items():
+			if engine.dialect.name != 'sqlite':
+				continue
+			_install_pragmas(engine, sqlite_pragmas(app.config, readonly=key == REPLICA_BIND))
+			if key == REPLICA_BIND and sqlite_file(engine):
+				_reopen_when_replaced(engine, sqlite_file(engine))
+
+
+def _install_pragmas(engine, pragmas):
+	@event.listens_for(engine, 'connect')
+	def _set_sqlite_pragmas(dbapi_connection, connection_record):
+		cursor = dbapi_connection.cursor()
+		for pragma in pragmas:
+			cursor.execute(pragma)
+		cursor.close()
+
+
+def _reopen_when_replaced(engine, path):
+	# A refreshed replica copy replaces the file; pooled connections still read
+	# the old one, so drop them at checkout once the inode changes
+	@event.listens_for(engine, 'connect')
+	def _remember_inode(dbapi_connection, connection_record):
+		connection_record.info['inode'] = _inode(path)
+
+	@event.listens_for(engine, 'checkout')
+	def _check_inode(dbapi_connection, connection_record, connection_proxy):
+		if connection_record.info.get('inode') != _inode(path):
+			raise DisconnectionError('replica file replaced')
+
+
+def _inode(path):
+	try:
+		return os.stat(path).st_ino
+	except OSError:
+		return None
@@ -0,0 +1,249 @@
+"""Live inventory updates over Server-Sent Events.
+
+Every commit that records or deletes movements publishes one compact delta:
+the movements (with names), the balances they changed (new qty, change and
+report status before and after) and the dashboard counters. The delta is
+built once per commit from the rows the flush touched, in a few primary-key
+lookups, and serialized once. Bulk writers (imports, catalogue deletes)
+publish a 'refresh' event instead.
+
+Connected screens share one in-process ring buffer of serialized frames.
+Each /events stream waits on a condition and sends the frames after the last
+one it saw, so a commit costs the same however many screens are open and an
+idle stream runs no queries. Browsers reconnect with Last-Event-ID and resume.
+Event ids carry a token for the broker that issued them, so a stream resuming
+from another process (a restart or another gunicorn worker), or from an event
+that has left the buffer, is told to refresh rather than silently skipping
+the changes it missed.
+
+Each open stream holds a server thread, so at most EVENTS_MAX_STREAMS are
+served at once per process; further screens get a 503 and poll instead. Streams
+end after EVENTS_STREAM_SECONDS so threads are recycled. Events only reach
+streams served by the process that made the commit.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from .analytics import STATUS_LABELS
+from .models import Product, Location, ProductMovement, StockBalance, InventoryCounter
+
+
+class EventBroker:
+	"""Thread-safe ring buffer of SSE frames with blocking reads."""
+
+	def __init__(self, size=256, max_streams=4):
+		self._frames = deque(maxlen=size)  # (id, frame)
+		self._condition = threading.Condition()
+		self._last_id = 0
+		self.token = os.urandom(4).hex()  # tells this broker's event ids from another's
+		self.max_streams = max_streams
+		self.subscribers = 0
+
+	@property
+	def last_id(self):
+		return self._last_id
+
+	def publish(self, kind, data):
+		"""Serialize one event and wake every waiting stream. Returns its id."""
+		body = json.dumps(data, separators=(',', ':'), default=str)
+		with self._condition:
+			self._last_id += 1
+			self._frames.append((self._last_id, f'id: {self.token}-{self._last_id}\nevent: {kind}\ndata: {body}\n\n'))
+			self._condition.notify_all()
+			return self._last_id
+
+	def subscribe(self):
+		"""Claim a stream slot; False when max_streams streams are already open."""
+		with self._condition:
+			if self.subscribers >= self.max_streams:
+				return False
+			self.subscribers += 1
+			return True
+
+	def unsubscribe(self):
+		with self._condition:
+			self.subscribers -= 1
+
+	def frames_after(self, last_id, timeout):
+		"""Return (frames, new_last_id) for events after last_id, waiting up to
+		timeout seconds for one. frames is None if last_id has left the buffer."""
+		with self._condition:
+			if last_id >= self._last_id:
+				self._condition.wait(timeout)
+			if last_id >= self._last_id:
+				return [], last_id
+			if not self._frames or self._frames[0][0] > last_id + 1:
+				return None, self._last_id
+			return [frame for event_id, frame in self._frames if event_id > last_id], self._last_id
+
+	def resume_point(self, last_event_id):
+		"""Return (last_id, known) for a client's Last-Event-ID. known is False
+		when the id was issued by another broker or is ahead of this one."""
+		if not last_event_id:
+			return self._last_id, True
+		token, _, number = last_event_id.rpartition('-')
+		if token != self.token or not number.isdigit() or int(number) > self._last_id:
+			return self._last_id, False
+		return int(number), True
+
+	def stream(self, last_event_id=None, keepalive=15, duration=300):
+		"""Yield SSE text: a retry hint, then every event after last_event_id
+		(the current event when None) and a comment every keepalive seconds.
+		The caller holds a subscribe() slot for the life of the stream."""
+		with self._condition:
+			last_id, known = self.resume_point(last_event_id)
+		yield 'retry: 2000\n\n'
+		if not known:
+			yield self.refresh_frame(last_id)
+		deadline = time.monotonic() + duration
+		while time.monotonic() < deadline:
+			frames, last_id = self.frames_after(last_id, keepalive)
+			if frames is None:
+				yield self.refresh_frame(last_id)
+			elif frames:
+				yield ''.join(frames)
+			else:
+				yield ': keepalive\n\n'
+
+	def refresh_frame(self, last_id):
+		"""A 'refresh' event that resumes the client from last_id."""
+		return f'id: {self.token}-{last_id}\nevent: refresh\ndata: {{}}\n\n'
+
+
+class LiveEvents:
+	"""Flask extension owning the app's EventBroker."""
+
+	def init_app(self, app):
+		app.extensions['live_events'] = EventBroker(app.config['EVENTS_BUFFER'], app.config['EVENTS_MAX_STREAMS'])
+
+	@property
+	def broker(self):
+		return current_app.extensions['live_events']
+
+
+live_events = LiveEvents()
+
+
+def _listening():
+	return (has_app_context() and 'live_events' in current_app.extensions
+			and current_app.extensions['live_events'].subscribers > 0)
+
+
+def report_status(qty, threshold):
+	"""Index into STATUS_LABELS for a balance, or None when it is not on the report."""
+	if qty is None or qty == 0:
+		return None
+	if qty < 0:
+		return STATUS_LABELS.index('Out of Stock')
+	return STATUS_LABELS.index('Well Stocked') if qty > threshold else STATUS_LABELS.index('Low Stock')
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_movements(session, flush_context):
+	if not _listening():
+		return
+	for obj, sign in [(o, 1) for o in session.new] + [(o, -1) for o in session.deleted]:
+		if isinstance(obj, ProductMovement):
+			session.info.setdefault('live_movements', []).append((obj.id, obj.timestamp, obj.product_id,
+																  obj.from_location_id, obj.to_location_id, obj.qty, sign))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _read_balances(session, flush_context):
+	# Still inside the transaction (after_commit cannot query): read the
+	# balances, names, thresholds and counters the delta needs
+	pending = session.info.get('live_movements')
+	if not pending:
+		return
+	connection = session.connection()
+	pairs = {(m[2], l) for m in pending for l in (m[3], m[4]) if l}
+	product_ids = {p for p, _ in pairs} | {m[2] for m in pending}
+	location_ids = {l for _, l in pairs}
+	table = StockBalance.__table__
+	current = {(r.product_id, r.location_id): r.qty for r in connection.execute(
+		select(table.c.product_id, table.c.location_id, table.c.qty).where(
+			table.c.product_id.in_(product_ids), table.c.location_id.in_(location_ids)))}
+	session.info['live_balances'] = {key: current.get(key, 0) for key in pairs}
+	session.info['live_products'] = {r.id: (r.name, r.low_stock_threshold) for r in connection.execute(
+		select(Product.id, Product.name, Product.low_stock_threshold).where(Product.id.in_(product_ids)))}
+	session.info['live_locations'] = dict(connection.execute(
+		select(Location.id, Location.name).where(Location.id.in_(location_ids))).all())
+	counters = InventoryCounter.__table__
+	session.info['live_counters'] = dict(connection.execute(select(counters.c.name, counters.c.value)).all())
+
+
+LIVE_KEYS = ('live_movements', 'live_balances', 'live_products', 'live_locations', 'live_counters', 'live_refresh')
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_on_commit(session):
+	info = {key: session.info.pop(key, None) for key in LIVE_KEYS}
+	if not _listening():
+		return
+	broker = current_app.extensions['live_events']
+	if info['live_movements']:
+		broker.publish('inventory', movement_delta(
+			info['live_movements'], info['live_balances'] or {}, info['live_products'] or {},
+			info['live_locations'] or {}, info['live_counters'] or {}, current_app.config['LOW_STOCK_THRESHOLD']))
+	elif info['live_refresh']:
+		broker.publish('refresh', {})
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+	for key in LIVE_KEYS:
+		session.info.pop(key, None)
+
+
+def movement_delta(movements, balances, products, locations, counters, default_threshold):
+	"""Build the 'inventory' event payload from collected movements, the
+	balances they left behind, {product_id: (name, threshold)}, {location_id:
+	name} and the counters after the commit."""
+	changes = {}
+	for _, _, product_id, from_location_id, to_location_id, qty, sign in movements:
+		if from_location_id:
+			changes[(product_id, from_location_id)] = changes.get((product_id, from_location_id), 0) - sign * qty
+		if to_location_id:
+			changes[(product_id, to_location_id)] = changes.get((product_id, to_location_id), 0) + sign * qty
+
+	def product_name(product_id):
+		return products[product_id][0] if product_id in products else product_id
+
+	rows = []
+	for (product_id, location_id), delta in sorted(changes.items()):
+		if not delta:
+			continue
+		qty = balances.get((product_id, location_id), 0)
+		threshold = products.get(product_id, (None, None))[1]
+		threshold = default_threshold if threshold is None else threshold
+		rows.append({
+			'product_id': product_id,
+			'product': product_name(product_id),
+			'location_id': location_id,
+			'location': locations.get(location_id),
+			'qty': qty,
+			'delta': delta,
+			'status': report_status(qty, threshold),
+			'status_was': report_status(qty - delta, threshold),
+		})
+	return {
+		'movements': [{
+			'id': movement_id,
+			'timestamp': timestamp.isoformat() if timestamp else None,
+			'product_id': product_id,
+			'product': product_name(product_id),
+			'from_location_id': from_location_id,
+			'from_location': locations.get(from_location_id),
+			'to_location_id': to_location_id,
+			'to_location': locations.get(to_location_id),
+			'qty': qty,
+			'deleted': sign < 0,
+		} for movement_id, timestamp, product_id, from_location_id, to_location_id, qty, sign in movements],
+		'balances': rows,
+		'counters': counters,
+	}
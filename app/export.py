@@ -0,0 +1,62 @@
+"""Streaming CSV export of balances and the movement ledger.
+
+Rows are pulled from the database in chunks with yield_per and written out
+one CSV line at a time, so memory stays flat however large the ledger is.
+"""
+import csv
+import io
+from sqlalchemy.orm import aliased
+from . import db
+from .models import ProductMovement, Product, Location, StockBalance
+
+YIELD_PER = 1000
+
+BALANCE_HEADER = ('product_id', 'product_name', 'location_id', 'location_name', 'qty')
+MOVEMENT_HEADER = ('id', 'timestamp', 'product_id', 'product_name', 'from_location_id',
+				   'from_location_name', 'to_location_id', 'to_location_name', 'qty')
+
+
+def csv_lines(header, rows):
+	"""Yield CSV-encoded lines for a header and an iterable of row tuples."""
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	writer.writerow(header)
+	yield buffer.getvalue()
+	for row in rows:
+		buffer.seek(0)
+		buffer.truncate()
+		writer.writerow(row)
+		yield buffer.getvalue()
+
+
+def balance_rows(product_id=None, location_id=None):
+	"""Yield balance tuples in BALANCE_HEADER order."""
+	query = (ProductMovement.named_balance_rows(product_id, location_id)
+		.order_by(StockBalance.product_id, StockBalance.location_id)
+		.yield_per(YIELD_PER))
+	for r in query:
+		yield (r.product_id, r.product_name, r.location_id, r.location_name, r.qty)
+
+
+def movement_rows(product_id=None, location_id=None, start=None, end=None):
+	"""Yield movement tuples in MOVEMENT_HEADER order, oldest first."""
+	from .routes.movements import filter_movements
+	from_location = aliased(Location)
+	to_location = aliased(Location)
+	query = (db.session.query(
+		ProductMovement.id,
+		ProductMovement.timestamp,
+		ProductMovement.product_id,
+		Product.name,
+		ProductMovement.from_location_id,
+		from_location.name,
+		ProductMovement.to_location_id,
+		to_location.name,
+		ProductMovement.qty)
+		.outerjoin(Product, Product.id == ProductMovement.product_id)
+		.outerjoin(from_location, from_location.id == ProductMovement.from_location_id)
+		.outerjoin(to_location, to_location.id == ProductMovement.to_location_id))
+	query = filter_movements(product_id, location_id, start, end, query=query)
+	query = query.order_by(ProductMovement.timestamp, ProductMovement.id).yield_per(YIELD_PER)
+	for r in query:
+		yield (r[0], r[1].isoformat(sep=' '), *r[2:])
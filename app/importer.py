@@ -0,0 +1,174 @@
+"""Bulk movement import from CSV or JSON-lines.
+
+Rows are streamed from the file, checked against an in-memory running
+balance and written with one executemany INSERT per batch, so large
+reconciliation files never go through per-row ORM flushes.
+"""
+import csv
+import json
+import time
+from datetime import datetime
+from . import db
+from .database import write_connection
+from .cache import mark_inventory_changed
+from .stock import InsufficientStock
+from .models import (Product, Location, ProductMovement, StockBalance, DailyMovementStat, StockCheckpoint,
+					 InventoryCounter, StockAlert)
+
+FIELDS = ('product_id', 'from_location_id', 'to_location_id', 'qty', 'timestamp')
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportRowError(ValueError):
+	pass
+
+
+def read_rows(stream, fmt):
+	"""Yield (line_number, dict) pairs from a text stream in csv or jsonl format."""
+	if fmt == 'csv':
+		for line, row in enumerate(csv.DictReader(stream), start=2):
+			yield line, row
+	elif fmt == 'jsonl':
+		for line, text in enumerate(stream, start=1):
+			text = text.strip()
+			if not text:
+				continue
+			try:
+				yield line, json.loads(text)
+			except json.JSONDecodeError as exc:
+				yield line, exc
+	else:
+		raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def detect_format(filename):
+	"""Guess the import format from a file name."""
+	return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+class MovementImporter:
+	"""Validates movements against a running balance and inserts them in batches."""
+
+	def __init__(self, batch_size=5000):
+		self.batch_size = batch_size
+		self.products = {pid for (pid,) in db.session.query(Product.id)}
+		self.locations = {lid for (lid,) in db.session.query(Location.id)}
+		self.balances = {}
+		self.batch = []
+		self.deltas = {}
+		self.batch_start_line = None
+		self.result = {'rows': 0, 'imported': 0, 'error_count': 0, 'errors': []}
+
+	def balance(self, product_id, location_id):
+		key = (product_id, location_id)
+		if key not in self.balances:
+			self.balances[key] = ProductMovement.balance_for(product_id, location_id)
+		return self.balances[key]
+
+	def adjust(self, product_id, location_id, delta):
+		if location_id:
+			key = (product_id, location_id)
+			self.balances[key] = self.balance(product_id, location_id) + delta
+			self.deltas[key] = self.deltas.get(key, 0) + delta
+
+	def parse(self, row):
+		if isinstance(row, Exception):
+			raise ImportRowError(f'Invalid JSON: {row}')
+		if not isinstance(row, dict):
+			raise ImportRowError('Row must be an object')
+		product_id = str(row.get('product_id') or '').strip()
+		from_location_id = str(row.get('from_location_id') or '').strip() or None
+		to_location_id = str(row.get('to_location_id') or '').strip() or None
+		try:
+			qty = int(row.get('qty'))
+		except (TypeError, ValueError):
+			raise ImportRowError('qty must be an integer')
+		timestamp = row.get('timestamp')
+		try:
+			timestamp = datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow()
+		except (TypeError, ValueError):
+			raise ImportRowError('timestamp must be ISO 8601')
+
+		if not product_id or qty <= 0:
+			raise ImportRowError('Product and positive quantity required')
+		if not from_location_id and not to_location_id:
+			raise ImportRowError('Specify at least a from or to location')
+		if product_id not in self.products:
+			raise ImportRowError(f'Unknown product {product_id}')
+		for location_id in (from_location_id, to_location_id):
+			if location_id and location_id not in self.locations:
+				raise ImportRowError(f'Unknown location {location_id}')
+		return {
+			'product_id': product_id,
+			'from_location_id': from_location_id,
+			'to_location_id': to_location_id,
+			'qty': qty,
+			'timestamp': timestamp
+		}
+
+	def add(self, line, row):
+		self.result['rows'] += 1
+		try:
+			movement = self.parse(row)
+			if movement['from_location_id']:
+				available = self.balance(movement['product_id'], movement['from_location_id'])
+				if available < movement['qty']:
+					raise ImportRowError(
+						f'Insufficient stock at {movement["from_location_id"]}: {available} units, cannot move {movement["qty"]}')
+		except ImportRowError as exc:
+			self.result['error_count'] += 1
+			if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+				self.result['errors'].append({'line': line, 'error': str(exc)})
+			return
+		self.adjust(movement['product_id'], movement['from_location_id'], -movement['qty'])
+		self.adjust(movement['product_id'], movement['to_location_id'], movement['qty'])
+		if not self.batch:
+			self.batch_start_line = line
+		self.batch.append(movement)
+		if len(self.batch) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		"""Insert the pending batch and its balance deltas in one transaction."""
+		if not self.batch:
+			return
+		db.session.execute(ProductMovement.__table__.insert(), self.batch)
+		connection = write_connection(db.session)
+		active = StockBalance.apply_deltas(connection, self.deltas)
+		DailyMovementStat.apply_movements(connection, self.batch)
+		StockCheckpoint.discard_after(connection, min(m['timestamp'] for m in self.batch))
+		InventoryCounter.bump(connection, movements=len(self.batch), active_balances=active)
+		StockAlert.evaluate(connection, self.deltas)
+		mark_inventory_changed(db.session)  # the commit refreshes caches, snapshots and live screens
+		db.session.commit()
+		self.result['imported'] += len(self.batch)
+		self.batch = []
+		self.deltas = {}
+
+
+def import_movements(stream, fmt='csv', batch_size=5000):
+	"""Import movements from a text stream and return a summary dict with
+	row/imported/error counts, per-row errors and throughput.
+	"""
+	started = time.perf_counter()
+	importer = MovementImporter(batch_size=batch_size)
+	try:
+		for line, row in read_rows(stream, fmt):
+			importer.add(line, row)
+		importer.flush()
+	except InsufficientStock:
+		# Another writer spent stock this batch relied on; keep committed batches
+		db.session.rollback()
+		importer.result['error_count'] += len(importer.batch)
+		importer.result['errors'].append({
+			'line': None,
+			'error': f'Batch of {len(importer.batch)} rows rejected: stock changed concurrently. Re-run the import from line {importer.batch_start_line}.'
+		})
+	except Exception:
+		db.session.rollback()
+		raise
+	elapsed = time.perf_counter() - started
+	result = importer.result
+	result['seconds'] = round(elapsed, 3)
+	result['rows_per_second'] = round(result['rows'] / elapsed, 1) if elapsed else None
+	return result
@@ -0,0 +1,157 @@
+"""Background jobs without an external broker.
+
+Jobs are rows in the jobs table, executed by a thread pool in the web
+process. submit() records a job and hands it to the pool; a queued job of the
+same kind is reused rather than duplicated, so bursts of requests coalesce.
+A scheduler thread submits periodic jobs (see JobQueue.schedule) and picks up
+jobs queued by other processes. Threads start with the first request, so CLI
+commands only queue jobs for the web process to run. With several worker
+processes each runs its own pool; jobs are claimed with a conditional UPDATE
+so each runs once.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, update, delete
+from . import db
+from .models import Job
+
+# kind -> callable(**params), registered with @job_handler
+HANDLERS = {}
+
+
+def job_handler(kind):
+	"""Register the function that runs jobs of this kind."""
+	def register(fn):
+		HANDLERS[kind] = fn
+		return fn
+	return register
+
+
+class JobQueue:
+	"""Flask extension owning the worker pool and scheduler."""
+
+	def __init__(self):
+		self._schedules = []
+
+	def init_app(self, app):
+		state = app.extensions['jobs'] = {
+			'executor': None,
+			'started': False,
+			'lock': threading.Lock(),
+			'stop': threading.Event(),
+		}
+
+		@app.before_request
+		def _start_scheduler():
+			if not state['started'] and app.config['JOBS_ENABLED']:
+				self._start(app, state)
+
+	def schedule(self, kind, interval_config, is_due):
+		"""Submit kind every app.config[interval_config] seconds when is_due(interval) is true."""
+		self._schedules.append((kind, interval_config, is_due))
+
+	@property
+	def enabled(self):
+		return current_app.config['JOBS_ENABLED']
+
+	def submit(self, kind, **params):
+		"""Queue a job (or reuse a queued one of the same kind) and return its id, or None if jobs are disabled.
+		The job row is written on its own connection, outside db.session, so
+		queuing from a read-only view does not count as the request's write."""
+		if not self.enabled:
+			return None
+		table = Job.__table__
+		fresh = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+		with db.engine.begin() as connection:
+			job_id = connection.execute(select(table.c.id).where(
+				table.c.kind == kind, table.c.status == 'queued', table.c.created_at > fresh).limit(1)).scalar()
+			if job_id is not None:
+				return job_id
+			job_id = connection.execute(insert(table).values(
+				kind=kind, params=json.dumps(params), status='queued', created_at=datetime.utcnow())).inserted_primary_key[0]
+		app = current_app._get_current_object()
+		if app.extensions['jobs']['started']:
+			self._executor(app).submit(self._run, app, job_id)
+		return job_id
+
+	def status(self, job_id):
+		"""Return the job as a dict, or None."""
+		job = db.session.get(Job, job_id)
+		return job.to_dict() if job else None
+
+	def _executor(self, app):
+		state = app.extensions['jobs']
+		with state['lock']:
+			if state['executor'] is None:
+				state['executor'] = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+			return state['executor']
+
+	def _run(self, app, job_id):
+		table = Job.__table__
+		with app.app_context():
+			with db.engine.begin() as connection:
+				claimed = connection.execute(
+					update(table).where(table.c.id == job_id, table.c.status == 'queued')
+					.values(status='running', started_at=datetime.utcnow())).rowcount
+				job = connection.execute(select(table.c.kind, table.c.params).where(table.c.id == job_id)).first()
+			if not claimed or job is None:
+				return
+			status, error = 'done', None
+			try:
+				HANDLERS[job.kind](job_id=job_id, **json.loads(job.params or '{}'))
+				db.session.commit()
+			except Exception as exc:
+				db.session.rollback()
+				status, error = 'failed', f'{type(exc).__name__}: {exc}'
+				app.logger.exception('Job %s (%s) failed', job_id, job.kind)
+			finally:
+				db.session.remove()
+			with db.engine.begin() as connection:
+				connection.execute(update(table).where(table.c.id == job_id)
+					.values(status=status, error=error, finished_at=datetime.utcnow()))
+
+	def _start(self, app, state):
+		with state['lock']:
+			if state['started']:
+				return
+			state['started'] = True
+		threading.Thread(target=self._scheduler, args=(app, state['stop']), name='job-scheduler', daemon=True).start()
+
+	def _scheduler(self, app, stop):
+		"""Submit due scheduled jobs, run jobs queued elsewhere, fail jobs stuck
+		past JOB_TIMEOUT (their process died) and prune finished jobs older than a day."""
+		while True:
+			with app.app_context():
+				try:
+					for kind, interval_config, is_due in self._schedules:
+						interval = app.config[interval_config]
+						if interval > 0 and is_due(interval):
+							self.submit(kind)
+					table = Job.__table__
+					now = datetime.utcnow()
+					queued = db.session.execute(select(table.c.id).where(
+						table.c.status == 'queued',
+						table.c.created_at > now - timedelta(seconds=app.config['JOB_TIMEOUT']))).scalars().all()
+					for job_id in queued:
+						self._executor(app).submit(self._run, app, job_id)
+					with db.engine.begin() as connection:
+						connection.execute(update(table).where(
+							table.c.status.in_(('queued', 'running')),
+							table.c.created_at < now - timedelta(seconds=app.config['JOB_TIMEOUT']))
+							.values(status='failed', error='Abandoned', finished_at=now))
+						connection.execute(delete(table).where(
+							table.c.status.in_(('done', 'failed')),
+							table.c.finished_at < now - timedelta(days=1)))
+				except Exception:
+					app.logger.exception('Job scheduler tick failed')
+				finally:
+					db.session.remove()
+			intervals = [app.config[c] for _, c, _ in self._schedules if app.config[c] > 0]
+			if stop.wait(min(intervals, default=240) / 4):
+				return
+
+
+job_queue = JobQueue()
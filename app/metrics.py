@@ -0,0 +1,197 @@
+"""Per-request SQL instrumentation and a Prometheus /metrics endpoint.
+
+Cursor hooks on the app's engines count statements and DB time for the
+current request; request hooks add wall time and fold everything into
+per-endpoint counters. Requests slower than SLOW_REQUEST_MS and statements
+slower than SLOW_QUERY_MS are logged; statements outside a request (CLI
+commands, background jobs) are not checked. Server-Sent Event streams
+(/events) are counted but kept out of the duration histogram and the slow
+request check, since their lifetime is not a response time. DB time covers
+cursor execution, not fetching rows from the result. Counters live in the
+process, so with several workers each one exposes its own series.
+"""
+import threading
+import time
+from flask import Response, g, has_app_context, request
+from sqlalchemy import event
+
+# Request duration histogram bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats:
+	"""Accumulated counters for one endpoint."""
+	__slots__ = ('requests', 'statuses', 'timed', 'seconds', 'buckets', 'queries', 'db_seconds', 'max_queries', 'slow')
+
+	def __init__(self):
+		self.requests = 0
+		self.timed = 0
+		self.statuses = {}
+		self.seconds = 0.0
+		self.buckets = [0] * len(BUCKETS)
+		self.queries = 0
+		self.db_seconds = 0.0
+		self.max_queries = 0
+		self.slow = 0
+
+
+class MetricsRegistry:
+	"""Thread-safe store of per-endpoint request and query statistics."""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._endpoints = {}
+		self.slow_queries = 0
+
+	def record_request(self, endpoint, method, status, seconds, queries, db_seconds, slow, streamed=False):
+		with self._lock:
+			stats = self._endpoints.get(endpoint)
+			if stats is None:
+				stats = self._endpoints[endpoint] = EndpointStats()
+			stats.requests += 1
+			key = (method, status)
+			stats.statuses[key] = stats.statuses.get(key, 0) + 1
+			if not streamed:
+				stats.timed += 1
+				stats.seconds += seconds
+				for i, bound in enumerate(BUCKETS):
+					if seconds <= bound:
+						stats.buckets[i] += 1
+						break
+			stats.queries += queries
+			stats.db_seconds += db_seconds
+			stats.max_queries = max(stats.max_queries, queries)
+			stats.slow += slow
+
+	def record_slow_query(self):
+		with self._lock:
+			self.slow_queries += 1
+
+	def snapshot(self):
+		"""Return {endpoint: stats dict} for reporting."""
+		with self._lock:
+			return {
+				endpoint: {
+					'requests': s.requests,
+					'statuses': dict(s.statuses),
+					'timed': s.timed,
+					'seconds': s.seconds,
+					'buckets': list(s.buckets),
+					'queries': s.queries,
+					'db_seconds': s.db_seconds,
+					'max_queries': s.max_queries,
+					'slow': s.slow,
+				}
+				for endpoint, s in self._endpoints.items()
+			}, self.slow_queries
+
+	def render(self):
+		"""Render all series in the Prometheus text exposition format."""
+		endpoints, slow_queries = self.snapshot()
+		lines = [
+			'# HELP inventory_http_requests_total Requests handled, by endpoint, method and status.',
+			'# TYPE inventory_http_requests_total counter',
+		]
+		for endpoint, s in sorted(endpoints.items()):
+			for (method, status), count in sorted(s['statuses'].items()):
+				lines.append(f'inventory_http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+		lines += [
+			'# HELP inventory_http_request_duration_seconds Wall time per request.',
+			'# TYPE inventory_http_request_duration_seconds histogram',
+		]
+		for endpoint, s in sorted(endpoints.items()):
+			cumulative = 0
+			for bound, count in zip(BUCKETS, s['buckets']):
+				cumulative += count
+				lines.append(f'inventory_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+			lines.append(f'inventory_http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {s["timed"]}')
+			lines.append(f'inventory_http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {s["seconds"]:.6f}')
+			lines.append(f'inventory_http_request_duration_seconds_count{{endpoint="{endpoint}"}} {s["timed"]}')
+
+		series = (
+			('inventory_db_queries_total', 'counter', 'SQL statements executed while serving the endpoint.', 'queries', '{}'),
+			('inventory_db_query_duration_seconds_total', 'counter', 'Time spent in SQL statements.', 'db_seconds', '{:.6f}'),
+			('inventory_db_queries_per_request_max', 'gauge', 'Most statements any single request ran.', 'max_queries', '{}'),
+			('inventory_slow_requests_total', 'counter', 'Requests slower than SLOW_REQUEST_MS.', 'slow', '{}'),
+		)
+		for name, kind, help_text, field, fmt in series:
+			lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+			for endpoint, s in sorted(endpoints.items()):
+				lines.append(f'{name}{{endpoint="{endpoint}"}} {fmt.format(s[field])}')
+
+		lines += [
+			'# HELP inventory_slow_queries_total SQL statements slower than SLOW_QUERY_MS.',
+			'# TYPE inventory_slow_queries_total counter',
+			f'inventory_slow_queries_total {slow_queries}',
+		]
+		return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+	"""Flask extension installing the request and cursor hooks."""
+
+	def init_app(self, app, db):
+		if not app.config['METRICS_ENABLED']:
+			return
+		registry = app.extensions['metrics'] = MetricsRegistry()
+		slow_query = app.config['SLOW_QUERY_MS'] / 1000
+		slow_request = app.config['SLOW_REQUEST_MS'] / 1000
+		logger = app.logger
+
+		with app.app_context():
+			for engine in db.engines.values():
+				@event.listens_for(engine, 'before_cursor_execute')
+				def _start_query(conn, cursor, statement, parameters, context, executemany):
+					# Kept on the statement's own context: a statement that raises
+					# never reaches after_cursor_execute, and a per-connection stack
+					# would then pair later timings with its start
+					context._metrics_started = time.perf_counter()
+
+				@event.listens_for(engine, 'after_cursor_execute')
+				def _end_query(conn, cursor, statement, parameters, context, executemany):
+					elapsed = time.perf_counter() - context._metrics_started
+					stats = g.get('db_stats') if has_app_context() else None
+					if stats is not None:
+						stats[0] += 1
+						stats[1] += elapsed
+					if stats is not None and elapsed > slow_query:
+						registry.record_slow_query()
+						logger.warning('Slow query (%.1f ms) on %s: %s', elapsed * 1000,
+									   request.endpoint, ' '.join(statement.split())[:500])
+
+		@app.before_request
+		def _start_request():
+			g.request_started = time.perf_counter()
+			g.db_stats = [0, 0.0]
+
+		@app.after_request
+		def _server_timing(response):
+			queries, db_seconds = g.get('db_stats', (0, 0.0))
+			response.headers.add('Server-Timing', f'db;dur={db_seconds * 1000:.1f};desc="{queries} queries"')
+			g.response_status = response.status_code
+			g.response_streamed = response.mimetype == 'text/event-stream'
+			return response
+
+		@app.teardown_request
+		def _record_request(exc):
+			started = g.pop('request_started', None)
+			if started is None:
+				return
+			elapsed = time.perf_counter() - started
+			queries, db_seconds = g.pop('db_stats')
+			endpoint = request.endpoint or 'unmatched'
+			streamed = g.pop('response_streamed', False)
+			slow = not streamed and elapsed > slow_request
+			if slow:
+				logger.warning('Slow request (%.1f ms, %d queries, %.1f ms in DB): %s %s', elapsed * 1000,
+							   queries, db_seconds * 1000, request.method, request.full_path.rstrip('?'))
+			status = 500 if exc is not None else g.pop('response_status', 500)
+			registry.record_request(endpoint, request.method, status, elapsed, queries, db_seconds, slow, streamed)
+
+		@app.route('/metrics')
+		def metrics():
+			return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+request_metrics = RequestMetrics()
@@ -1,5 +1,8 @@
 from datetime import datetime
+from sqlalchemy import event
 from . import db
+from .database import write_connection
+from .stock import InsufficientStock
 
 
 class Product(db.Model):
@@ -7,25 +10,71 @@ class Product(db.Model):
 	id = db.Column(db.String(40), primary_key=True)  # product_id
 	name = db.Column(db.String(120), nullable=False, unique=True)
 	description = db.Column(db.Text, nullable=True)
-	movements = db.relationship('ProductMovement', back_populates='product', cascade='all, delete-orphan')
+	low_stock_threshold = db.Column(db.Integer, nullable=True)  # None: use LOW_STOCK_THRESHOLD
+	active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())  # False: hidden from lists and pickers
+	# Deleting is set-based (app/catalogue.py); the ORM never loads the ledger to delete it
+	movements = db.relationship('ProductMovement', back_populates='product', passive_deletes='all')
 
 	def __repr__(self):
 		return f'<Product {self.id} {self.name}>'
 
+	@staticmethod
+	def name_map(ids):
+		"""Return {id: name} for the given product ids using batched IN queries."""
+		ids = {i for i in ids if i}
+		if not ids:
+			return {}
+		ids = list(ids)
+		names = {}
+		for i in range(0, len(ids), 500):
+			names.update(db.session.query(Product.id, Product.name).filter(Product.id.in_(ids[i:i + 500])))
+		return names
+
+	@staticmethod
+	def low_stock_thresholds():
+		"""Return {id: threshold} for products with their own low-stock threshold."""
+		return dict(db.session.query(Product.id, Product.low_stock_threshold)
+			.filter(Product.low_stock_threshold.isnot(None)))
+
 
 class Location(db.Model):
 	__tablename__ = 'locations'
 	id = db.Column(db.String(40), primary_key=True)  # location_id
 	name = db.Column(db.String(120), nullable=False, unique=True)
-	movements_from = db.relationship('ProductMovement', foreign_keys='ProductMovement.from_location_id', back_populates='from_location')
-	movements_to = db.relationship('ProductMovement', foreign_keys='ProductMovement.to_location_id', back_populates='to_location')
+	active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())  # False: hidden from lists and pickers
+	movements_from = db.relationship('ProductMovement', foreign_keys='ProductMovement.from_location_id', back_populates='from_location', passive_deletes='all')
+	movements_to = db.relationship('ProductMovement', foreign_keys='ProductMovement.to_location_id', back_populates='to_location', passive_deletes='all')
 
 	def __repr__(self):
 		return f'<Location {self.id} {self.name}>'
 
+	@staticmethod
+	def name_map(ids):
+		"""Return {id: name} for the given location ids using batched IN queries."""
+		ids = {i for i in ids if i}
+		if not ids:
+			return {}
+		ids = list(ids)
+		names = {}
+		for i in range(0, len(ids), 500):
+			names.update(db.session.query(Location.id, Location.name).filter(Location.id.in_(ids[i:i + 500])))
+		return names
+
 
 class ProductMovement(db.Model):
 	__tablename__ = 'product_movements'
+	__table_args__ = (
+		# Covering indexes for the per-(product, location) ledger aggregation
+		db.Index('ix_product_movements_product_to', 'product_id', 'to_location_id', 'qty'),
+		db.Index('ix_product_movements_product_from', 'product_id', 'from_location_id', 'qty'),
+		# Per-location history and foreign key lookups
+		db.Index('ix_product_movements_to_location', 'to_location_id', 'timestamp'),
+		db.Index('ix_product_movements_from_location', 'from_location_id', 'timestamp'),
+		# Recent activity (ORDER BY timestamp DESC LIMIT n) and date-range trends
+		db.Index('ix_product_movements_timestamp', 'timestamp', 'id'),
+		# Per-product history, newest first
+		db.Index('ix_product_movements_product_timestamp', 'product_id', 'timestamp', 'id'),
+	)
 	id = db.Column(db.Integer, primary_key=True, autoincrement=True)  # movement_id
 	timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 	from_location_id = db.Column(db.String(40), db.ForeignKey('locations.id'), nullable=True)
@@ -41,9 +90,138 @@ class ProductMovement(db.Model):
 		return f'<Movement {self.id} P:{self.product_id} {self.from_location_id}->{self.to_location_id} qty={self.qty}>'
 
 	@staticmethod
-	def balance_query():
+	def balance_query(as_of=None):
 		"""Return list of dicts with product_id, location_id, qty balance.
+		Reads the maintained stock_balances table, so the cost depends on the
+		number of live product/location pairs rather than the ledger size.
+		With as_of, returns balances at that instant (movements before it)
+		from the nearest checkpoint plus the ledger tail after it.
+		"""
+		if as_of is not None:
+			return [
+				{'product_id': product_id, 'location_id': location_id, 'qty': qty}
+				for (product_id, location_id), qty in StockCheckpoint.balances_at(as_of).items()
+			]
+		query = (db.session.query(
+			StockBalance.product_id,
+			StockBalance.location_id,
+			StockBalance.qty)
+			.filter(StockBalance.qty != 0))
+		return [
+			{'product_id': r.product_id, 'location_id': r.location_id, 'qty': r.qty}
+			for r in query
+		]
+
+	@staticmethod
+	def named_balance_rows(product_id=None, location_id=None):
+		"""Return a query of (product_id, location_id, qty, product_name, location_name)
+		rows, optionally restricted to one product and/or location.
+		"""
+		query = (db.session.query(
+			StockBalance.product_id,
+			StockBalance.location_id,
+			StockBalance.qty,
+			Product.name.label('product_name'),
+			Location.name.label('location_name'))
+			.outerjoin(Product, Product.id == StockBalance.product_id)
+			.outerjoin(Location, Location.id == StockBalance.location_id)
+			.filter(StockBalance.qty != 0))
+		if product_id is not None:
+			query = query.filter(StockBalance.product_id == product_id)
+		if location_id is not None:
+			query = query.filter(StockBalance.location_id == location_id)
+		return query
+
+	@staticmethod
+	def named_balance_query(product_id=None, location_id=None):
+		"""Return balance rows with product and location names joined in one query.
+		Each dict has product, product_id, location, location_id and qty; missing
+		names fall back to the product id and 'N/A'.
+		"""
+		return [
+			{
+				'product': r.product_name or r.product_id,
+				'product_id': r.product_id,
+				'location': r.location_name or 'N/A',
+				'location_id': r.location_id,
+				'qty': r.qty
+			}
+			for r in ProductMovement.named_balance_rows(product_id, location_id)
+		]
+
+	@staticmethod
+	def balance_for(product_id, location_id):
+		"""Return the current qty of one product at one location (0 if none)."""
+		qty = (db.session.query(StockBalance.qty)
+			.filter(StockBalance.product_id == product_id, StockBalance.location_id == location_id)
+			.scalar())
+		return qty or 0
+
+	@staticmethod
+	def balances_for_product(product_id):
+		"""Return list of dicts with location_id, qty for one product."""
+		query = (db.session.query(StockBalance.location_id, StockBalance.qty)
+			.filter(StockBalance.product_id == product_id, StockBalance.qty != 0))
+		return [{'location_id': r.location_id, 'qty': r.qty} for r in query]
+
+	@staticmethod
+	def balances_for_pairs(pairs):
+		"""Return {(product_id, location_id): qty} for many pairs in batched
+		row-value IN queries; pairs without stock map to 0."""
+		from sqlalchemy import tuple_
+		pairs = list(dict.fromkeys(pairs))
+		result = dict.fromkeys(pairs, 0)
+		key = tuple_(StockBalance.product_id, StockBalance.location_id)
+		for i in range(0, len(pairs), 500):
+			query = (db.session.query(StockBalance.product_id, StockBalance.location_id, StockBalance.qty)
+				.filter(key.in_(pairs[i:i + 500])))
+			result.update(((r.product_id, r.location_id), r.qty) for r in query)
+		return result
+
+	@staticmethod
+	def balances_matching(product_ids=None, location_ids=None):
+		"""Return (product_id, location_id, qty) rows with stock for any of
+		the given products and/or locations."""
+		query = db.session.query(StockBalance.product_id, StockBalance.location_id, StockBalance.qty)
+		if product_ids:
+			query = query.filter(StockBalance.product_id.in_(product_ids))
+		if location_ids:
+			query = query.filter(StockBalance.location_id.in_(location_ids))
+		return query.filter(StockBalance.qty != 0).order_by(StockBalance.product_id, StockBalance.location_id).all()
+
+	@staticmethod
+	def recent(product_id=None, location_id=None, limit=10):
+		"""Return the latest movements of one product or location, newest first.
+		A location's movements come from two index range scans (received and
+		sent) merged here, rather than one OR query sorting its whole history.
+		"""
+		from sqlalchemy.orm import joinedload
+		options = (
+			joinedload(ProductMovement.product),
+			joinedload(ProductMovement.from_location),
+			joinedload(ProductMovement.to_location),
+		)
+		newest = (ProductMovement.timestamp.desc(), ProductMovement.id.desc())
+		if location_id is None:
+			return (ProductMovement.query.options(*options)
+				.filter(ProductMovement.product_id == product_id)
+				.order_by(*newest).limit(limit).all())
+		movements = {}
+		for column in (ProductMovement.to_location_id, ProductMovement.from_location_id):
+			query = ProductMovement.query.options(*options).filter(column == location_id)
+			if product_id is not None:
+				query = query.filter(ProductMovement.product_id == product_id)
+			for m in query.order_by(*newest).limit(limit):
+				movements[m.id] = m
+		return sorted(movements.values(), key=lambda m: (m.timestamp, m.id), reverse=True)[:limit]
+
+	@staticmethod
+	def ledger_balance_query(since=None, before=None):
+		"""Recompute balances from the movement ledger.
 		Handles transfers by subtracting from source and adding to destination.
+		since/before restrict the ledger to since <= timestamp < before, giving
+		the net change over that window. Used to rebuild and verify the
+		stock_balances table and to replay the tail after a checkpoint.
 		"""
 		from sqlalchemy import func
 		incoming = (db.session.query(
@@ -56,6 +234,12 @@ class ProductMovement(db.Model):
 			ProductMovement.from_location_id.label('location_id'),
 			(-ProductMovement.qty).label('delta'))
 			.filter(ProductMovement.from_location_id.isnot(None)))
+		if since is not None:
+			incoming = incoming.filter(ProductMovement.timestamp >= since)
+			outgoing = outgoing.filter(ProductMovement.timestamp >= since)
+		if before is not None:
+			incoming = incoming.filter(ProductMovement.timestamp < before)
+			outgoing = outgoing.filter(ProductMovement.timestamp < before)
 		union_sub = incoming.union_all(outgoing).subquery()
 		query = (db.session.query(
 			union_sub.c.product_id,
@@ -67,3 +251,778 @@ class ProductMovement(db.Model):
 			for r in query if r.qty != 0
 		]
 
+
+class StockBalance(db.Model):
+	"""Current quantity per (product, location), kept in step with the ledger."""
+	__tablename__ = 'stock_balances'
+	__table_args__ = (
+		db.Index('ix_stock_balances_location', 'location_id', 'product_id'),
+	)
+	product_id = db.Column(db.String(40), db.ForeignKey('products.id'), primary_key=True)
+	location_id = db.Column(db.String(40), db.ForeignKey('locations.id'), primary_key=True)
+	qty = db.Column(db.Integer, nullable=False, default=0)
+
+	def __repr__(self):
+		return f'<StockBalance P:{self.product_id} L:{self.location_id} qty={self.qty}>'
+
+	@staticmethod
+	def apply_delta(connection, product_id, location_id, delta):
+		"""Add delta to one balance row on the given connection.
+		Rows that reach zero are removed so the table only holds live stock.
+		Returns the change in the number of positive balances (-1, 0 or 1).
+		"""
+		if not location_id or not delta:
+			return 0
+		update, insert, prune = _balance_statements()
+		params = {'p': product_id, 'l': location_id, 'delta': delta}
+		if connection.execute(update, params).rowcount == 0:
+			connection.execute(insert, {'product_id': product_id, 'location_id': location_id, 'qty': delta})
+			return 1 if delta > 0 else 0
+		if connection.execute(prune, params).rowcount:
+			return -1 if delta < 0 else 0
+		table = StockBalance.__table__
+		qty = connection.execute(db.select(table.c.qty).where(
+			(table.c.product_id == product_id) & (table.c.location_id == location_id))).scalar()
+		return (qty > 0) - (qty - delta > 0)
+
+	@staticmethod
+	def debit(connection, product_id, location_id, qty):
+		"""Take qty from one balance row only if enough stock is there.
+		The check and the decrement are a single conditional UPDATE, so
+		concurrent writers cannot both pass it. Raises InsufficientStock.
+		Returns -1 if the balance was used up, else 0.
+		"""
+		debit, prune = _debit_statements()
+		params = {'p': product_id, 'l': location_id, 'qty': qty}
+		if connection.execute(debit, params).rowcount != 1:
+			table = StockBalance.__table__
+			available = connection.execute(db.select(table.c.qty).where(
+				(table.c.product_id == product_id) & (table.c.location_id == location_id))).scalar()
+			raise InsufficientStock(product_id, location_id, available or 0, qty)
+		return -connection.execute(prune, params).rowcount
+
+	@staticmethod
+	def apply_deltas(connection, deltas):
+		"""Apply {(product_id, location_id): delta} with one executemany per statement.
+		Used by bulk writers that bypass the per-movement mapper events. Negative
+		deltas are conditional debits; if any would go below zero the whole call
+		raises InsufficientStock and the caller rolls back. Returns the change in
+		the number of positive balances.
+		"""
+		from sqlalchemy import tuple_
+		deltas = {key: delta for key, delta in deltas.items() if key[1] and delta}
+		if not deltas:
+			return 0
+		update, insert, prune = _balance_statements()
+		keys = list(deltas)
+		existing = {}
+		for i in range(0, len(keys), 500):
+			chunk = keys[i:i + 500]
+			existing.update(((r.product_id, r.location_id), r.qty) for r in connection.execute(
+				db.select(StockBalance.product_id, StockBalance.location_id, StockBalance.qty)
+				.where(tuple_(StockBalance.product_id, StockBalance.location_id).in_(chunk))))
+		active_change = sum((existing.get(key, 0) + delta > 0) - (existing.get(key, 0) > 0) for key, delta in deltas.items())
+		updates = [{'p': p, 'l': l, 'delta': deltas[(p, l)]} for (p, l) in keys if (p, l) in existing and deltas[(p, l)] > 0]
+		debits = [{'p': p, 'l': l, 'qty': -deltas[(p, l)]} for (p, l) in keys if (p, l) in existing and deltas[(p, l)] < 0]
+		inserts = [{'product_id': p, 'location_id': l, 'qty': deltas[(p, l)]} for (p, l) in keys if (p, l) not in existing]
+		if any(row['qty'] < 0 for row in inserts):
+			raise InsufficientStock()
+		if debits:
+			debit, prune = _debit_statements()
+			if connection.dialect.supports_sane_multi_rowcount:
+				if connection.execute(debit, debits).rowcount != len(debits):
+					raise InsufficientStock()
+			else:
+				for row in debits:
+					if connection.execute(debit, row).rowcount != 1:
+						raise InsufficientStock()
+			connection.execute(prune, debits)
+		if updates:
+			connection.execute(update, updates)
+		if inserts:
+			connection.execute(insert, inserts)
+		return active_change
+
+	@staticmethod
+	def rebuild():
+		"""Replace the table contents with balances recomputed from the ledger.
+		Returns the number of rows written. The caller commits.
+		"""
+		rows = ProductMovement.ledger_balance_query()
+		db.session.execute(StockBalance.__table__.delete())
+		if rows:
+			db.session.execute(StockBalance.__table__.insert(), rows)
+		return len(rows)
+
+	@staticmethod
+	def verify():
+		"""Compare the table with the ledger.
+		Returns a list of (product_id, location_id, stored_qty, ledger_qty) mismatches.
+		"""
+		stored = {(r['product_id'], r['location_id']): r['qty'] for r in ProductMovement.balance_query()}
+		ledger = {(r['product_id'], r['location_id']): r['qty'] for r in ProductMovement.ledger_balance_query()}
+		mismatches = []
+		for key in sorted(set(stored) | set(ledger)):
+			if stored.get(key, 0) != ledger.get(key, 0):
+				mismatches.append((key[0], key[1], stored.get(key, 0), ledger.get(key, 0)))
+		return mismatches
+
+	@staticmethod
+	def slice_page(product_id=None, location_id=None, after=None, limit=50):
+		"""One page of named balance rows for a single product (ordered by location
+		id) or a single location (ordered by product id), starting after the id
+		`after`. Each page is a range scan of the primary key or of
+		ix_stock_balances_location. Returns (rows, next_cursor).
+		"""
+		key = StockBalance.location_id if product_id is not None else StockBalance.product_id
+		query = (ProductMovement.named_balance_rows(product_id=product_id, location_id=location_id)
+			.add_columns(Product.low_stock_threshold))
+		if after:
+			query = query.filter(key > after)
+		rows = query.order_by(key).limit(limit + 1).all()
+		next_cursor = None
+		if len(rows) > limit:
+			rows = rows[:limit]
+			next_cursor = rows[-1].location_id if product_id is not None else rows[-1].product_id
+		return rows, next_cursor
+
+	@staticmethod
+	def slice_totals(product_id=None, location_id=None, default_threshold=10):
+		"""Return lines, units, low_stock and out_of_stock over the balances of
+		one product and/or location, reading only that slice of the table."""
+		threshold = db.func.coalesce(Product.low_stock_threshold, default_threshold)
+		query = (db.session.query(
+			db.func.count(),
+			db.func.sum(StockBalance.qty),
+			db.func.sum(db.case(((StockBalance.qty > 0) & (StockBalance.qty <= threshold), 1), else_=0)),
+			db.func.sum(db.case((StockBalance.qty <= 0, 1), else_=0)))
+			.select_from(StockBalance)
+			.outerjoin(Product, Product.id == StockBalance.product_id))
+		if product_id is not None:
+			query = query.filter(StockBalance.product_id == product_id)
+		if location_id is not None:
+			query = query.filter(StockBalance.location_id == location_id)
+		lines, units, low_stock, out_of_stock = query.one()
+		return {'lines': lines, 'units': units or 0, 'low_stock': low_stock or 0, 'out_of_stock': out_of_stock or 0}
+
+
+class DailyMovementStat(db.Model):
+	"""Per-day movement totals for one (product, location), kept in step with the ledger.
+	in_qty/out_qty are units received at/sent from the location. movement_count and
+	moved_qty count each movement once, on its destination row (its source row for
+	removals), so summing them over a day gives that day's movement totals.
+	"""
+	__tablename__ = 'daily_movement_stats'
+	day = db.Column(db.Date, primary_key=True)
+	product_id = db.Column(db.String(40), db.ForeignKey('products.id'), primary_key=True)
+	location_id = db.Column(db.String(40), db.ForeignKey('locations.id'), primary_key=True)
+	in_qty = db.Column(db.Integer, nullable=False, default=0)
+	out_qty = db.Column(db.Integer, nullable=False, default=0)
+	movement_count = db.Column(db.Integer, nullable=False, default=0)
+	moved_qty = db.Column(db.Integer, nullable=False, default=0)
+
+	def __repr__(self):
+		return f'<DailyMovementStat {self.day} P:{self.product_id} L:{self.location_id} in={self.in_qty} out={self.out_qty}>'
+
+	@staticmethod
+	def contributions(movements, sign=1):
+		"""Aggregate movements into {(day, product_id, location_id): [in, out, count, moved]}.
+		Movements may be ProductMovement objects or dicts with the same fields.
+		"""
+		totals = {}
+		for m in movements:
+			get = m.get if isinstance(m, dict) else lambda name, m=m: getattr(m, name)
+			day, product_id, qty = get('timestamp').date(), get('product_id'), sign * get('qty')
+			from_location_id, to_location_id = get('from_location_id'), get('to_location_id')
+			if to_location_id:
+				row = totals.setdefault((day, product_id, to_location_id), [0, 0, 0, 0])
+				row[0] += qty
+				row[2] += sign
+				row[3] += qty
+			if from_location_id:
+				row = totals.setdefault((day, product_id, from_location_id), [0, 0, 0, 0])
+				row[1] += qty
+				if not to_location_id:
+					row[2] += sign
+					row[3] += qty
+		return totals
+
+	@staticmethod
+	def apply_movements(connection, movements, sign=1):
+		"""Add (sign=1) or remove (sign=-1) movements from the rollup on the given connection."""
+		DailyMovementStat.apply_totals(connection, DailyMovementStat.contributions(movements, sign), sign)
+
+	@staticmethod
+	def apply_totals(connection, totals, sign=1):
+		"""Add {(day, product_id, location_id): [in, out, count, moved]} to the rollup.
+		With sign=-1 rows left with no in or out quantity are removed."""
+		from sqlalchemy import tuple_
+		if not totals:
+			return
+		update, insert, prune = _rollup_statements()
+		table = DailyMovementStat.__table__
+		keys = list(totals)
+		existing = set()
+		for i in range(0, len(keys), 300):
+			chunk = keys[i:i + 300]
+			existing.update(tuple(r) for r in connection.execute(
+				db.select(table.c.day, table.c.product_id, table.c.location_id)
+				.where(tuple_(table.c.day, table.c.product_id, table.c.location_id).in_(chunk))))
+		updates, inserts = [], []
+		for key in keys:
+			in_qty, out_qty, count, moved = totals[key]
+			if key in existing:
+				updates.append({'d': key[0], 'p': key[1], 'l': key[2], 'in_qty': in_qty,
+								'out_qty': out_qty, 'count': count, 'moved': moved})
+			else:
+				inserts.append({'day': key[0], 'product_id': key[1], 'location_id': key[2], 'in_qty': in_qty,
+								'out_qty': out_qty, 'movement_count': count, 'moved_qty': moved})
+		if updates:
+			connection.execute(update, updates)
+			if sign < 0:
+				connection.execute(prune, updates)
+		if inserts:
+			connection.execute(insert, inserts)
+
+	@staticmethod
+	def rebuild():
+		"""Backfill the rollup from the full ledger. Returns the number of rows written.
+		The caller commits.
+		"""
+		from sqlalchemy import func, case, literal
+		day = func.date(ProductMovement.timestamp)
+		incoming = (db.select(
+			day.label('day'),
+			ProductMovement.product_id.label('product_id'),
+			ProductMovement.to_location_id.label('location_id'),
+			ProductMovement.qty.label('in_qty'),
+			literal(0).label('out_qty'),
+			literal(1).label('movement_count'),
+			ProductMovement.qty.label('moved_qty'))
+			.where(ProductMovement.to_location_id.isnot(None)))
+		removal = ProductMovement.to_location_id.is_(None)
+		outgoing = (db.select(
+			day.label('day'),
+			ProductMovement.product_id.label('product_id'),
+			ProductMovement.from_location_id.label('location_id'),
+			literal(0).label('in_qty'),
+			ProductMovement.qty.label('out_qty'),
+			case((removal, 1), else_=0).label('movement_count'),
+			case((removal, ProductMovement.qty), else_=0).label('moved_qty'))
+			.where(ProductMovement.from_location_id.isnot(None)))
+		deltas = incoming.union_all(outgoing).subquery()
+		grouped = (db.select(
+			deltas.c.day, deltas.c.product_id, deltas.c.location_id,
+			func.sum(deltas.c.in_qty), func.sum(deltas.c.out_qty),
+			func.sum(deltas.c.movement_count), func.sum(deltas.c.moved_qty))
+			.group_by(deltas.c.day, deltas.c.product_id, deltas.c.location_id))
+		table = DailyMovementStat.__table__
+		db.session.execute(table.delete())
+		db.session.execute(table.insert().from_select(
+			['day', 'product_id', 'location_id', 'in_qty', 'out_qty', 'movement_count', 'moved_qty'], grouped))
+		return db.session.query(DailyMovementStat).count()
+
+
+class StockCheckpoint(db.Model):
+	"""Balances of every product/location at a cutoff instant (movements before it).
+	Point-in-time queries start from the nearest checkpoint and replay only the
+	ledger tail after it. Checkpoints are discarded when a movement is written or
+	removed at an earlier timestamp, and recreated by 'flask checkpoints create'.
+	"""
+	__tablename__ = 'stock_checkpoints'
+	id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+	cutoff = db.Column(db.DateTime, nullable=False, unique=True, index=True)
+	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	balances = db.relationship('StockCheckpointBalance', cascade='all, delete-orphan', passive_deletes=True)
+
+	def __repr__(self):
+		return f'<StockCheckpoint {self.id} cutoff={self.cutoff}>'
+
+	@staticmethod
+	def nearest(as_of):
+		"""Return the latest checkpoint with cutoff <= as_of, or None."""
+		return (StockCheckpoint.query
+			.filter(StockCheckpoint.cutoff <= as_of)
+			.order_by(StockCheckpoint.cutoff.desc())
+			.first())
+
+	@staticmethod
+	def balances_at(as_of):
+		"""Return {(product_id, location_id): qty} for movements before as_of."""
+		checkpoint = StockCheckpoint.nearest(as_of)
+		balances = {}
+		since = None
+		if checkpoint is not None:
+			since = checkpoint.cutoff
+			query = (db.session.query(
+				StockCheckpointBalance.product_id,
+				StockCheckpointBalance.location_id,
+				StockCheckpointBalance.qty)
+				.filter(StockCheckpointBalance.checkpoint_id == checkpoint.id))
+			balances = {(r.product_id, r.location_id): r.qty for r in query}
+		for r in ProductMovement.ledger_balance_query(since=since, before=as_of):
+			key = (r['product_id'], r['location_id'])
+			balances[key] = balances.get(key, 0) + r['qty']
+		return {key: qty for key, qty in balances.items() if qty != 0}
+
+	@staticmethod
+	def create(cutoff):
+		"""Store a checkpoint at cutoff, replacing any existing one. The caller commits."""
+		balances = StockCheckpoint.balances_at(cutoff)
+		StockCheckpoint.query.filter_by(cutoff=cutoff).delete()
+		checkpoint = StockCheckpoint(cutoff=cutoff)
+		db.session.add(checkpoint)
+		db.session.flush()
+		if balances:
+			db.session.execute(StockCheckpointBalance.__table__.insert(), [
+				{'checkpoint_id': checkpoint.id, 'product_id': product_id, 'location_id': location_id, 'qty': qty}
+				for (product_id, location_id), qty in balances.items()
+			])
+		return checkpoint
+
+	@staticmethod
+	def discard_after(connection, timestamp):
+		"""Drop checkpoints made stale by a ledger change at timestamp."""
+		table = StockCheckpoint.__table__
+		stale = connection.execute(db.select(table.c.id).where(table.c.cutoff > timestamp)).scalars().all()
+		if stale:
+			rows = StockCheckpointBalance.__table__
+			connection.execute(rows.delete().where(rows.c.checkpoint_id.in_(stale)))
+			connection.execute(table.delete().where(table.c.id.in_(stale)))
+
+
+class StockCheckpointBalance(db.Model):
+	__tablename__ = 'stock_checkpoint_balances'
+	checkpoint_id = db.Column(db.Integer, db.ForeignKey('stock_checkpoints.id', ondelete='CASCADE'), primary_key=True)
+	product_id = db.Column(db.String(40), primary_key=True)
+	location_id = db.Column(db.String(40), primary_key=True)
+	qty = db.Column(db.Integer, nullable=False)
+
+	def __repr__(self):
+		return f'<StockCheckpointBalance C:{self.checkpoint_id} P:{self.product_id} L:{self.location_id} qty={self.qty}>'
+
+
+class LedgerArchive(db.Model):
+	"""One 'movements archive' run. Movements before the latest cutoff only
+	survive as opening balances, so point-in-time reports cannot go back past it.
+	"""
+	__tablename__ = 'ledger_archives'
+	id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+	cutoff = db.Column(db.DateTime, nullable=False, index=True)
+	path = db.Column(db.String(500), nullable=False)
+	archived = db.Column(db.Integer, nullable=False)
+	openings = db.Column(db.Integer, nullable=False)
+	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+	def __repr__(self):
+		return f'<LedgerArchive {self.id} cutoff={self.cutoff} archived={self.archived}>'
+
+	@staticmethod
+	def archived_before():
+		"""Return the latest archive cutoff, or None if nothing was archived."""
+		return db.session.query(db.func.max(LedgerArchive.cutoff)).scalar()
+
+
+class InventoryCounter(db.Model):
+	"""Dashboard totals kept in step with writes so they never need a COUNT(*).
+	Mapper events and bulk writers adjust them; 'flask counters reconcile'
+	recomputes them. The migration and create_all() seed the rows.
+	"""
+	__tablename__ = 'inventory_counters'
+	NAMES = ('products', 'locations', 'movements', 'active_balances')
+	name = db.Column(db.String(40), primary_key=True)
+	value = db.Column(db.Integer, nullable=False, default=0)
+
+	def __repr__(self):
+		return f'<InventoryCounter {self.name}={self.value}>'
+
+	@staticmethod
+	def bump(connection, **deltas):
+		"""Add to counters on the given connection, e.g. bump(conn, movements=1)."""
+		table = InventoryCounter.__table__
+		for name, delta in deltas.items():
+			if delta:
+				connection.execute(table.update().where(table.c.name == name).values(value=table.c.value + delta))
+
+	@staticmethod
+	def actual():
+		"""Compute every counter from the tables (full scans)."""
+		return {
+			'products': db.session.query(db.func.count(Product.id)).scalar(),
+			'locations': db.session.query(db.func.count(Location.id)).scalar(),
+			'movements': db.session.query(db.func.count(ProductMovement.id)).scalar(),
+			'active_balances': db.session.query(db.func.count()).select_from(StockBalance)
+				.filter(StockBalance.qty > 0).scalar(),
+		}
+
+	@staticmethod
+	def counts():
+		"""Return {name: value}. A pure read, safe in GET views and on the
+		replica: counters missing from the table are computed but not stored
+		('flask counters reconcile' stores them)."""
+		counts = dict(db.session.query(InventoryCounter.name, InventoryCounter.value))
+		if len(counts) < len(InventoryCounter.NAMES):
+			actual = InventoryCounter.actual()
+			counts = {name: counts.get(name, actual[name]) for name in InventoryCounter.NAMES}
+		return counts
+
+	@staticmethod
+	def reconcile():
+		"""Overwrite the counters with freshly computed values.
+		Returns [(name, stored, actual)] for counters that were off. The caller commits.
+		"""
+		stored = dict(db.session.query(InventoryCounter.name, InventoryCounter.value))
+		actual = InventoryCounter.actual()
+		table = InventoryCounter.__table__
+		db.session.execute(table.delete())
+		db.session.execute(table.insert(), [{'name': name, 'value': value} for name, value in actual.items()])
+		return [(name, stored[name], value) for name, value in actual.items() if name in stored and stored[name] != value]
+
+
+class ReorderThreshold(db.Model):
+	"""Reorder point for one product at one location. Stock at or below it
+	opens a StockAlert; pairs without a reorder point are never alerted on.
+	"""
+	__tablename__ = 'reorder_thresholds'
+	__table_args__ = (
+		db.Index('ix_reorder_thresholds_location', 'location_id', 'product_id'),
+	)
+	product_id = db.Column(db.String(40), db.ForeignKey('products.id'), primary_key=True)
+	location_id = db.Column(db.String(40), db.ForeignKey('locations.id'), primary_key=True)
+	threshold = db.Column(db.Integer, nullable=False)
+
+	def __repr__(self):
+		return f'<ReorderThreshold P:{self.product_id} L:{self.location_id} threshold={self.threshold}>'
+
+	@staticmethod
+	def set_many(thresholds):
+		"""Store {(product_id, location_id): threshold}; a threshold of None removes
+		the reorder point. Re-evaluates the alerts of just those pairs.
+		Returns (stored, removed). The caller commits.
+		"""
+		from sqlalchemy import bindparam
+		connection = write_connection(db.session)
+		table = ReorderThreshold.__table__
+		alerts = StockAlert.__table__
+		removed = [{'p': p, 'l': l} for (p, l), threshold in thresholds.items() if threshold is None]
+		kept = {key: threshold for key, threshold in thresholds.items() if threshold is not None}
+		removed_count = 0
+		if removed:
+			removed_count = connection.execute(table.delete().where(
+				(table.c.product_id == bindparam('p')) & (table.c.location_id == bindparam('l'))), removed).rowcount
+			connection.execute(alerts.delete().where(
+				(alerts.c.product_id == bindparam('p')) & (alerts.c.location_id == bindparam('l'))), removed)
+		keys = list(kept)
+		existing = set()
+		for i in range(0, len(keys), 500):
+			existing.update(tuple(r) for r in connection.execute(
+				db.select(table.c.product_id, table.c.location_id).where(_pair_candidates(table, keys[i:i + 500]))))
+		updates = [{'p': p, 'l': l, 'threshold': kept[(p, l)]} for (p, l) in keys if (p, l) in existing]
+		inserts = [{'product_id': p, 'location_id': l, 'threshold': kept[(p, l)]} for (p, l) in keys if (p, l) not in existing]
+		if updates:
+			connection.execute(table.update().where(
+				(table.c.product_id == bindparam('p')) & (table.c.location_id == bindparam('l')))
+				.values(threshold=bindparam('threshold')), updates)
+		if inserts:
+			connection.execute(table.insert(), inserts)
+		StockAlert.evaluate(connection, keys)
+		return len(keys), removed_count
+
+
+class StockAlert(db.Model):
+	"""Open reorder alert: a product at a location with stock at or below its
+	reorder point. evaluate() opens, updates and closes rows for just the
+	balances each write touched, so the table is always the live set of alerts.
+	"""
+	__tablename__ = 'stock_alerts'
+	__table_args__ = (
+		db.Index('ix_stock_alerts_location', 'location_id', 'product_id'),
+	)
+	product_id = db.Column(db.String(40), db.ForeignKey('products.id'), primary_key=True)
+	location_id = db.Column(db.String(40), db.ForeignKey('locations.id'), primary_key=True)
+	qty = db.Column(db.Integer, nullable=False)
+	threshold = db.Column(db.Integer, nullable=False)
+	opened_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+	def __repr__(self):
+		return f'<StockAlert P:{self.product_id} L:{self.location_id} qty={self.qty} threshold={self.threshold}>'
+
+	@staticmethod
+	def evaluate(connection, pairs):
+		"""Open, update or close the alerts of the given (product_id, location_id)
+		pairs on the given connection. One indexed lookup per 500 pairs joins
+		their reorder points to their balances and open alerts; pairs without a
+		reorder point cost nothing more.
+		"""
+		from sqlalchemy import bindparam
+		pairs = list({key for key in pairs if key[1]})
+		if not pairs:
+			return
+		thresholds = ReorderThreshold.__table__
+		balances = StockBalance.__table__
+		alerts = StockAlert.__table__
+		found = []
+		for i in range(0, len(pairs), 500):
+			chunk = pairs[i:i + 500]
+			wanted = set(chunk)
+			found.extend(row for row in connection.execute(
+				db.select(thresholds.c.product_id, thresholds.c.location_id, thresholds.c.threshold,
+						  db.func.coalesce(balances.c.qty, 0), alerts.c.qty, alerts.c.threshold)
+				.select_from(thresholds
+					.outerjoin(balances, (balances.c.product_id == thresholds.c.product_id)
+							   & (balances.c.location_id == thresholds.c.location_id))
+					.outerjoin(alerts, (alerts.c.product_id == thresholds.c.product_id)
+							   & (alerts.c.location_id == thresholds.c.location_id)))
+				.where(_pair_candidates(thresholds, chunk))) if (row[0], row[1]) in wanted)
+		now = datetime.utcnow()
+		inserts, updates, closes = [], [], []
+		for product_id, location_id, threshold, qty, alert_qty, alert_threshold in found:
+			if qty > threshold:
+				if alert_qty is not None:
+					closes.append({'p': product_id, 'l': location_id})
+			elif alert_qty is None:
+				inserts.append({'product_id': product_id, 'location_id': location_id, 'qty': qty,
+								'threshold': threshold, 'opened_at': now, 'updated_at': now})
+			elif (alert_qty, alert_threshold) != (qty, threshold):
+				updates.append({'p': product_id, 'l': location_id, 'qty': qty, 'threshold': threshold, 'now': now})
+		match = (alerts.c.product_id == bindparam('p')) & (alerts.c.location_id == bindparam('l'))
+		if inserts:
+			connection.execute(alerts.insert(), inserts)
+		if updates:
+			connection.execute(alerts.update().where(match).values(
+				qty=bindparam('qty'), threshold=bindparam('threshold'), updated_at=bindparam('now')), updates)
+		if closes:
+			connection.execute(alerts.delete().where(match), closes)
+
+	@staticmethod
+	def rebuild():
+		"""Recompute every open alert from the reorder points and balances.
+		Returns the number of open alerts. The caller commits.
+		"""
+		thresholds = ReorderThreshold.__table__
+		balances = StockBalance.__table__
+		alerts = StockAlert.__table__
+		qty = db.func.coalesce(balances.c.qty, 0)
+		opened = {(r.product_id, r.location_id): r.opened_at for r in db.session.execute(
+			db.select(alerts.c.product_id, alerts.c.location_id, alerts.c.opened_at))}
+		rows = db.session.execute(
+			db.select(thresholds.c.product_id, thresholds.c.location_id, thresholds.c.threshold, qty.label('qty'))
+			.select_from(thresholds.outerjoin(balances, (balances.c.product_id == thresholds.c.product_id)
+											  & (balances.c.location_id == thresholds.c.location_id)))
+			.where(qty <= thresholds.c.threshold)).all()
+		now = datetime.utcnow()
+		db.session.execute(alerts.delete())
+		if rows:
+			db.session.execute(alerts.insert(), [
+				{'product_id': r.product_id, 'location_id': r.location_id, 'qty': r.qty, 'threshold': r.threshold,
+				 'opened_at': opened.get((r.product_id, r.location_id), now), 'updated_at': now}
+				for r in rows])
+		return len(rows)
+
+	@staticmethod
+	def page(product_id=None, location_id=None, status=None, after=None, limit=50):
+		"""One page of open alerts with product and location names, ordered by
+		(product_id, location_id) and starting after the pair `after`. status
+		'out' keeps alerts with no stock left, 'low' the rest.
+		Returns (rows, next_cursor).
+		"""
+		from sqlalchemy import tuple_
+		query = (db.session.query(
+			StockAlert.product_id,
+			StockAlert.location_id,
+			StockAlert.qty,
+			StockAlert.threshold,
+			StockAlert.opened_at,
+			StockAlert.updated_at,
+			Product.name.label('product_name'),
+			Location.name.label('location_name'))
+			.outerjoin(Product, Product.id == StockAlert.product_id)
+			.outerjoin(Location, Location.id == StockAlert.location_id))
+		if product_id is not None:
+			query = query.filter(StockAlert.product_id == product_id)
+		if location_id is not None:
+			query = query.filter(StockAlert.location_id == location_id)
+		if status == 'out':
+			query = query.filter(StockAlert.qty <= 0)
+		elif status == 'low':
+			query = query.filter(StockAlert.qty > 0)
+		if after:
+			query = query.filter(tuple_(StockAlert.product_id, StockAlert.location_id) > tuple_(*after))
+		rows = query.order_by(StockAlert.product_id, StockAlert.location_id).limit(limit + 1).all()
+		next_cursor = None
+		if len(rows) > limit:
+			rows = rows[:limit]
+			next_cursor = (rows[-1].product_id, rows[-1].location_id)
+		return rows, next_cursor
+
+	@staticmethod
+	def counts():
+		"""Return {'open': n, 'out': n, 'low': n} over the open alerts."""
+		total, out = db.session.query(
+			db.func.count(), db.func.sum(db.case((StockAlert.qty <= 0, 1), else_=0))).one()
+		return {'open': total, 'out': out or 0, 'low': total - (out or 0)}
+
+
+class Job(db.Model):
+	"""A unit of background work run by the job queue (see app/jobs.py)."""
+	__tablename__ = 'jobs'
+	__table_args__ = (
+		db.Index('ix_jobs_kind_status', 'kind', 'status'),
+	)
+	id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+	kind = db.Column(db.String(50), nullable=False)
+	params = db.Column(db.Text, nullable=True)
+	status = db.Column(db.String(20), nullable=False, default='queued')
+	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	started_at = db.Column(db.DateTime, nullable=True)
+	finished_at = db.Column(db.DateTime, nullable=True)
+	error = db.Column(db.Text, nullable=True)
+
+	def __repr__(self):
+		return f'<Job {self.id} {self.kind} {self.status}>'
+
+	def to_dict(self):
+		return {
+			'id': self.id,
+			'kind': self.kind,
+			'status': self.status,
+			'created_at': self.created_at.isoformat(),
+			'started_at': self.started_at.isoformat() if self.started_at else None,
+			'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+			'error': self.error,
+		}
+
+
+class ReportSnapshot(db.Model):
+	"""A precomputed report payload, stored as JSON under a cache-style key."""
+	__tablename__ = 'report_snapshots'
+	__table_args__ = (
+		db.Index('ix_report_snapshots_key', 'key', 'id'),
+	)
+	id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+	key = db.Column(db.String(100), nullable=False)
+	payload = db.Column(db.Text, nullable=False)
+	created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+	job_id = db.Column(db.Integer, nullable=True)
+
+	def __repr__(self):
+		return f'<ReportSnapshot {self.id} {self.key} at {self.created_at}>'
+
+
+_BALANCE_STATEMENTS = None
+
+
+def _balance_statements():
+	"""Build (update, insert, prune) statements for stock_balances once."""
+	global _BALANCE_STATEMENTS
+	if _BALANCE_STATEMENTS is None:
+		from sqlalchemy import bindparam
+		table = StockBalance.__table__
+		match = (table.c.product_id == bindparam('p')) & (table.c.location_id == bindparam('l'))
+		_BALANCE_STATEMENTS = (
+			table.update().where(match).values(qty=table.c.qty + bindparam('delta')),
+			table.insert(),
+			table.delete().where(match & (table.c.qty == 0)),
+		)
+	return _BALANCE_STATEMENTS
+
+
+_DEBIT_STATEMENTS = None
+
+
+def _debit_statements():
+	"""Build (conditional debit, prune) statements for stock_balances once."""
+	global _DEBIT_STATEMENTS
+	if _DEBIT_STATEMENTS is None:
+		from sqlalchemy import bindparam
+		table = StockBalance.__table__
+		match = (table.c.product_id == bindparam('p')) & (table.c.location_id == bindparam('l'))
+		_DEBIT_STATEMENTS = (
+			table.update().where(match & (table.c.qty >= bindparam('qty'))).values(qty=table.c.qty - bindparam('qty')),
+			table.delete().where(match & (table.c.qty == 0)),
+		)
+	return _DEBIT_STATEMENTS
+
+
+_ROLLUP_STATEMENTS = None
+
+
+def _rollup_statements():
+	"""Build (update, insert, prune) statements for daily_movement_stats once."""
+	global _ROLLUP_STATEMENTS
+	if _ROLLUP_STATEMENTS is None:
+		from sqlalchemy import bindparam
+		table = DailyMovementStat.__table__
+		match = ((table.c.day == bindparam('d')) & (table.c.product_id == bindparam('p'))
+				 & (table.c.location_id == bindparam('l')))
+		_ROLLUP_STATEMENTS = (
+			table.update().where(match).values(
+				in_qty=table.c.in_qty + bindparam('in_qty'),
+				out_qty=table.c.out_qty + bindparam('out_qty'),
+				movement_count=table.c.movement_count + bindparam('count'),
+				moved_qty=table.c.moved_qty + bindparam('moved')),
+			table.insert(),
+			table.delete().where(match & (table.c.in_qty == 0) & (table.c.out_qty == 0)),
+		)
+	return _ROLLUP_STATEMENTS
+
+
+def _pair_candidates(table, pairs):
+	"""Filter for rows that may be among the (product_id, location_id) pairs:
+	product_id IN (...) AND location_id IN (...), which SQLite answers from the
+	primary key (a row-value IN list would scan the table). Callers drop the
+	rows that are not actually in pairs."""
+	return table.c.product_id.in_({p for p, _ in pairs}) & table.c.location_id.in_({l for _, l in pairs})
+
+
+@event.listens_for(InventoryCounter.__table__, 'after_create')
+def _seed_counters(target, connection, **kw):
+	# Databases built with create_all() start empty, so every counter is zero
+	connection.execute(target.insert(), [{'name': name, 'value': 0} for name in InventoryCounter.NAMES])
+
+
+@event.listens_for(ProductMovement, 'after_insert')
+def _movement_inserted(mapper, connection, target):
+	active = 0
+	if target.from_location_id:
+		active += StockBalance.debit(connection, target.product_id, target.from_location_id, target.qty)
+	active += StockBalance.apply_delta(connection, target.product_id, target.to_location_id, target.qty)
+	DailyMovementStat.apply_movements(connection, [target])
+	StockCheckpoint.discard_after(connection, target.timestamp)
+	InventoryCounter.bump(connection, movements=1, active_balances=active)
+	StockAlert.evaluate(connection, [(target.product_id, target.from_location_id), (target.product_id, target.to_location_id)])
+
+
+@event.listens_for(ProductMovement, 'after_delete')
+def _movement_deleted(mapper, connection, target):
+	# Reversing a movement takes its units back out of the destination, so
+	# that side is a checked debit like any other
+	active = 0
+	if target.to_location_id:
+		active += StockBalance.debit(connection, target.product_id, target.to_location_id, target.qty)
+	active += StockBalance.apply_delta(connection, target.product_id, target.from_location_id, target.qty)
+	DailyMovementStat.apply_movements(connection, [target], sign=-1)
+	StockCheckpoint.discard_after(connection, target.timestamp)
+	InventoryCounter.bump(connection, movements=-1, active_balances=active)
+	StockAlert.evaluate(connection, [(target.product_id, target.from_location_id), (target.product_id, target.to_location_id)])
+
+
+@event.listens_for(Product, 'after_insert')
+def _product_inserted(mapper, connection, target):
+	InventoryCounter.bump(connection, products=1)
+
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, target):
+	InventoryCounter.bump(connection, products=-1)
+
+
+@event.listens_for(Location, 'after_insert')
+def _location_inserted(mapper, connection, target):
+	InventoryCounter.bump(connection, locations=1)
+
+
+@event.listens_for(Location, 'after_delete')
+def _location_deleted(mapper, connection, target):
+	InventoryCounter.bump(connection, locations=-1)
@@ -0,0 +1,126 @@
+"""Read/write split: report, chart, export and listing reads on a replica.
+
+With DATABASE_REPLICA_URL set, views decorated with @replica_reads send their
+plain SELECTs to the read-only 'replica' bind on GET requests, so long scans
+stay off the primary's connection pool and, on SQLite, its write lock. Writes,
+stock checks and every other view use the primary (see RoutingSession).
+
+DATABASE_REPLICA_URL is a database URL, or 'readonly' for a second, read-only
+(mode=ro) connection to the primary SQLite file, which sees every commit at
+once. A separate SQLite file can be kept as a copy of the primary, refreshed
+with SQLite's backup API every REPLICA_COPY_INTERVAL seconds or by
+'flask replica refresh'; pooled connections move to each new copy.
+
+A copy or a server replica trails the primary. For read-your-writes, a client
+that has just written reads from the primary for REPLICA_READ_YOUR_WRITES
+seconds (tracked in its session cookie), and within a request every read
+after a write stays on the primary. Only writes through db.session count:
+queuing a background job (a snapshot refresh from a report view) is
+bookkeeping on the job queue's own connection. A 'readonly' replica is the
+primary file and never trails it, so it sets no cookie.
+"""
+import os
+import sqlite3
+import time
+from functools import wraps
+from flask import current_app, request, session
+from . import db
+from .database import REPLICA_BIND, sqlite_file
+from .jobs import job_handler, job_queue
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReadReplica:
+	"""Flask extension recording where the replica lives and marking clients
+	that wrote, for read-your-writes."""
+
+	def init_app(self, app):
+		# The replica holds no tables of its own: keep create_all() and
+		# drop_all() off it
+		db.metadatas.pop(REPLICA_BIND, None)
+		with app.app_context():
+			engine = db.engines.get(REPLICA_BIND)
+			path = sqlite_file(engine) if engine is not None else None
+			primary = sqlite_file(db.engines[None])
+		app.extensions['read_replica'] = {
+			'enabled': engine is not None,
+			# A separate SQLite file is a copy maintained from the primary
+			'copy_path': path if path and primary and path != primary else None,
+		}
+		if engine is None or (path is not None and path == primary):
+			return  # no replica, or one that sees every commit at once
+
+		@app.after_request
+		def _remember_write(response):
+			window = app.config['REPLICA_READ_YOUR_WRITES']
+			if window > 0 and db.session.info.get('wrote_primary'):
+				session['read_primary_until'] = time.time() + window
+			return response
+
+
+read_replica = ReadReplica()
+
+
+def replica_reads(view):
+	"""Route the view's plain SELECTs to the replica for the rest of the
+	request (GET and HEAD only; the request's own writes still go to the primary)."""
+	@wraps(view)
+	def wrapper(*args, **kwargs):
+		if use_replica():
+			db.session.info['read_replica'] = True
+		return view(*args, **kwargs)
+	return wrapper
+
+
+def use_replica():
+	"""True when this request may read from the replica."""
+	state = current_app.extensions['read_replica']
+	if not state['enabled'] or request.method not in READ_METHODS:
+		return False
+	if session.get('read_primary_until', 0) > time.time():
+		return False  # read-your-writes after this client's own change
+	return state['copy_path'] is None or os.path.exists(state['copy_path'])
+
+
+def copy_path():
+	"""Path of the replica copy maintained from the primary, or None."""
+	return current_app.extensions['read_replica']['copy_path']
+
+
+def refresh_copy():
+	"""Copy the primary into the replica file with SQLite's online backup and
+	swap it in atomically. Returns False when there is no copy to maintain."""
+	target = copy_path()
+	if target is None:
+		return False
+	temp = f'{target}.{os.getpid()}.tmp'
+	source = db.engines[None].raw_connection()
+	try:
+		copy = sqlite3.connect(temp)
+		try:
+			source.driver_connection.backup(copy)
+			# Readers open the copy read-only, which needs a rollback journal
+			copy.execute('PRAGMA journal_mode=DELETE')
+		finally:
+			copy.close()
+	finally:
+		source.close()
+	os.replace(temp, target)
+	return True
+
+
+def is_due(interval):
+	"""True when the replica copy is missing or older than interval seconds."""
+	target = copy_path()
+	if target is None:
+		return False
+	return not os.path.exists(target) or time.time() - os.path.getmtime(target) >= interval
+
+
+job_queue.schedule('replica_copy', 'REPLICA_COPY_INTERVAL', is_due)
+
+
+@job_handler('replica_copy')
+def refresh_copy_job(job_id=None):
+	refresh_copy()
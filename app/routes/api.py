@@ -0,0 +1,150 @@
+from flask import Blueprint, request, jsonify, abort
+from ..models import ProductMovement, Product, Location, ReorderThreshold, StockAlert
+from ..replica import replica_reads
+from ..search import search_query, paginate_by_name
+from ..stock import run_with_retry
+from .reports import alert_filters
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+MAX_PAIRS = 5000
+MAX_FILTER_IDS = 1000
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 200
+
+
+@bp.route('/stock', methods=['POST'])
+def stock_lookup():
+	"""Batch stock lookup.
+
+	Body is JSON with either "pairs": [[product_id, location_id], ...] (or
+	objects with those keys), or a filter of "product_ids" and/or
+	"location_ids". Responds with {"stock": [[product_id, location_id, qty], ...]};
+	requested pairs are returned in order with 0 for no stock, filters return
+	every pair that holds stock.
+	"""
+	body = request.get_json(silent=True)
+	if not isinstance(body, dict):
+		abort(400, 'Expected a JSON object')
+	if 'pairs' in body:
+		pairs = parse_pairs(body['pairs'])
+		balances = ProductMovement.balances_for_pairs(pairs)
+		return jsonify({'stock': [[p, l, balances[(p, l)]] for p, l in pairs]})
+
+	product_ids = id_list(body, 'product_ids', 'product_id')
+	location_ids = id_list(body, 'location_ids', 'location_id')
+	if not product_ids and not location_ids:
+		abort(400, 'Provide pairs, product_ids or location_ids')
+	rows = ProductMovement.balances_matching(product_ids, location_ids)
+	return jsonify({'stock': [[r.product_id, r.location_id, r.qty] for r in rows]})
+
+
+def parse_pairs(raw):
+	"""Validate a list of [product_id, location_id] lists or {product_id, location_id} objects"""
+	if not isinstance(raw, list) or len(raw) > MAX_PAIRS:
+		abort(400, f'pairs must be a list of at most {MAX_PAIRS} items')
+	pairs = []
+	for item in raw:
+		if isinstance(item, dict):
+			item = (item.get('product_id'), item.get('location_id'))
+		if not isinstance(item, (list, tuple)) or len(item) != 2 or not all(isinstance(v, str) and v for v in item):
+			abort(400, 'Each pair needs a product_id and a location_id')
+		pairs.append(tuple(item))
+	return pairs
+
+
+def id_list(body, plural, singular):
+	"""Read a list of ids (or a single id) from the request body"""
+	ids = body.get(plural)
+	if ids is None:
+		ids = [body[singular]] if body.get(singular) else []
+	if not isinstance(ids, list) or len(ids) > MAX_FILTER_IDS or not all(isinstance(v, str) for v in ids):
+		abort(400, f'{plural} must be a list of at most {MAX_FILTER_IDS} ids')
+	return ids
+
+
+@bp.route('/products')
+@replica_reads
+def search_products():
+	"""Active products whose id, name or description contains ?q=, by name, with name cursor paging"""
+	products, next_cursor = catalogue_page(Product)
+	return jsonify({
+		'products': [{'id': p.id, 'name': p.name, 'description': p.description, 'active': p.active} for p in products],
+		'next_cursor': next_cursor
+	})
+
+
+@bp.route('/locations')
+@replica_reads
+def search_locations():
+	"""Active locations whose id or name contains ?q=, by name, with name cursor paging"""
+	locations, next_cursor = catalogue_page(Location)
+	return jsonify({
+		'locations': [{'id': l.id, 'name': l.name, 'active': l.active} for l in locations],
+		'next_cursor': next_cursor
+	})
+
+
+def catalogue_page(model):
+	"""Read q, cursor, limit and inactive=1 from the query string and return one page"""
+	return paginate_by_name(search_query(model, request.args.get('q'), request.args.get('inactive') == '1'), model,
+							request.args.get('cursor'), page_limit())
+
+
+def page_limit():
+	"""Read ?limit=, capped at MAX_SEARCH_LIMIT"""
+	try:
+		limit = min(int(request.args.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+	except ValueError:
+		abort(400, 'limit must be an integer')
+	return max(limit, 1)
+
+
+@bp.route('/alerts')
+@replica_reads
+def list_alerts():
+	"""Open reorder alerts, optionally for one product_id, location_id or status
+	(out/low), ordered by product and location with after_product/after_location paging"""
+	alerts, next_cursor = StockAlert.page(**alert_filters(request.args), limit=page_limit())
+	return jsonify({
+		'alerts': [{
+			'product_id': a.product_id,
+			'product': a.product_name,
+			'location_id': a.location_id,
+			'location': a.location_name,
+			'qty': a.qty,
+			'threshold': a.threshold,
+			'status': 'out' if a.qty <= 0 else 'low',
+			'opened_at': a.opened_at.isoformat(),
+			'updated_at': a.updated_at.isoformat(),
+		} for a in alerts],
+		'counts': StockAlert.counts(),
+		'next_cursor': {'after_product': next_cursor[0], 'after_location': next_cursor[1]} if next_cursor else None
+	})
+
+
+@bp.route('/reorder-thresholds', methods=['POST'])
+def set_reorder_thresholds():
+	"""Set reorder points in bulk.
+
+	Body is JSON {"thresholds": [{"product_id", "location_id", "threshold"}, ...]};
+	a null threshold removes the reorder point. Only the alerts of the listed
+	pairs are re-evaluated. Responds with {"stored", "removed", "counts"}.
+	"""
+	body = request.get_json(silent=True)
+	if not isinstance(body, dict) or not isinstance(body.get('thresholds'), list) or len(body['thresholds']) > MAX_PAIRS:
+		abort(400, f'thresholds must be a list of at most {MAX_PAIRS} items')
+	thresholds = {}
+	for item in body['thresholds']:
+		if not isinstance(item, dict) or not all(isinstance(item.get(k), str) and item[k] for k in ('product_id', 'location_id')):
+			abort(400, 'Each threshold needs a product_id and a location_id')
+		threshold = item.get('threshold')
+		if threshold is not None and (not isinstance(threshold, int) or isinstance(threshold, bool) or threshold < 0):
+			abort(400, 'threshold must be a whole number of 0 or more, or null')
+		thresholds[(item['product_id'], item['location_id'])] = threshold
+	unknown_products = {p for p, _ in thresholds} - set(Product.name_map(p for p, _ in thresholds))
+	unknown_locations = {l for _, l in thresholds} - set(Location.name_map(l for _, l in thresholds))
+	if unknown_products or unknown_locations:
+		abort(400, f'Unknown ids: {", ".join(sorted(unknown_products | unknown_locations)[:20])}')
+	stored, removed = run_with_retry(lambda: ReorderThreshold.set_many(thresholds))
+	return jsonify({'stored': stored, 'removed': removed, 'counts': StockAlert.counts()})
@@ -0,0 +1,31 @@
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from ..events import live_events
+
+bp = Blueprint('events', __name__)
+
+BUSY_RETRY_SECONDS = 30
+
+
+@bp.route('/events')
+def stream_events():
+	"""Server-Sent Events stream of inventory deltas ('inventory') and 'refresh'
+	hints, resuming after the Last-Event-ID header or ?last_id. Answers 503 when
+	EVENTS_MAX_STREAMS streams are already holding server threads."""
+	config = current_app.config
+	broker = live_events.broker
+	if not broker.subscribe():
+		response = Response(f'retry: {BUSY_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream')
+		response.headers['Retry-After'] = str(BUSY_RETRY_SECONDS)
+		return response
+	stream = broker.stream(last_event_id(), config['EVENTS_KEEPALIVE'], config['EVENTS_STREAM_SECONDS'])
+	response = Response(stream_with_context(stream), mimetype='text/event-stream')
+	# Released when the server closes the response, even if the stream never started
+	response.call_on_close(broker.unsubscribe)
+	response.headers['Cache-Control'] = 'no-cache'
+	response.headers['X-Accel-Buffering'] = 'no'  # stop nginx buffering the stream
+	return response
+
+
+def last_event_id():
+	"""The id of the last event the client saw, or None for a new stream"""
+	return request.headers.get('Last-Event-ID') or request.args.get('last_id') or None
@@ -1,14 +1,26 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from .. import db
-from ..models import Location
+from ..models import Location, InventoryCounter, ProductMovement, StockBalance
+from ..catalogue import delete_locations, set_active
+from ..replica import replica_reads
+from ..search import search_query, paginate_by_name
+from ..stock import run_with_retry
+from .products import bulk_request
 
 bp = Blueprint('locations', __name__, url_prefix='/locations')
 
+PAGE_SIZE = 50
+RECENT_MOVEMENTS = 10
+
 
 @bp.route('/')
+@replica_reads
 def list_locations():
-	locations = Location.query.order_by(Location.name).all()
-	return render_template('locations/list.html', locations=locations)
+	q = request.args.get('q', '').strip()
+	inactive = request.args.get('inactive') == '1'
+	locations, next_cursor = paginate_by_name(search_query(Location, q, inactive), Location, request.args.get('cursor'), PAGE_SIZE)
+	return render_template('locations/list.html', locations=locations, next_cursor=next_cursor,
+						   filters=request.args, q=q, inactive=inactive, total=InventoryCounter.counts()['locations'])
 
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -42,15 +54,35 @@ def edit_location(lid):
 
 @bp.route('/<lid>')
 def view_location(lid):
+	"""Stock held at one location, paged by product id, with its recent movements"""
 	location = Location.query.get_or_404(lid)
-	return render_template('locations/view.html', location=location)
+	default_threshold = current_app.config['LOW_STOCK_THRESHOLD']
+	stock, next_cursor = StockBalance.slice_page(location_id=lid, after=request.args.get('cursor'), limit=PAGE_SIZE)
+	return render_template('locations/view.html', location=location, stock=stock, next_cursor=next_cursor,
+						   filters=request.args, default_threshold=default_threshold,
+						   totals=StockBalance.slice_totals(location_id=lid, default_threshold=default_threshold),
+						   recent=ProductMovement.recent(location_id=lid, limit=RECENT_MOVEMENTS))
 
 
 @bp.route('/<lid>/delete', methods=['POST'])
 def delete_location(lid):
-	location = Location.query.get_or_404(lid)
-	db.session.delete(location)
-	db.session.commit()
-	flash('Location deleted')
+	Location.query.get_or_404(lid)
+	# Transfers to or from other locations keep their other side
+	summary = run_with_retry(lambda: delete_locations([lid]))
+	flash(f'Location deleted: {summary["movements_deleted"]} movements removed, {summary["movements_detached"]} transfers detached')
 	return redirect(url_for('locations.list_locations'))
 
+
+@bp.route('/<lid>/<any(activate, deactivate):action>', methods=['POST'])
+def toggle_location(lid, action):
+	"""Deactivating hides the location from lists and pickers; its ledger is kept"""
+	location = Location.query.get_or_404(lid)
+	run_with_retry(lambda: set_active(Location, [lid], action == 'activate'))
+	flash(f'Location {location.name} {action}d')
+	return redirect(url_for('locations.list_locations', inactive=request.args.get('inactive') or None))
+
+
+@bp.route('/bulk', methods=['POST'])
+def bulk_locations():
+	"""Delete, deactivate or activate the selected locations"""
+	return bulk_request(Location, 'locations.list_locations')
@@ -1,14 +1,55 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 from .. import db
 from ..models import ProductMovement, Product, Location
+from ..replica import replica_reads
+from ..stock import InsufficientStock, run_with_retry
 
 bp = Blueprint('movements', __name__, url_prefix='/movements')
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_LOCATION = 'CHN-MAIN'
+
 
 @bp.route('/')
+@replica_reads
 def list_movements():
-	movements = ProductMovement.query.order_by(ProductMovement.timestamp.desc()).limit(200).all()
-	return render_template('movements/list.html', movements=movements)
+	filters = movement_filters(request.args)
+	movements, next_cursor = paginate_movements(filter_movements(**filters), request.args.get('cursor'), PAGE_SIZE)
+	# Filters are picked by typeahead; only the selected names are loaded
+	product = db.session.get(Product, filters['product_id']) if filters['product_id'] else None
+	location = db.session.get(Location, filters['location_id']) if filters['location_id'] else None
+	return render_template('movements/list.html', movements=movements, next_cursor=next_cursor,
+						   filters=request.args, product=product, location=location)
+
+
+@bp.route('/api')
+@replica_reads
+def api_movements():
+	"""JSON ledger API with (timestamp, id) cursor pagination"""
+	try:
+		limit = min(int(request.args.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+	except ValueError:
+		return jsonify({'error': 'limit must be an integer'}), 400
+	filters = movement_filters(request.args)
+	movements, next_cursor = paginate_movements(filter_movements(**filters), request.args.get('cursor'), max(limit, 1))
+	return jsonify({
+		'movements': [movement_to_dict(m) for m in movements],
+		'next_cursor': next_cursor
+	})
+
+
+@bp.route('/export.csv')
+@replica_reads
+def export_csv():
+	"""Stream the movement ledger as CSV with the same filters as the list view"""
+	from ..export import MOVEMENT_HEADER, movement_rows, csv_lines
+	rows = movement_rows(**movement_filters(request.args))
+	return Response(stream_with_context(csv_lines(MOVEMENT_HEADER, rows)), mimetype='text/csv',
+					headers={'Content-Disposition': 'attachment; filename=movements.csv'})
 
 
 @bp.route('/stock-info')
@@ -24,10 +65,31 @@ def stock_info():
 	return jsonify({'stock': stock})
 
 
+@bp.route('/bulk', methods=['POST'])
+def bulk_import():
+	"""Import movements from an uploaded CSV or JSON-lines file"""
+	import io
+	from ..importer import import_movements, detect_format
+	upload = request.files.get('file')
+	if upload is not None:
+		stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+		fmt = request.args.get('format') or detect_format(upload.filename or '')
+	else:
+		stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+		fmt = request.args.get('format') or ('jsonl' if 'json' in (request.mimetype or '') else 'csv')
+	if fmt not in ('csv', 'jsonl'):
+		return jsonify({'error': 'format must be csv or jsonl'}), 400
+	try:
+		batch_size = int(request.args.get('batch_size', 5000))
+	except ValueError:
+		return jsonify({'error': 'batch_size must be an integer'}), 400
+	return jsonify(import_movements(stream, fmt, batch_size=max(batch_size, 1)))
+
+
 @bp.route('/create', methods=['GET', 'POST'])
 def create_movement():
-	products = Product.query.order_by(Product.name).all()
-	locations = Location.query.order_by(Location.name).all()
+	# Products and locations are picked by typeahead; only the default source is preloaded
+	default_location = db.session.get(Location, DEFAULT_LOCATION)
 	if request.method == 'POST':
 		product_id = request.form['product_id']
 		from_location_id = request.form.get('from_location_id') or None
@@ -39,37 +101,135 @@ def create_movement():
 		elif not from_location_id and not to_location_id:
 			flash('Specify at least a from or to location', 'error')
 		else:
-			# Check if we have enough stock when moving FROM a location
-			if from_location_id:
-				current_stock = get_current_stock(product_id, from_location_id)
-				if current_stock < qty:
-					product = Product.query.get(product_id)
-					location = Location.query.get(from_location_id)
-					flash(f'Insufficient stock! Current stock of {product.name} at {location.name}: {current_stock} units. Cannot move {qty} units.', 'error')
-					return render_template('movements/form.html', products=products, locations=locations, movement=None)
+			# The debit from the source location is checked atomically on insert
+			def record():
+				mv = ProductMovement(product_id=product_id, from_location_id=from_location_id, to_location_id=to_location_id, qty=qty)
+				db.session.add(mv)
+				return mv
 			
-			mv = ProductMovement(product_id=product_id, from_location_id=from_location_id, to_location_id=to_location_id, qty=qty)
-			db.session.add(mv)
-			db.session.commit()
+			try:
+				run_with_retry(record)
+			except InsufficientStock as exc:
+				flash(insufficient_stock_message(exc), 'error')
+				return render_template('movements/form.html', default_location=default_location, movement=None)
 			flash('Movement recorded successfully', 'success')
 			return redirect(url_for('movements.list_movements'))
-	return render_template('movements/form.html', products=products, locations=locations, movement=None)
+	return render_template('movements/form.html', default_location=default_location, movement=None)
 
 
 def get_current_stock(product_id, location_id):
 	"""Get current stock for a product at a specific location"""
-	balance_data = ProductMovement.balance_query()
-	for item in balance_data:
-		if item['product_id'] == product_id and item['location_id'] == location_id:
-			return item['qty']
-	return 0
+	return ProductMovement.balance_for(product_id, location_id)
+
+
+def insufficient_stock_message(exc, action='move'):
+	"""Format an InsufficientStock error with product and location names"""
+	product = Product.query.get(exc.product_id)
+	location = Location.query.get(exc.location_id)
+	return (f'Insufficient stock! Current stock of {product.name if product else exc.product_id} at '
+			f'{location.name if location else exc.location_id}: {exc.available} units. Cannot {action} {exc.requested} units.')
 
 
 @bp.route('/<int:mid>/delete', methods=['POST'])
 def delete_movement(mid):
-	mv = ProductMovement.query.get_or_404(mid)
-	db.session.delete(mv)
-	db.session.commit()
+	from ..archive import is_opening_movement
+	movement = db.session.get(ProductMovement, mid)
+	if movement is None:
+		abort(404)
+	if is_opening_movement(movement):
+		flash('Opening balances written by a ledger archive cannot be deleted', 'error')
+		return list_movements(), 400
+
+	# Reversing the movement debits its destination, checked atomically like an insert
+	def remove():
+		# Claim the row with a write first: it takes the write lock, so a
+		# concurrent delete of the same movement cannot load it too and reverse
+		# it twice (its DELETE would match no row, but the events still run)
+		table = ProductMovement.__table__
+		if not db.session.execute(table.update().where(table.c.id == mid).values(id=table.c.id)).rowcount:
+			abort(404)
+		db.session.delete(db.session.get(ProductMovement, mid))
+	
+	try:
+		run_with_retry(remove)
+	except InsufficientStock as exc:
+		flash(insufficient_stock_message(exc, 'take back'), 'error')
+		return redirect(url_for('movements.list_movements'))
 	flash('Movement deleted')
 	return redirect(url_for('movements.list_movements'))
 
+
+def movement_filters(args):
+	"""Read product, location and date range filters from request args"""
+	try:
+		start = datetime.strptime(args['start'], '%Y-%m-%d') if args.get('start') else None
+		end = datetime.strptime(args['end'], '%Y-%m-%d') + timedelta(days=1) if args.get('end') else None
+	except ValueError:
+		abort(400, 'Dates must be YYYY-MM-DD')
+	return {
+		'product_id': args.get('product_id') or None,
+		'location_id': args.get('location_id') or None,
+		'start': start,
+		'end': end
+	}
+
+
+def filter_movements(product_id=None, location_id=None, start=None, end=None, query=None):
+	"""Restrict a movement query (ProductMovement.query by default) to the given
+	product, location and [start, end) range"""
+	if query is None:
+		query = ProductMovement.query
+	if product_id:
+		query = query.filter(ProductMovement.product_id == product_id)
+	if location_id:
+		query = query.filter(or_(ProductMovement.from_location_id == location_id,
+								 ProductMovement.to_location_id == location_id))
+	if start:
+		query = query.filter(ProductMovement.timestamp >= start)
+	if end:
+		query = query.filter(ProductMovement.timestamp < end)
+	return query
+
+
+def paginate_movements(query, cursor, limit):
+	"""Return (movements, next_cursor) for the page after cursor, newest first.
+	Pages are addressed by the (timestamp, id) of the last row seen, so every
+	page is an index range scan no matter how deep into history it is.
+	"""
+	if cursor:
+		try:
+			ts, mid = cursor.rsplit('_', 1)
+			ts, mid = datetime.fromisoformat(ts), int(mid)
+		except ValueError:
+			abort(400, 'Invalid cursor')
+		query = query.filter(or_(
+			ProductMovement.timestamp < ts,
+			and_(ProductMovement.timestamp == ts, ProductMovement.id < mid)))
+	movements = (query
+		.options(joinedload(ProductMovement.product),
+				 joinedload(ProductMovement.from_location),
+				 joinedload(ProductMovement.to_location))
+		.order_by(ProductMovement.timestamp.desc(), ProductMovement.id.desc())
+		.limit(limit + 1)
+		.all())
+	next_cursor = None
+	if len(movements) > limit:
+		movements = movements[:limit]
+		last = movements[-1]
+		next_cursor = f'{last.timestamp.isoformat()}_{last.id}'
+	return movements, next_cursor
+
+
+def movement_to_dict(m):
+	"""Serialize an eager-loaded movement for the JSON API"""
+	return {
+		'id': m.id,
+		'timestamp': m.timestamp.isoformat(),
+		'product_id': m.product_id,
+		'product_name': m.product.name if m.product else None,
+		'from_location_id': m.from_location_id,
+		'from_location_name': m.from_location.name if m.from_location else None,
+		'to_location_id': m.to_location_id,
+		'to_location_name': m.to_location.name if m.to_location else None,
+		'qty': m.qty
+	}
@@ -1,14 +1,70 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, abort
 from .. import db
-from ..models import Product
+from ..catalogue import ACTIONS, MAX_IDS, apply_action, delete_products, set_active
+from ..models import Product, Location, InventoryCounter, ProductMovement, StockBalance
+from ..replica import replica_reads
+from ..search import search_query, paginate_by_name
+from ..stock import InsufficientStock, run_with_retry
+from .movements import insufficient_stock_message, DEFAULT_LOCATION
 
 bp = Blueprint('products', __name__, url_prefix='/products')
 
+PAGE_SIZE = 50
+RECENT_MOVEMENTS = 10
+
+
+def parse_threshold(value):
+	"""Parse the optional low-stock threshold field; blank means the default. Raises ValueError."""
+	value = (value or '').strip()
+	if not value:
+		return None
+	threshold = int(value)
+	if threshold < 0:
+		raise ValueError(value)
+	return threshold
+
+
+def bulk_request(model, list_endpoint):
+	"""Run a bulk catalogue action from a form (action plus repeated ids) or a
+	JSON body {"action": ..., "ids": [...]}. JSON gets a JSON summary back."""
+	if request.is_json:
+		body = request.get_json(silent=True)
+		if not isinstance(body, dict):
+			abort(400, 'Expected a JSON object')
+		action, ids = body.get('action'), body.get('ids')
+	else:
+		action, ids = request.form.get('action'), request.form.getlist('ids')
+	inactive = request.args.get('inactive') or None
+	if action not in ACTIONS:
+		error = f'action must be one of {", ".join(ACTIONS)}'
+	elif not isinstance(ids, list) or not ids or len(ids) > MAX_IDS or not all(isinstance(v, str) for v in ids):
+		error = f'Select between 1 and {MAX_IDS} items'
+	else:
+		error = None
+	if error:
+		if request.is_json:
+			abort(400, error)
+		flash(error, 'error')
+		return redirect(url_for(list_endpoint, inactive=inactive))
+
+	summary = run_with_retry(lambda: apply_action(model, action, ids))
+	if request.is_json:
+		return jsonify(summary)
+	if action == 'delete':
+		flash(f'Deleted {summary["deleted"]} items and {summary["movements_deleted"]} related movements', 'success')
+	else:
+		flash(f'{action.capitalize()}d {summary["changed"]} items', 'success')
+	return redirect(url_for(list_endpoint, inactive=inactive))
+
 
 @bp.route('/')
+@replica_reads
 def list_products():
-	products = Product.query.order_by(Product.name).all()
-	return render_template('products/list.html', products=products)
+	q = request.args.get('q', '').strip()
+	inactive = request.args.get('inactive') == '1'
+	products, next_cursor = paginate_by_name(search_query(Product, q, inactive), Product, request.args.get('cursor'), PAGE_SIZE)
+	return render_template('products/list.html', products=products, next_cursor=next_cursor,
+						   filters=request.args, q=q, inactive=inactive, total=InventoryCounter.counts()['products'])
 
 
 @bp.route('/create', methods=['GET', 'POST'])
@@ -30,69 +86,82 @@ def create_product():
 			except ValueError:
 				flash('Initial stock must be a valid number', 'error')
 				return render_template('products/form.html', product=None)
+			try:
+				threshold = parse_threshold(request.form.get('low_stock_threshold'))
+			except ValueError:
+				flash('Low-stock threshold must be a whole number of 0 or more', 'error')
+				return render_template('products/form.html', product=None)
 			
-			# Create the product
-			p = Product(id=pid, name=name, description=desc)
-			db.session.add(p)
+			def create():
+				# Create the product
+				db.session.add(Product(id=pid, name=name, description=desc, low_stock_threshold=threshold))
+				
+				# Add initial stock if specified
+				if initial_stock > 0 and initial_location:
+					# Create an initial stock movement (incoming to location)
+					db.session.add(ProductMovement(
+						product_id=pid,
+						from_location_id=None,  # No source location (initial stock)
+						to_location_id=initial_location,
+						qty=initial_stock
+					))
 			
-			# Add initial stock if specified
+			run_with_retry(create)
 			if initial_stock > 0 and initial_location:
-				from ..models import ProductMovement
-				# Create an initial stock movement (incoming to location)
-				mv = ProductMovement(
-					product_id=pid,
-					from_location_id=None,  # No source location (initial stock)
-					to_location_id=initial_location,
-					qty=initial_stock
-				)
-				db.session.add(mv)
 				flash_msg = f'Product created with {initial_stock} units added to initial location'
 			else:
 				flash_msg = 'Product created successfully'
-			
-			db.session.commit()
 			flash(flash_msg, 'success')
 			return redirect(url_for('products.list_products'))
 	
-	# Get locations for the form
-	from ..models import Location
-	locations = Location.query.order_by(Location.name).all()
-	return render_template('products/form.html', product=None, locations=locations)
+	# Locations are picked by typeahead; only the default is preloaded
+	return render_template('products/form.html', product=None, default_location=db.session.get(Location, DEFAULT_LOCATION))
 
 
 @bp.route('/<pid>/edit', methods=['GET', 'POST'])
 def edit_product(pid):
-	from ..models import Location, ProductMovement
 	product = Product.query.get_or_404(pid)
-	locations = Location.query.order_by(Location.name).all()
+	default_location = db.session.get(Location, DEFAULT_LOCATION)
 	
 	# Get current stock information for this product
-	balance_data = ProductMovement.balance_query()
-	current_stock = []
-	for item in balance_data:
-		if item['product_id'] == pid:
-			location = Location.query.get(item['location_id']) if item['location_id'] else None
-			current_stock.append({
-				'location_id': item['location_id'],
-				'location_name': location.name if location else 'Unknown',
-				'quantity': item['qty']
-			})
+	current_stock = [
+		{
+			'location_id': item['location_id'],
+			'location_name': item['location'] if item['location'] != 'N/A' else 'Unknown',
+			'quantity': item['qty']
+		}
+		for item in ProductMovement.named_balance_query(product_id=pid)
+	]
 	
 	if request.method == 'POST':
-		product.name = request.form['name'].strip()
-		product.description = request.form.get('description', '').strip()
+		messages = []
+		try:
+			threshold = parse_threshold(request.form.get('low_stock_threshold'))
+		except ValueError:
+			flash('Low-stock threshold must be a whole number of 0 or more', 'error')
+			return render_template('products/form.html', product=product, default_location=default_location, current_stock=current_stock)
 		
-		# Handle stock adjustment if provided
-		stock_action = request.form.get('stock_action')
-		if stock_action and stock_action in ['add', 'remove', 'transfer']:
-			stock_quantity = request.form.get('stock_quantity')
-			stock_location = request.form.get('stock_location')
-			transfer_to_location = request.form.get('transfer_to_location')
+		def update():
+			messages.clear()
+			product.name = request.form['name'].strip()
+			product.description = request.form.get('description', '').strip()
+			product.low_stock_threshold = threshold
 			
-			try:
-				stock_quantity = int(stock_quantity) if stock_quantity else 0
+			# Handle stock adjustment if provided
+			stock_action = request.form.get('stock_action')
+			if stock_action and stock_action in ['add', 'remove', 'transfer']:
+				stock_quantity = request.form.get('stock_quantity')
+				stock_location = request.form.get('stock_location')
+				transfer_to_location = request.form.get('transfer_to_location')
+				
+				try:
+					stock_quantity = int(stock_quantity) if stock_quantity else 0
+				except ValueError:
+					messages.append(('Invalid stock quantity', 'error'))
+					return
 				
 				if stock_quantity > 0 and stock_location:
+					# Removals and transfers are checked against stock atomically on insert
 					if stock_action == 'add':
 						# Add stock (incoming movement)
 						mv = ProductMovement(
@@ -102,7 +171,7 @@ def edit_product(pid):
 							qty=stock_quantity
 						)
 						db.session.add(mv)
-						flash(f'Added {stock_quantity} units to inventory', 'success')
+						messages.append((f'Added {stock_quantity} units to inventory', 'success'))
 						
 					elif stock_action == 'remove':
 						# Remove stock (outgoing movement)
@@ -113,7 +182,7 @@ def edit_product(pid):
 							qty=stock_quantity
 						)
 						db.session.add(mv)
-						flash(f'Removed {stock_quantity} units from inventory', 'success')
+						messages.append((f'Removed {stock_quantity} units from inventory', 'success'))
 						
 					elif stock_action == 'transfer' and transfer_to_location:
 						# Transfer stock between locations
@@ -124,33 +193,52 @@ def edit_product(pid):
 							qty=stock_quantity
 						)
 						db.session.add(mv)
-						flash(f'Transferred {stock_quantity} units from {stock_location} to {transfer_to_location}', 'success')
-			except ValueError:
-				flash('Invalid stock quantity', 'error')
+						messages.append((f'Transferred {stock_quantity} units from {stock_location} to {transfer_to_location}', 'success'))
 		
-		db.session.commit()
+		try:
+			run_with_retry(update)
+		except InsufficientStock as exc:
+			flash(insufficient_stock_message(exc), 'error')
+			return render_template('products/form.html', product=product, default_location=default_location, current_stock=current_stock)
+		for message, category in messages:
+			flash(message, category)
 		flash('Product updated successfully', 'success')
 		return redirect(url_for('products.list_products'))
 		
-	return render_template('products/form.html', product=product, locations=locations, current_stock=current_stock)
+	return render_template('products/form.html', product=product, default_location=default_location, current_stock=current_stock)
 
 
 @bp.route('/<pid>')
 def view_product(pid):
+	"""Stock of one product at each location, paged by location id, with its recent movements"""
 	product = Product.query.get_or_404(pid)
-	return render_template('products/view.html', product=product)
+	default_threshold = current_app.config['LOW_STOCK_THRESHOLD']
+	stock, next_cursor = StockBalance.slice_page(product_id=pid, after=request.args.get('cursor'), limit=PAGE_SIZE)
+	return render_template('products/view.html', product=product, stock=stock, next_cursor=next_cursor,
+						   filters=request.args, default_threshold=default_threshold,
+						   totals=StockBalance.slice_totals(product_id=pid, default_threshold=default_threshold),
+						   recent=ProductMovement.recent(product_id=pid, limit=RECENT_MOVEMENTS))
 
 
 @bp.route('/<pid>/delete', methods=['POST'])
 def delete_product(pid):
-	try:
-		product = Product.query.get_or_404(pid)
-		# The cascade='all, delete-orphan' in the model will automatically delete related movements
-		db.session.delete(product)
-		db.session.commit()
-		flash('Product and all related movements deleted successfully', 'success')
-	except Exception as e:
-		db.session.rollback()
-		flash(f'Error deleting product: {str(e)}', 'error')
+	Product.query.get_or_404(pid)
+	# Bulk statements; the product's movements are never loaded into the session
+	summary = run_with_retry(lambda: delete_products([pid]))
+	flash(f'Product and {summary["movements_deleted"]} related movements deleted successfully', 'success')
 	return redirect(url_for('products.list_products'))
 
+
+@bp.route('/<pid>/<any(activate, deactivate):action>', methods=['POST'])
+def toggle_product(pid, action):
+	"""Deactivating hides the product from lists and pickers; its ledger is kept"""
+	product = Product.query.get_or_404(pid)
+	run_with_retry(lambda: set_active(Product, [pid], action == 'activate'))
+	flash(f'Product {product.name} {action}d', 'success')
+	return redirect(url_for('products.list_products', inactive=request.args.get('inactive') or None))
+
+
+@bp.route('/bulk', methods=['POST'])
+def bulk_products():
+	"""Delete, deactivate or activate the selected products"""
+	return bulk_request(Product, 'products.list_products')
@@ -1,162 +1,306 @@
-from flask import Blueprint, render_template, jsonify
-from collections import defaultdict
-from ..models import ProductMovement, Product, Location
+from flask import (Blueprint, render_template, request, current_app, Response, stream_with_context, abort, jsonify,
+				   flash, redirect, url_for)
+from hashlib import md5
+from .. import db, snapshots
+from ..analytics import BalanceFrame
+from ..cache import report_cache
+from ..jobs import job_queue
+from ..models import ProductMovement, Product, Location, ReorderThreshold, StockAlert, LedgerArchive
+from ..replica import replica_reads
+from ..stock import run_with_retry
 from sqlalchemy import func
 
 bp = Blueprint('reports', __name__, url_prefix='/reports')
 
+ALERTS_PAGE_SIZE = 50
+ALERT_STATUSES = ('out', 'low')
+
 
 @bp.route('/balance')
+@replica_reads
 def balance_report():
-	# Compute balance per product+location
-	rows = []
-	for rec in ProductMovement.balance_query():
-		product = Product.query.get(rec['product_id'])
-		location = Location.query.get(rec['location_id']) if rec['location_id'] else None
-		rows.append({
-			'product': product.name if product else rec['product_id'],
-			'product_id': rec['product_id'],
-			'location': location.name if location else 'N/A',
-			'location_id': rec['location_id'],
-			'qty': rec['qty']
-		})
-	rows.sort(key=lambda x: (x['product'], x['location']))
-	
-	# Prepare chart data
-	chart_data = prepare_chart_data(rows)
-	
-	return render_template('reports/balance.html', rows=rows, chart_data=chart_data)
+	as_of = request.args.get('as_of') or None
+	snapshot = None
+	if as_of:
+		instant = parse_as_of(as_of)
+		report = report_cache.get_or_set(f'balance_report:{as_of}', lambda: build_balance_report(instant))
+	else:
+		report, snapshot = current_report('balance_report', build_balance_report)
+	return render_template('reports/balance.html', rows=report['rows'], chart_data=report['chart_data'], as_of=as_of,
+						   snapshot_age=describe_age(snapshot))
+
+
+@bp.route('/balance.csv')
+@replica_reads
+def balance_csv():
+	"""Stream current balances as CSV, optionally for one product or location"""
+	from ..export import BALANCE_HEADER, balance_rows, csv_lines
+	rows = balance_rows(request.args.get('product_id') or None, request.args.get('location_id') or None)
+	return Response(stream_with_context(csv_lines(BALANCE_HEADER, rows)), mimetype='text/csv',
+					headers={'Content-Disposition': 'attachment; filename=balances.csv'})
 
 
 @bp.route('/charts')
+@replica_reads
 def charts_report():
-	# Get all balance data
-	balance_data = []
-	for rec in ProductMovement.balance_query():
-		product = Product.query.get(rec['product_id'])
-		location = Location.query.get(rec['location_id']) if rec['location_id'] else None
-		balance_data.append({
-			'product': product.name if product else rec['product_id'],
-			'product_id': rec['product_id'],
-			'location': location.name if location else 'N/A',
-			'location_id': rec['location_id'],
-			'qty': rec['qty']
-		})
-	
-	# Get movement trends
-	movement_trends = get_movement_trends()
-	
-	# Prepare comprehensive chart data
-	chart_data = prepare_comprehensive_chart_data(balance_data, movement_trends)
-	
-	return render_template('reports/charts.html', chart_data=chart_data)
+	range_, granularity = trend_params(request.args)
+	chart_data, snapshot = current_report(f'chart_data:{range_}:{granularity}',
+										  lambda: build_comprehensive_chart_data(range_, granularity))
+	return render_template('reports/charts.html', chart_data=chart_data, snapshot_age=describe_age(snapshot),
+						   trend_ranges=TREND_RANGES, trend_granularities=TREND_GRANULARITIES)
+
+
+@bp.route('/alerts', methods=['GET', 'POST'])
+@replica_reads
+def alerts_report():
+	"""Open reorder alerts from the maintained stock_alerts table; POST sets or clears a reorder point"""
+	if request.method == 'POST':
+		product_id = request.form.get('product_id', '').strip()
+		location_id = request.form.get('location_id', '').strip()
+		try:
+			threshold = parse_reorder_point(request.form.get('threshold'))
+		except ValueError:
+			flash('Reorder point must be a whole number of 0 or more', 'error')
+			return redirect(url_for('reports.alerts_report'))
+		if not db.session.get(Product, product_id) or not db.session.get(Location, location_id):
+			flash('Choose a product and a location', 'error')
+			return redirect(url_for('reports.alerts_report'))
+		run_with_retry(lambda: ReorderThreshold.set_many({(product_id, location_id): threshold}))
+		if threshold is None:
+			flash(f'Removed the reorder point for {product_id} at {location_id}', 'success')
+		else:
+			flash(f'{product_id} at {location_id} now reorders at {threshold} units', 'success')
+		return redirect(url_for('reports.alerts_report'))
+
+	alerts, next_cursor = StockAlert.page(**alert_filters(request.args), limit=ALERTS_PAGE_SIZE)
+	return render_template('reports/alerts.html', alerts=alerts, next_cursor=next_cursor,
+						   counts=StockAlert.counts(), filters=request.args)
 
 
 @bp.route('/api/chart-data')
+@replica_reads
 def api_chart_data():
 	"""API endpoint for dynamic chart data"""
-	balance_data = []
-	for rec in ProductMovement.balance_query():
-		product = Product.query.get(rec['product_id'])
-		location = Location.query.get(rec['location_id']) if rec['location_id'] else None
-		balance_data.append({
-			'product': product.name if product else rec['product_id'],
-			'product_id': rec['product_id'],
-			'location': location.name if location else 'N/A',
-			'location_id': rec['location_id'],
-			'qty': rec['qty']
-		})
-	
-	movement_trends = get_movement_trends()
-	chart_data = prepare_comprehensive_chart_data(balance_data, movement_trends)
-	
-	return jsonify(chart_data)
+	range_, granularity = trend_params(request.args)
+	snapshot = snapshots.latest(f'chart_data:{range_}:{granularity}')
+	if snapshot is not None:
+		payload = {'body': snapshot.body, 'etag': f'snapshot-{snapshot.id}'}
+	else:
+		payload = report_cache.get_or_set(f'chart_data_json:{range_}:{granularity}',
+										  lambda: build_chart_data_payload(range_, granularity))
+	response = current_app.response_class(payload['body'], mimetype='application/json')
+	response.set_etag(payload['etag'])
+	response.cache_control.no_cache = True
+	return response.make_conditional(request)
+
+
+@bp.route('/api/refresh', methods=['POST'])
+def refresh_reports():
+	"""Queue a snapshot refresh and return the job to poll"""
+	job_id = snapshots.request_refresh()
+	if job_id is None:
+		# Jobs are disabled: refresh inline
+		snapshots.refresh_snapshots()
+		db.session.commit()
+		return jsonify({'job': None, 'status': 'done'})
+	return jsonify({'job': job_queue.status(job_id), 'status': 'queued'}), 202
+
+
+@bp.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+	job = job_queue.status(job_id)
+	if job is None:
+		abort(404)
+	return jsonify({'job': job, 'status': job['status']})
+
+
+def current_report(key, build):
+	"""Return (payload, snapshot) from the newest snapshot of key. Without a
+	snapshot yet, compute the payload inline and queue a refresh."""
+	snapshot = snapshots.latest(key)
+	if snapshot is not None:
+		return snapshot.payload, snapshot
+	snapshots.request_refresh()
+	return report_cache.get_or_set(key, build), None
+
+
+def alert_filters(args):
+	"""Read product_id, location_id, status and the after_product/after_location cursor for StockAlert.page()"""
+	status = args.get('status') or None
+	if status is not None and status not in ALERT_STATUSES:
+		abort(400, f'status must be one of {", ".join(ALERT_STATUSES)}')
+	after = (args['after_product'], args['after_location']) if args.get('after_product') and args.get('after_location') else None
+	return {'product_id': args.get('product_id') or None, 'location_id': args.get('location_id') or None,
+			'status': status, 'after': after}
+
+
+def parse_reorder_point(value):
+	"""Parse an optional reorder point; blank means none. Raises ValueError."""
+	value = str(value if value is not None else '').strip()
+	if not value:
+		return None
+	threshold = int(value)
+	if threshold < 0:
+		raise ValueError(value)
+	return threshold
+
+
+def describe_age(snapshot):
+	"""Human-readable age of a snapshot ('just now' when computed inline)"""
+	seconds = int(snapshot.age_seconds) if snapshot is not None else 0
+	if seconds < 10:
+		return 'just now'
+	if seconds < 60:
+		return f'{seconds} s ago'
+	if seconds < 3600:
+		return f'{seconds // 60} min ago'
+	return f'{seconds // 3600} h ago'
+
+
+def parse_as_of(value):
+	"""Turn an as_of date (YYYY-MM-DD) into the instant at the end of that day.
+	Dates whose movements were archived are rejected: only opening balances at
+	the archive cutoff are left to answer them."""
+	from datetime import datetime, timedelta
+	try:
+		instant = datetime.strptime(value, '%Y-%m-%d') + timedelta(days=1)
+	except ValueError:
+		abort(400, 'as_of must be YYYY-MM-DD')
+	archived_before = LedgerArchive.archived_before()
+	if archived_before is not None and instant < archived_before:
+		abort(400, f'Movements before {archived_before:%Y-%m-%d} are archived; '
+				   f'as_of must be {archived_before - timedelta(days=1):%Y-%m-%d} or later')
+	return instant
+
+
+def build_balance_report(as_of=None):
+	"""Compute balance rows per product+location and their chart data"""
+	if as_of is None:
+		rows = ProductMovement.named_balance_query()
+	else:
+		rows = named_balances(ProductMovement.balance_query(as_of=as_of))
+	rows.sort(key=lambda x: (x['product'], x['location']))
+	return {'rows': annotate_thresholds(rows), 'chart_data': prepare_chart_data(rows)}
+
+
+def named_balances(balances):
+	"""Attach product and location names to plain balance dicts in bulk"""
+	product_names = Product.name_map(r['product_id'] for r in balances)
+	location_names = Location.name_map(r['location_id'] for r in balances)
+	return [
+		{
+			'product': product_names.get(r['product_id'], r['product_id']),
+			'product_id': r['product_id'],
+			'location': location_names.get(r['location_id'], 'N/A'),
+			'location_id': r['location_id'],
+			'qty': r['qty']
+		}
+		for r in balances
+	]
+
+
+def build_report_payloads():
+	"""Compute the current balance report and every trend range/granularity
+	from a single read of the balances, keyed like the report cache"""
+	balance_data = ProductMovement.named_balance_query()
+	balance_data.sort(key=lambda x: (x['product'], x['location']))
+	summary = balance_frame(balance_data).summarize()
+	payloads = {'balance_report': {'rows': annotate_thresholds(balance_data), 'chart_data': prepare_chart_data(balance_data)}}
+	for range_ in TREND_RANGES:
+		for granularity in TREND_GRANULARITIES:
+			payloads[f'chart_data:{range_}:{granularity}'] = prepare_comprehensive_chart_data(
+				summary, get_movement_trends(range_, granularity))
+	return payloads
+
+
+def build_comprehensive_chart_data(range_='30d', granularity='day'):
+	"""Compute chart data from all balances and movement trends"""
+	frame = BalanceFrame.from_rows(
+		((r.product_id, r.product_name or r.product_id, r.location_name, r.qty) for r in ProductMovement.named_balance_rows()),
+		Product.low_stock_thresholds(), current_app.config['LOW_STOCK_THRESHOLD'])
+	movement_trends = get_movement_trends(range_, granularity)
+	return prepare_comprehensive_chart_data(frame.summarize(), movement_trends)
+
+
+def build_chart_data_payload(range_='30d', granularity='day'):
+	"""Serialize chart data once and fingerprint it for ETag checks"""
+	chart_data = report_cache.get_or_set(f'chart_data:{range_}:{granularity}',
+										 lambda: build_comprehensive_chart_data(range_, granularity))
+	body = current_app.json.dumps(chart_data)
+	return {'body': body, 'etag': md5(body.encode()).hexdigest()}
+
+
+def balance_frame(rows):
+	"""Load balance dicts into a BalanceFrame with the products' low-stock thresholds"""
+	return BalanceFrame.from_dicts(rows, Product.low_stock_thresholds(), current_app.config['LOW_STOCK_THRESHOLD'])
+
+
+def annotate_thresholds(rows):
+	"""Add each row's low-stock threshold, used for the status badges"""
+	thresholds = Product.low_stock_thresholds()
+	default = current_app.config['LOW_STOCK_THRESHOLD']
+	for row in rows:
+		row['threshold'] = thresholds.get(row['product_id'], default)
+	return rows
 
 
 def prepare_chart_data(rows):
 	"""Prepare basic chart data for balance report"""
-	# Product totals
-	product_totals = defaultdict(int)
-	for row in rows:
-		product_totals[row['product']] += row['qty']
-	
-	# Location totals
-	location_totals = defaultdict(int)
-	for row in rows:
-		if row['location'] != 'N/A':
-			location_totals[row['location']] += row['qty']
-	
-	return {
-		'product_labels': list(product_totals.keys()),
-		'product_data': list(product_totals.values()),
-		'location_labels': list(location_totals.keys()),
-		'location_data': list(location_totals.values())
-	}
+	summary = balance_frame(rows).summarize()
+	return {key: summary[key] for key in ('product_labels', 'product_data', 'location_labels', 'location_data',
+										  'stock_status_labels', 'stock_status_data')}
 
 
-def prepare_comprehensive_chart_data(balance_data, movement_trends):
-	"""Prepare comprehensive chart data for charts report"""
-	# Product totals
-	product_totals = defaultdict(int)
-	for row in balance_data:
-		product_totals[row['product']] += row['qty']
-	
-	# Location totals
-	location_totals = defaultdict(int)
-	for row in balance_data:
-		if row['location'] != 'N/A':
-			location_totals[row['location']] += row['qty']
-	
-	# Stock status distribution
-	well_stocked = len([r for r in balance_data if r['qty'] > 10])
-	low_stock = len([r for r in balance_data if 0 < r['qty'] <= 10])
-	out_of_stock = len([r for r in balance_data if r['qty'] <= 0])
-	
-	return {
-		'product_labels': list(product_totals.keys()),
-		'product_data': list(product_totals.values()),
-		'location_labels': list(location_totals.keys()),
-		'location_data': list(location_totals.values()),
-		'stock_status_labels': ['Well Stocked', 'Low Stock', 'Out of Stock'],
-		'stock_status_data': [well_stocked, low_stock, out_of_stock],
-		'movement_trends': movement_trends
-	}
+def prepare_comprehensive_chart_data(summary, movement_trends):
+	"""Prepare comprehensive chart data for charts report from a BalanceFrame summary"""
+	return {**summary, 'movement_trends': movement_trends}
+
+
+TREND_RANGES = {'7d': 7, '30d': 30, '1y': 365}
+TREND_GRANULARITIES = ('day', 'week', 'month')
+
 
+def trend_params(args):
+	"""Read and validate the trend range and granularity from request args"""
+	range_ = args.get('range', '30d')
+	granularity = args.get('granularity', 'day')
+	if range_ not in TREND_RANGES or granularity not in TREND_GRANULARITIES:
+		abort(400, f'range must be one of {", ".join(TREND_RANGES)} and granularity one of {", ".join(TREND_GRANULARITIES)}')
+	return range_, granularity
 
-def get_movement_trends():
-	"""Get movement trends over time"""
+
+def get_movement_trends(range_='30d', granularity='day'):
+	"""Get movement trends over time from the daily rollup table"""
 	from datetime import datetime, timedelta
-	from .. import db
-	
-	# Get movements from last 30 days grouped by date
-	thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+	from ..models import DailyMovementStat
 	
-	movements = db.session.query(
-		func.date(ProductMovement.timestamp).label('date'),
-		func.count(ProductMovement.id).label('count'),
-		func.sum(ProductMovement.qty).label('total_qty')
+	# Per-day totals for the window; bucketing happens on at most 365 rows
+	start = datetime.utcnow().date() - timedelta(days=TREND_RANGES[range_])
+	days = db.session.query(
+		DailyMovementStat.day,
+		func.sum(DailyMovementStat.movement_count).label('count'),
+		func.sum(DailyMovementStat.moved_qty).label('total_qty')
 	).filter(
-		ProductMovement.timestamp >= thirty_days_ago
+		DailyMovementStat.day >= start
 	).group_by(
-		func.date(ProductMovement.timestamp)
-	).order_by('date').all()
+		DailyMovementStat.day
+	).order_by(DailyMovementStat.day).all()
 	
-	dates = []
-	counts = []
-	quantities = []
-	
-	for movement in movements:
-		# Handle both date and string objects
-		if hasattr(movement.date, 'strftime'):
-			dates.append(movement.date.strftime('%Y-%m-%d'))
+	buckets = {}
+	for day in days:
+		if granularity == 'week':
+			label = (day.day - timedelta(days=day.day.weekday())).strftime('%Y-%m-%d')
+		elif granularity == 'month':
+			label = day.day.strftime('%Y-%m')
 		else:
-			dates.append(str(movement.date))
-		counts.append(movement.count)
-		quantities.append(movement.total_qty)
+			label = day.day.strftime('%Y-%m-%d')
+		count, quantity = buckets.get(label, (0, 0))
+		buckets[label] = (count + day.count, quantity + day.total_qty)
 	
 	return {
-		'dates': dates,
-		'movement_counts': counts,
-		'total_quantities': quantities
+		'dates': list(buckets),
+		'movement_counts': [count for count, _ in buckets.values()],
+		'total_quantities': [quantity for _, quantity in buckets.values()],
+		'range': range_,
+		'granularity': granularity
 	}
-
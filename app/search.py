@@ -0,0 +1,134 @@
+"""Catalogue search and paging for products and locations.
+
+On SQLite the catalogue is indexed by FTS5 tables using the trigram tokenizer
+(products_fts over id, name and description; locations_fts over id and name).
+Triggers keep them in step with every insert, update and delete, including
+core bulk statements. A trigram match finds any substring of three or more
+characters, case-insensitively. Shorter queries, other backends and SQLite
+builds without FTS5 fall back to a LIKE scan over the same columns.
+
+Deactivated products and locations are left out unless asked for.
+
+Lists are ordered by name (unique for both tables) and paged by the last name
+seen, so every page is a range scan of the name index.
+
+Migrations that recreate products or locations (batch_alter_table on SQLite)
+drop the triggers with the table, so they call install_all() afterwards.
+"""
+from sqlalchemy import event, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+from . import db
+from .models import Product, Location
+
+# table -> indexed columns
+INDEXED_COLUMNS = {
+	'products': ('id', 'name', 'description'),
+	'locations': ('id', 'name'),
+}
+MIN_MATCH_LENGTH = 3  # trigram tokens need at least three characters
+
+# (engine url, table) pairs known to have a search index
+_indexed = set()
+
+
+def index_statements(table_name):
+	"""DDL for table_name's FTS5 index and its sync triggers."""
+	fts = f'{table_name}_fts'
+	columns = ', '.join(INDEXED_COLUMNS[table_name])
+	new = ', '.join(f'new.{c}' for c in INDEXED_COLUMNS[table_name])
+	old = ', '.join(f'old.{c}' for c in INDEXED_COLUMNS[table_name])
+	return [
+		f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+		f"content='{table_name}', content_rowid='rowid', tokenize='trigram')",
+		f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table_name} BEGIN "
+		f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new}); END",
+		f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table_name} BEGIN "
+		f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old}); END",
+		f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE ON {table_name} BEGIN "
+		f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old}); "
+		f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new}); END",
+	]
+
+
+def install(connection, table_name, rebuild=True):
+	"""Create (or repair) the search index for table_name and optionally refill
+	it from the table. Returns False when the database cannot host it."""
+	if connection.dialect.name != 'sqlite':
+		return False
+	try:
+		for statement in index_statements(table_name):
+			connection.exec_driver_sql(statement)
+		if rebuild:
+			connection.exec_driver_sql(f"INSERT INTO {table_name}_fts({table_name}_fts) VALUES ('rebuild')")
+	except OperationalError:  # SQLite built without FTS5 or the trigram tokenizer
+		return False
+	return True
+
+
+def install_all(connection):
+	"""Create (or repair) and refill every search index on connection; returns
+	{table: installed}."""
+	return {name: install(connection, name) for name in INDEXED_COLUMNS}
+
+
+def rebuild():
+	"""Create and refill every search index; returns {table: installed}."""
+	with db.engine.begin() as connection:
+		return install_all(connection)
+
+
+def has_index(table_name):
+	key = (str(db.engine.url), table_name)
+	if key in _indexed:
+		return True
+	if db.engine.dialect.name != 'sqlite':
+		return False
+	found = db.session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+							   {'name': f'{table_name}_fts'}).first()
+	if found:
+		_indexed.add(key)
+	return found is not None
+
+
+def search_query(model, q, inactive=False):
+	"""Restrict model.query to rows whose indexed columns contain q; active rows
+	only unless inactive is set."""
+	q = (q or '').strip()
+	query = model.query if inactive else model.query.filter(model.active)
+	if not q:
+		return query
+	table_name = model.__tablename__
+	if len(q) >= MIN_MATCH_LENGTH and has_index(table_name):
+		fts = f'{table_name}_fts'
+		phrase = '"' + q.replace('"', '""') + '"'
+		rowids = select(literal_column('rowid')).select_from(table(fts)).where(literal_column(fts).op('MATCH')(phrase))
+		return query.filter(literal_column(f'{table_name}.rowid').in_(rowids))
+	pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+	return query.filter(or_(*(
+		getattr(model, column).ilike(pattern, escape='\\') for column in INDEXED_COLUMNS[table_name])))
+
+
+def paginate_by_name(query, model, cursor, limit):
+	"""Return (rows, next_cursor) for the page of query after the name cursor."""
+	if cursor:
+		query = query.filter(model.name > cursor)
+	rows = query.order_by(model.name).limit(limit + 1).all()
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		next_cursor = rows[-1].name
+	return rows, next_cursor
+
+
+@event.listens_for(Product.__table__, 'after_create')
+@event.listens_for(Location.__table__, 'after_create')
+def _create_index(target, connection, **kw):
+	# Databases built with create_all() rather than the migrations
+	install(connection, target.name, rebuild=False)
+
+
+@event.listens_for(Product.__table__, 'after_drop')
+@event.listens_for(Location.__table__, 'after_drop')
+def _drop_index(target, connection, **kw):
+	if connection.dialect.name == 'sqlite':
+		connection.exec_driver_sql(f'DROP TABLE IF EXISTS {target.name}_fts')
@@ -0,0 +1,123 @@
+"""Precomputed report snapshots.
+
+The 'report_snapshots' job builds the balance report and every chart
+range/granularity in one pass and stores each payload as JSON. Report routes
+serve the newest snapshot and show its age; they only compute inline when no
+snapshot exists yet. A refresh is queued on a schedule (REPORT_SNAPSHOT_INTERVAL)
+and after commits that change inventory, so snapshots trail writes by one job.
+"""
+import json
+import threading
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import db
+from .cache import _TRACKED_TABLES
+from .jobs import job_handler, job_queue
+from .models import ReportSnapshot
+
+# Snapshot rows kept per key; older ones are deleted after each refresh
+KEEP = 2
+
+
+class Snapshot:
+	"""A stored payload; the JSON is decoded on first use and cached by id."""
+	__slots__ = ('id', 'key', 'created_at', 'body', '_payload')
+
+	def __init__(self, id, key, created_at, body):
+		self.id = id
+		self.key = key
+		self.created_at = created_at
+		self.body = body
+		self._payload = None
+
+	@property
+	def payload(self):
+		if self._payload is None:
+			self._payload = json.loads(self.body)
+		return self._payload
+
+	@property
+	def age_seconds(self):
+		return max(0, (datetime.utcnow() - self.created_at).total_seconds())
+
+
+# key -> Snapshot, so each snapshot is read and decoded once per process
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def latest(key):
+	"""Return the newest Snapshot for key, or None."""
+	row = (db.session.query(ReportSnapshot.id, ReportSnapshot.created_at)
+		.filter(ReportSnapshot.key == key)
+		.order_by(ReportSnapshot.id.desc())
+		.first())
+	if row is None:
+		return None
+	cached = _loaded.get(key)
+	if cached is not None and cached.id == row.id:
+		return cached
+	body = db.session.query(ReportSnapshot.payload).filter(ReportSnapshot.id == row.id).scalar()
+	if body is None:
+		return None
+	snapshot = Snapshot(row.id, key, row.created_at, body)
+	with _loaded_lock:
+		_loaded[key] = snapshot
+	return snapshot
+
+
+def save(payloads, job_id=None):
+	"""Store {key: payload} as new snapshots and prune older ones. The caller commits."""
+	now = datetime.utcnow()
+	for key, payload in payloads.items():
+		db.session.add(ReportSnapshot(key=key, payload=current_app.json.dumps(payload), created_at=now, job_id=job_id))
+	db.session.flush()
+	for key in payloads:
+		keep = [i for (i,) in (db.session.query(ReportSnapshot.id)
+			.filter(ReportSnapshot.key == key)
+			.order_by(ReportSnapshot.id.desc())
+			.limit(KEEP))]
+		ReportSnapshot.query.filter(ReportSnapshot.key == key, ReportSnapshot.id.notin_(keep)).delete(synchronize_session=False)
+
+
+def request_refresh():
+	"""Queue a snapshot refresh; returns the job id (None when jobs are disabled)."""
+	return job_queue.submit('report_snapshots')
+
+
+def is_due(interval):
+	"""True when the newest balance snapshot is missing or older than interval seconds."""
+	snapshot = latest('balance_report')
+	return snapshot is None or snapshot.age_seconds >= interval
+
+
+job_queue.schedule('report_snapshots', 'REPORT_SNAPSHOT_INTERVAL', is_due)
+
+
+@job_handler('report_snapshots')
+def refresh_snapshots(job_id=None):
+	"""Build every report payload from one read of the balances."""
+	from .routes.reports import build_report_payloads
+	save(build_report_payloads(), job_id=job_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_inventory_changes(session, flush_context):
+	for obj in (*session.new, *session.dirty, *session.deleted):
+		if getattr(obj, '__tablename__', None) in _TRACKED_TABLES:
+			session.info['snapshots_stale'] = True
+			return
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_on_commit(session):
+	if (session.info.pop('snapshots_stale', False) and has_app_context()
+			and current_app.config['REPORT_SNAPSHOT_ON_CHANGE']):
+		request_refresh()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_on_rollback(session):
+	session.info.pop('snapshots_stale', None)
@@ -0,0 +1,60 @@
+// Live inventory updates: one EventSource on /events per page.
+// handlers.inventory(delta) gets each committed change (movements, balances,
+// counters); handlers.refresh() is called when the page should reload instead.
+const LiveEvents = {
+    source: null,
+    pollTimer: null,
+    pollDelay: 30000,
+
+    connect(handlers) {
+        this.disconnect();
+        const source = this.source = new EventSource('/events');
+        source.addEventListener('inventory', event => handlers.inventory(JSON.parse(event.data)));
+        source.addEventListener('refresh', () => handlers.refresh());
+        // The server ends each stream after a few minutes; EventSource
+        // reconnects with Last-Event-ID and resumes where it left off.
+        // When the server refuses the stream (503: every stream slot is
+        // taken) the source closes; refresh periodically and try again.
+        source.addEventListener('error', () => {
+            if (source === this.source && source.readyState === EventSource.CLOSED) {
+                this.pollTimer = setTimeout(() => {
+                    handlers.refresh();
+                    this.connect(handlers);
+                }, this.pollDelay);
+            }
+        });
+        return source;
+    },
+
+    disconnect() {
+        clearTimeout(this.pollTimer);
+        this.pollTimer = null;
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    },
+
+    // Reload at most once per delay, however many refresh events arrive
+    debouncedReload(delay = 2000) {
+        let timer = null;
+        return () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => location.reload(), delay);
+        };
+    },
+
+    // Trend bucket label for an ISO timestamp, matching get_movement_trends
+    trendLabel(timestamp, granularity) {
+        const day = timestamp.slice(0, 10);
+        if (granularity === 'month') {
+            return day.slice(0, 7);
+        }
+        if (granularity === 'week') {
+            const date = new Date(day + 'T00:00:00Z');
+            date.setUTCDate(date.getUTCDate() - (date.getUTCDay() + 6) % 7);
+            return date.toISOString().slice(0, 10);
+        }
+        return day;
+    }
+};
@@ -0,0 +1,22 @@
+// Report snapshot refresh: queue a background job, poll it, then reload.
+async function refreshSnapshot(button) {
+    const label = button.textContent;
+    button.disabled = true;
+    button.textContent = '⏳ Refreshing...';
+    try {
+        const response = await fetch('/reports/api/refresh', {method: 'POST'});
+        let data = await response.json();
+        while (data.status === 'queued' || data.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            data = await (await fetch(`/reports/api/jobs/${data.job.id}`)).json();
+        }
+        if (data.status === 'failed') {
+            throw new Error(data.job.error);
+        }
+        location.reload();
+    } catch (error) {
+        console.error('Error refreshing report snapshot:', error);
+        button.disabled = false;
+        button.textContent = label;
+    }
+}
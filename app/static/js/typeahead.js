@@ -0,0 +1,90 @@
+// Catalogue typeahead: search products or locations as the user types and
+// store the chosen id in the hidden input (see templates/macros.html).
+// The hidden input fires 'change' whenever its value changes.
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.typeahead').forEach(setupTypeahead);
+});
+
+function setupTypeahead(container) {
+    const hidden = container.querySelector('input[type=hidden]');
+    const input = container.querySelector('.typeahead-input');
+    const list = container.querySelector('.typeahead-results');
+    let timer = null;
+    let requestId = 0;
+    let active = -1;
+
+    function setValue(id) {
+        if (hidden.value !== id) {
+            hidden.value = id;
+            hidden.dispatchEvent(new Event('change'));
+        }
+    }
+
+    function close() {
+        list.style.display = 'none';
+        active = -1;
+    }
+
+    function choose(item) {
+        input.value = `${item.name} (${item.id})`;
+        setValue(item.id);
+        close();
+    }
+
+    function highlight(index) {
+        const items = list.children;
+        if (!items.length) {
+            return;
+        }
+        active = (index + items.length) % items.length;
+        Array.from(items).forEach((li, i) => li.classList.toggle('active', i === active));
+        items[active].scrollIntoView({block: 'nearest'});
+    }
+
+    async function search() {
+        const current = ++requestId;
+        const params = new URLSearchParams({q: input.value.trim(), limit: 10});
+        try {
+            const response = await fetch(`${container.dataset.source}?${params}`);
+            const data = await response.json();
+            if (current !== requestId) {
+                return;  // a newer keystroke superseded this response
+            }
+            list.innerHTML = '';
+            for (const item of data[container.dataset.kind]) {
+                const li = document.createElement('li');
+                li.textContent = `${item.name} (${item.id})`;
+                li.setAttribute('role', 'option');
+                // mousedown fires before the input's blur closes the list
+                li.addEventListener('mousedown', event => {
+                    event.preventDefault();
+                    choose(item);
+                });
+                list.appendChild(li);
+            }
+            active = -1;
+            list.style.display = list.children.length ? 'block' : 'none';
+        } catch (error) {
+            console.error('Error searching catalogue:', error);
+        }
+    }
+
+    input.addEventListener('input', function() {
+        setValue('');
+        clearTimeout(timer);
+        timer = setTimeout(search, 200);
+    });
+    input.addEventListener('focus', search);
+    input.addEventListener('blur', close);
+    input.addEventListener('keydown', function(event) {
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            highlight(active + (event.key === 'ArrowDown' ? 1 : -1));
+        } else if (event.key === 'Enter' && active >= 0 && list.style.display === 'block') {
+            event.preventDefault();
+            list.children[active].dispatchEvent(new Event('mousedown'));
+        } else if (event.key === 'Escape') {
+            close();
+        }
+    });
+}
@@ -0,0 +1,64 @@
+"""Concurrency-safe stock writes.
+
+Every movement that takes stock out of a location debits its stock_balances
+row with a conditional UPDATE (qty >= requested) in the same transaction as
+the movement insert, so two writers can never both spend the same units.
+run_with_retry() wraps a unit of work and retries it a bounded number of
+times when the database reports a lock or a key race on one of the upserted
+tables; other errors surface at once.
+"""
+import time
+from sqlalchemy.exc import IntegrityError, OperationalError
+from . import db
+
+DEFAULT_RETRIES = 5
+RETRY_BACKOFF = 0.05
+
+
+class InsufficientStock(Exception):
+	"""Raised when a movement would take a location's stock below zero."""
+
+	def __init__(self, product_id=None, location_id=None, available=None, requested=None):
+		self.product_id = product_id
+		self.location_id = location_id
+		self.available = available
+		self.requested = requested
+		if product_id is None:
+			message = 'Insufficient stock for one or more movements'
+		else:
+			message = (f'Insufficient stock of {product_id} at {location_id}: '
+					   f'{available} units available, {requested} requested')
+		super().__init__(message)
+
+
+# Tables written by update-then-insert upserts: two writers can both miss
+# the row and race to insert it, and the loser's retry takes the update path
+UPSERT_TABLES = ('stock_balances', 'daily_movement_stats', 'stock_alerts', 'reorder_thresholds')
+
+
+def _is_retryable(exc):
+	message = str(exc.orig).lower() if getattr(exc, 'orig', None) is not None else str(exc).lower()
+	if isinstance(exc, IntegrityError):
+		# Only the upsert key race; other constraint violations will not pass on a retry
+		return ('unique' in message or 'duplicate' in message) and any(table in message for table in UPSERT_TABLES)
+	return 'locked' in message or 'busy' in message or 'deadlock' in message or 'serialize' in message
+
+
+def run_with_retry(work, retries=DEFAULT_RETRIES):
+	"""Run work() and commit, retrying on lock contention or key races.
+	work must do all of its session changes itself so a retry can replay it
+	after the rollback. InsufficientStock is never retried.
+	"""
+	for attempt in range(retries):
+		try:
+			result = work()
+			db.session.commit()
+			return result
+		except InsufficientStock:
+			db.session.rollback()
+			raise
+		except (OperationalError, IntegrityError) as exc:
+			db.session.rollback()
+			if attempt == retries - 1 or not _is_retryable(exc):
+				raise
+			time.sleep(RETRY_BACKOFF * (2 ** attempt))
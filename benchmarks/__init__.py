@@ -0,0 +1,4 @@
+"""Benchmarks and query-plan checks for the inventory app.
+
+Run modules from the repository root, e.g. ``python -m benchmarks.explain_indexes``.
+"""
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Report aggregation benchmark
+Builds synthetic balance rows in memory (no database) and times the chart
+aggregates three ways: the original per-row dict loops, BalanceFrame from
+balance dicts and BalanceFrame from (product_id, product, location, qty)
+tuples. The BalanceFrame cases run with NumPy when it is installed and again
+with the pure-Python fallback. The report_payloads cases mirror
+build_report_payloads, which needs the aggregates for the balance report and
+nine chart payloads: once per payload before, one frame summarized per
+payload now.
+
+    python -m benchmarks.analytics --rows 1000000 --output analytics.json
+"""
+
+import argparse
+import random
+from collections import defaultdict
+
+import app.analytics as analytics
+from app.analytics import BalanceFrame
+
+from .micro import benchmark
+from .results import write_results
+
+
+def generate_rows(count, products, locations, seed=1):
+    """Balance dicts shaped like ProductMovement.named_balance_query() rows."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        p = rng.randrange(products)
+        location = f'Location {rng.randrange(locations)}' if rng.random() > 0.01 else 'N/A'
+        rows.append({'product': f'Product {p}', 'product_id': f'P-{p}', 'location': location,
+                     'location_id': None, 'qty': rng.randint(-5, 200)})
+    return rows
+
+
+def legacy_summary(rows, thresholds, default):
+    """The per-row loops the reports used before BalanceFrame."""
+    product_totals = defaultdict(int)
+    for row in rows:
+        product_totals[row['product']] += row['qty']
+    location_totals = defaultdict(int)
+    for row in rows:
+        if row['location'] != 'N/A':
+            location_totals[row['location']] += row['qty']
+    threshold = lambda r: thresholds.get(r['product_id'], default)
+    well_stocked = len([r for r in rows if r['qty'] > threshold(r)])
+    low_stock = len([r for r in rows if 0 < r['qty'] <= threshold(r)])
+    out_of_stock = len([r for r in rows if r['qty'] <= 0])
+    top = sorted(product_totals.items(), key=lambda item: item[1], reverse=True)[:10]
+    return product_totals, location_totals, [well_stocked, low_stock, out_of_stock], top
+
+
+def report_payloads(tuples, thresholds, payloads):
+    frame = BalanceFrame.from_rows(tuples, thresholds, 10)
+    return [frame.summarize() for _ in range(payloads)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--locations', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows, args.products, args.locations)
+    tuples = [(r['product_id'], r['product'], None if r['location'] == 'N/A' else r['location'], r['qty']) for r in rows]
+    thresholds = {f'P-{p}': 25 for p in range(0, args.products, 10)}
+
+    payloads = 1 + 9
+    cases = {
+        'legacy_loops': lambda: legacy_summary(rows, thresholds, 10),
+        'report_payloads_legacy': lambda: [legacy_summary(rows, thresholds, 10) for _ in range(payloads)],
+    }
+    backends = [('python', None)]
+    if analytics.numpy is not None:
+        backends.insert(0, ('numpy', analytics.numpy))
+    for backend, module in backends:
+        cases[f'frame_from_dicts_{backend}'] = (module, lambda: BalanceFrame.from_dicts(rows, thresholds, 10).summarize())
+        cases[f'frame_from_rows_{backend}'] = (module, lambda: BalanceFrame.from_rows(tuples, thresholds, 10).summarize())
+        cases[f'report_payloads_{backend}'] = (module, lambda: report_payloads(tuples, thresholds, payloads))
+    frame = BalanceFrame.from_rows(tuples, thresholds, 10)
+    for backend, module in backends:
+        cases[f'summarize_only_{backend}'] = (module, frame.summarize)
+
+    numpy_module = analytics.numpy
+    results = {}
+    try:
+        for name, case in cases.items():
+            module, fn = case if isinstance(case, tuple) else (numpy_module, case)
+            analytics.numpy = module
+            results[name] = stats = benchmark(fn, args.rounds)
+            print(f'{name:28} p50 {stats["p50_ms"]:10.1f} ms  p95 {stats["p95_ms"]:10.1f} ms')
+    finally:
+        analytics.numpy = numpy_module
+
+    if args.output:
+        parameters = {'rows': args.rows, 'products': args.products, 'locations': args.locations,
+                      'rounds': args.rounds, 'numpy': numpy_module.__version__ if numpy_module else None}
+        write_results(args.output, 'analytics', parameters, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Synthetic large-ledger generator
+Bulk-inserts a catalogue and a movement ledger into a SQLite database, then
+builds stock_balances and the daily rollup. Removals and transfers only draw
+on stock that was received earlier, so the ledger never goes negative.
+
+    python -m benchmarks.datagen --db /tmp/bench.db --products 50000 --locations 500 --movements 10000000
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import create_app, db
+from app.models import Product, Location, ProductMovement, StockBalance, DailyMovementStat, InventoryCounter
+
+
+def movements(n_products, n_locations, n_movements, days=365, seed=42, receipt_ratio=0.4):
+    """Yield movement row dicts in timestamp order over the last ``days`` days."""
+    rng = random.Random(seed)
+    start = datetime.utcnow().replace(microsecond=0) - timedelta(days=days)
+    step = days * 86400 / max(n_movements, 1)
+    stock = {}
+    stocked = []
+    for i in range(n_movements):
+        timestamp = start + timedelta(seconds=int(i * step))
+        pair = None
+        if stocked and rng.random() >= receipt_ratio:
+            index = rng.randrange(len(stocked))
+            pair = stocked[index]
+            if not stock.get(pair):
+                # Drained since it was listed; drop it and record a receipt instead
+                stocked[index] = stocked[-1]
+                stocked.pop()
+                pair = None
+        if pair is None:
+            product_id = f'P-{rng.randrange(n_products)}'
+            location_id = f'L-{rng.randrange(n_locations)}'
+            qty = rng.randint(1, 100)
+            if not stock.get((product_id, location_id)):
+                stocked.append((product_id, location_id))
+            stock[(product_id, location_id)] = stock.get((product_id, location_id), 0) + qty
+            yield {'timestamp': timestamp, 'product_id': product_id,
+                   'from_location_id': None, 'to_location_id': location_id, 'qty': qty}
+            continue
+        product_id, source = pair
+        qty = rng.randint(1, stock[pair])
+        stock[pair] -= qty
+        destination = None
+        if n_locations > 1 and rng.random() < 0.6:
+            destination = f'L-{rng.randrange(n_locations)}'
+            if destination == source:
+                destination = None
+        if destination:
+            if not stock.get((product_id, destination)):
+                stocked.append((product_id, destination))
+            stock[(product_id, destination)] = stock.get((product_id, destination), 0) + qty
+        yield {'timestamp': timestamp, 'product_id': product_id,
+               'from_location_id': source, 'to_location_id': destination, 'qty': qty}
+
+
+def insert_batches(table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def seed(n_products, n_locations, n_movements, days=365, seed=42, batch_size=20000, verbose=False):
+    """Bulk-insert a synthetic catalogue and ledger, then build balances and rollups."""
+    started = time.perf_counter()
+    insert_batches(Product.__table__, (
+        {'id': f'P-{i}', 'name': f'Product {i}', 'description': None} for i in range(n_products)
+    ), batch_size)
+    insert_batches(Location.__table__, (
+        {'id': f'L-{i}', 'name': f'Location {i}'} for i in range(n_locations)
+    ), batch_size)
+    insert_batches(ProductMovement.__table__, movements(n_products, n_locations, n_movements, days, seed), batch_size)
+    db.session.commit()
+    if verbose:
+        print(f'Inserted ledger in {time.perf_counter() - started:.1f}s; building balances and rollups...')
+    StockBalance.rebuild()
+    DailyMovementStat.rebuild()
+    InventoryCounter.reconcile()
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    if verbose:
+        print(f'Done in {time.perf_counter() - started:.1f}s')
+
+
+def create_database(path, n_products, n_locations, n_movements, days=365, seed_value=42, batch_size=20000):
+    """Create (or replace) a generated SQLite database at ``path`` and return its app."""
+    if os.path.exists(path):
+        os.remove(path)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(path)}', 'REPORT_CACHE_TTL': 0})
+    with app.app_context():
+        db.create_all()
+        print(f'Seeding {n_products} products, {n_locations} locations, {n_movements} movements into {path}...')
+        seed(n_products, n_locations, n_movements, days, seed_value, batch_size, verbose=True)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='SQLite file to create (replaced if it exists).')
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--locations', type=int, default=100)
+    parser.add_argument('--movements', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365, help='Spread movements over this many past days.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    args = parser.parse_args()
+    create_database(args.db, args.products, args.locations, args.movements, args.days, args.seed, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
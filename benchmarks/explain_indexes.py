@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Index regression check
+Seeds a large ledger into a scratch SQLite database, captures the SQL issued by
+the balance, trend, recent-activity and alert queries, and runs EXPLAIN QUERY
+PLAN on each one. Fails if product_movements, or reorder_thresholds (read on
+every movement write), is scanned without an index.
+
+    python -m benchmarks.explain_indexes --movements 500000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import ProductMovement, ReorderThreshold, StockAlert
+from app.routes.reports import get_movement_trends
+
+from .datagen import seed
+
+
+def capture(fn):
+    """Run fn and return (elapsed seconds, [(statement, parameters), ...])."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return elapsed, statements
+
+
+# Tables that must never be read with a full scan
+INDEXED_TABLES = ('product_movements', 'reorder_thresholds')
+
+
+def unindexed_scans(plan_rows):
+    """Return plan lines that scan an INDEXED_TABLES table without any index."""
+    return [
+        detail for detail in plan_rows
+        if any(detail.startswith(f'SCAN {table}') for table in INDEXED_TABLES) and 'INDEX' not in detail
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--locations', type=int, default=50)
+    parser.add_argument('--movements', type=int, default=200000)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'explain.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+    with app.app_context():
+        db.create_all()
+        print(f'Seeding {args.products} products, {args.locations} locations, {args.movements} movements...')
+        seed(args.products, args.locations, args.movements)
+        ReorderThreshold.set_many({(f'P-{p}', f'L-{l}'): 10 for p in range(args.products) for l in range(0, args.locations, 5)})
+        db.session.commit()
+
+        checks = {
+            'ledger_balance_query': ProductMovement.ledger_balance_query,
+            'balance_query': ProductMovement.balance_query,
+            'balance_for': lambda: ProductMovement.balance_for('P-1', 'L-1'),
+            'movement_trends': get_movement_trends,
+            'recent_movements': lambda: ProductMovement.query.order_by(ProductMovement.timestamp.desc()).limit(200).all(),
+            'recent_for_location': lambda: ProductMovement.recent(location_id='L-1'),
+            'recent_for_product': lambda: ProductMovement.recent(product_id='P-1'),
+            'alert_evaluate': lambda: StockAlert.evaluate(db.session.connection(), [('P-1', 'L-0'), ('P-1', 'L-1')]),
+            'alerts_page': StockAlert.page,
+        }
+
+        failures = 0
+        for name, fn in checks.items():
+            elapsed, statements = capture(fn)
+            print(f'\n== {name} ({elapsed * 1000:.1f} ms)')
+            for statement, parameters in statements:
+                plan = [
+                    row[-1] for row in
+                    db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                ]
+                for detail in plan:
+                    print(f'   {detail}')
+                bad = unindexed_scans(plan)
+                if bad:
+                    failures += 1
+                    print(f'   !! unindexed scan: {bad}')
+
+        if failures:
+            print(f'\n{failures} statement(s) scan {" or ".join(INDEXED_TABLES)} without an index.')
+            sys.exit(1)
+        print('\nAll checked statements use an index.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+HTTP load test
+Sends concurrent requests to a server and reports per-route latency
+percentiles and throughput. Either point it at a running server
+(``python serve.py``) or pass --db to serve a generated ledger
+(see benchmarks.datagen) from a local waitress instance.
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --threads 16 --duration 30
+    python -m benchmarks.load_test --db /tmp/bench.db --write-ratio 0.05 --output load.json
+"""
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from .results import percentile, write_results
+
+DEFAULT_ROUTES = [
+    '/',
+    '/reports/balance',
+    '/reports/api/chart-data',
+    '/movements/',
+    '/movements/api',
+]
+
+
+def request(url, data=None):
+    """Issue one request and return (status, seconds)."""
+    body = urllib.parse.urlencode(data).encode() if data else None
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except urllib.error.URLError:
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def worker(base_url, routes, write_ratio, write_form, deadline, seed, results, lock):
+    rng = random.Random(seed)
+    local = {}
+    while time.perf_counter() < deadline:
+        if write_form and rng.random() < write_ratio:
+            route = 'POST /movements/create'
+            status, seconds = request(base_url + '/movements/create', write_form)
+        else:
+            route = rng.choice(routes)
+            status, seconds = request(base_url + route)
+        local.setdefault(route, []).append((status, seconds))
+    with lock:
+        for route, samples in local.items():
+            results.setdefault(route, []).extend(samples)
+
+
+def summarize(results, elapsed):
+    """Return {route: {requests, errors, rps, p50_ms, p95_ms, p99_ms, mean_ms}}."""
+    summary = {}
+    for route, samples in sorted(results.items()):
+        latencies = [seconds * 1000 for _, seconds in samples]
+        summary[route] = {
+            'requests': len(samples),
+            'errors': sum(1 for status, _ in samples if status == 0 or status >= 500),
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+        }
+    return summary
+
+
+def run(base_url, routes, threads, duration, write_ratio=0.0, write_form=None):
+    results, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    workers = [
+        threading.Thread(target=worker, args=(base_url, routes, write_ratio, write_form, deadline, i, results, lock))
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return summarize(results, time.perf_counter() - started)
+
+
+def serve_locally(db_path, threads):
+    """Serve the app for db_path from waitress on a free port; return its base URL."""
+    from waitress.server import create_server
+    from app import create_app
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(db_path)}'})
+    server = create_server(app, host='127.0.0.1', port=0, threads=threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f'http://127.0.0.1:{server.effective_port}'
+
+
+def sample_pair(base_url):
+    """Return a (product_id, location_id) that currently holds stock, via the balance export."""
+    with urllib.request.urlopen(base_url + '/reports/balance.csv', timeout=60) as response:
+        rows = csv.reader(line.decode() for line in response)
+        next(rows, None)
+        first = next(rows, None)
+    return (first[0], first[2]) if first else (None, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--db', help='Serve this SQLite database locally instead of using --url.')
+    parser.add_argument('--server-threads', type=int, default=8, help='waitress threads when using --db.')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--route', action='append', dest='routes', help='Route to GET; repeatable.')
+    parser.add_argument('--write-ratio', type=float, default=0.0, help='Fraction of requests that record a movement.')
+    parser.add_argument('--product', help='Product id used for write requests and stock-info.')
+    parser.add_argument('--location', help='Location id used for write requests and stock-info.')
+    parser.add_argument('--output', help='Also write the summary as JSON to this file.')
+    args = parser.parse_args()
+
+    base_url = serve_locally(args.db, args.server_threads) if args.db else args.url.rstrip('/')
+    product_id, location_id = args.product, args.location
+    if args.db and not (product_id and location_id):
+        product_id, location_id = sample_pair(base_url)
+
+    routes = list(args.routes or DEFAULT_ROUTES)
+    write_form = None
+    if product_id and location_id:
+        routes.append(f'/movements/stock-info?product_id={product_id}&location_id={location_id}')
+        write_form = {'product_id': product_id, 'to_location_id': location_id, 'qty': '1'}
+
+    summary = run(base_url, routes, args.threads, args.duration, args.write_ratio, write_form)
+    for route, stats in summary.items():
+        print(f'{route:60} {stats["requests"]:7} req {stats["rps"]:8} req/s '
+              f'p50 {stats["p50_ms"]:8} ms  p95 {stats["p95_ms"]:8} ms  errors {stats["errors"]}')
+    if args.output:
+        write_results(args.output, 'load', {
+            'url': None if args.db else base_url, 'database': args.db, 'threads': args.threads,
+            'duration': args.duration, 'write_ratio': args.write_ratio, 'routes': routes,
+        }, summary)
+
+
+if __name__ == '__main__':
+    main()
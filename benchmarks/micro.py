@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Model and report micro-benchmarks
+Times each balance, movement and report function against a generated ledger
+(see benchmarks.datagen) with the report cache disabled, in the spirit of
+pytest-benchmark: warm-up rounds, then min/mean/p50/p95 over timed rounds.
+
+    python -m benchmarks.micro --db /tmp/bench.db --output micro.json
+    python -m benchmarks.micro --movements 200000      # generate a scratch ledger first
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import Product, Location, ProductMovement, StockBalance, StockAlert
+from app.routes.movements import filter_movements, paginate_movements, get_current_stock
+from app.routes.reports import (build_balance_report, build_comprehensive_chart_data,
+                                build_chart_data_payload, get_movement_trends)
+
+from .datagen import create_database
+from .results import percentile, write_results
+
+
+def benchmark(fn, rounds, warmup=1):
+    """Call fn warmup + rounds times and summarize the timed rounds in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'rounds': rounds,
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'ops_per_second': round(1000 / statistics.fmean(timings), 2),
+    }
+
+
+def sample_ids():
+    """Pick a product and location that actually hold stock, plus a timestamp midway through the ledger."""
+    balance = ProductMovement.balance_query()[:1]
+    product_id = balance[0]['product_id'] if balance else 'P-0'
+    location_id = balance[0]['location_id'] if balance else 'L-0'
+    first = db.session.query(db.func.min(ProductMovement.timestamp)).scalar() or datetime.utcnow()
+    last = db.session.query(db.func.max(ProductMovement.timestamp)).scalar() or datetime.utcnow()
+    return product_id, location_id, first + (last - first) / 2
+
+
+def cases():
+    """Return {name: callable} for every benchmarked function."""
+    product_id, location_id, midpoint = sample_ids()
+    product_ids = [p for (p,) in db.session.query(Product.id).limit(500)]
+    location_ids = [l for (l,) in db.session.query(Location.id).limit(500)]
+    since = datetime.utcnow() - timedelta(days=30)
+    return {
+        'balance_query': ProductMovement.balance_query,
+        'balance_query_as_of': lambda: ProductMovement.balance_query(as_of=midpoint),
+        'named_balance_query': ProductMovement.named_balance_query,
+        'named_balance_query_product': lambda: ProductMovement.named_balance_query(product_id=product_id),
+        'named_balance_query_location': lambda: ProductMovement.named_balance_query(location_id=location_id),
+        'balance_for': lambda: ProductMovement.balance_for(product_id, location_id),
+        'balances_for_product': lambda: ProductMovement.balances_for_product(product_id),
+        'ledger_balance_query_30d': lambda: ProductMovement.ledger_balance_query(since=since),
+        'stock_info': lambda: get_current_stock(product_id, location_id),
+        'stock_slice_location': lambda: StockBalance.slice_page(location_id=location_id),
+        'stock_slice_product': lambda: StockBalance.slice_page(product_id=product_id),
+        'stock_totals_location': lambda: StockBalance.slice_totals(location_id=location_id),
+        'recent_movements_location': lambda: ProductMovement.recent(location_id=location_id),
+        'recent_movements_product': lambda: ProductMovement.recent(product_id=product_id),
+        'alert_evaluate_movement': lambda: StockAlert.evaluate(db.session.connection(), [(product_id, location_id)]),
+        'alerts_page': StockAlert.page,
+        'product_name_map_500': lambda: Product.name_map(product_ids),
+        'location_name_map_500': lambda: Location.name_map(location_ids),
+        'movements_first_page': lambda: paginate_movements(filter_movements(), None, 50),
+        'movements_product_page': lambda: paginate_movements(filter_movements(product_id=product_id), None, 50),
+        'movements_location_page': lambda: paginate_movements(filter_movements(location_id=location_id), None, 50),
+        'movement_trends_7d_day': lambda: get_movement_trends('7d', 'day'),
+        'movement_trends_30d_day': lambda: get_movement_trends('30d', 'day'),
+        'movement_trends_1y_month': lambda: get_movement_trends('1y', 'month'),
+        'balance_report': build_balance_report,
+        'balance_report_as_of': lambda: build_balance_report(midpoint),
+        'comprehensive_chart_data': build_comprehensive_chart_data,
+        'chart_data_payload': build_chart_data_payload,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='Existing generated SQLite database; omit to generate a scratch one.')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--locations', type=int, default=50)
+    parser.add_argument('--movements', type=int, default=200000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('-k', dest='select', help='Only run benchmarks whose name contains this text.')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    if args.db:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.db)}', 'REPORT_CACHE_TTL': 0})
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'micro.db')
+        app = create_database(path, args.products, args.locations, args.movements)
+
+    results = {}
+    with app.test_request_context():
+        counts = {
+            'products': Product.query.count(),
+            'locations': Location.query.count(),
+            'movements': ProductMovement.query.count(),
+        }
+        for name, fn in cases().items():
+            if args.select and args.select not in name:
+                continue
+            results[name] = stats = benchmark(fn, args.rounds)
+            db.session.rollback()
+            print(f'{name:32} p50 {stats["p50_ms"]:10.3f} ms  p95 {stats["p95_ms"]:10.3f} ms  '
+                  f'{stats["ops_per_second"]:10.1f} ops/s')
+
+    if args.output:
+        write_results(args.output, 'micro', {**counts, 'rounds': args.rounds, 'database': args.db}, results)
+
+
+if __name__ == '__main__':
+    main()
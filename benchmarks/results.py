@@ -0,0 +1,39 @@
+"""Shared helpers for writing benchmark results as comparable JSON files."""
+
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (None when empty)."""
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def write_results(path, kind, parameters, results):
+    """Write results with the commit, host and parameters they were measured under."""
+    document = {
+        'kind': kind,
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'results': results,
+    }
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2)
+    print(f'Wrote {path}')
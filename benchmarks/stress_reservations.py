@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Concurrent oversell stress test
+Starts several threads that hammer the movement-writing routes with removals,
+transfers and movement deletes against a small amount of stock, then checks
+that no balance went negative and that stock_balances still matches the ledger.
+
+    python -m benchmarks.stress_reservations --threads 8 --requests 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from app.models import Product, Location, ProductMovement, StockBalance, InventoryCounter
+
+
+def worker(app, seed, requests, products, locations, max_movement_id, outcomes, lock):
+    rng = random.Random(seed)
+    client = app.test_client()
+    for _ in range(requests):
+        product_id = rng.choice(products)
+        source = rng.choice(locations)
+        qty = rng.randint(1, 5)
+        roll = rng.random()
+        if roll < 0.2:
+            # Delete a movement; reversing it debits its destination
+            response = client.post(f'/movements/{rng.randint(1, max_movement_id)}/delete')
+            with client.session_transaction() as session:
+                refused = any(category == 'error' for category, _ in session.pop('_flashes', []))
+            outcome = ('missing' if response.status_code == 404 else 'error' if response.status_code != 302
+                       else 'refused' if refused else 'deleted')
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            continue
+        if roll < 0.6:
+            # Transfer or removal through the movement form
+            destination = rng.choice([None, *locations])
+            response = client.post('/movements/create', data={
+                'product_id': product_id,
+                'from_location_id': source,
+                'to_location_id': destination or '',
+                'qty': str(qty),
+            })
+        else:
+            # Removal through the product edit form
+            response = client.post(f'/products/{product_id}/edit', data={
+                'name': product_id,
+                'stock_action': 'remove',
+                'stock_quantity': str(qty),
+                'stock_location': source,
+            })
+        outcome = 'recorded' if response.status_code == 302 else 'rejected' if response.status_code == 200 else 'error'
+        with lock:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+    parser.add_argument('--stock', type=int, default=50, help='Initial units per product/location.')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'REPORT_CACHE_TTL': 0, 'JOBS_ENABLED': False})
+    products = [f'P-{i}' for i in range(3)]
+    locations = [f'L-{i}' for i in range(3)]
+    with app.app_context():
+        db.create_all()
+        InventoryCounter.reconcile()
+        db.session.add_all([Product(id=p, name=p) for p in products] + [Location(id=l, name=l) for l in locations])
+        db.session.add_all([
+            ProductMovement(product_id=p, to_location_id=l, qty=args.stock)
+            for p in products for l in locations
+        ])
+        db.session.commit()
+    # Deletes pick from the seeded movements and those the run may record
+    max_movement_id = len(products) * len(locations) + args.threads * args.requests
+
+    outcomes, lock = {}, threading.Lock()
+    threads = [
+        threading.Thread(target=worker, args=(app, i, args.requests, products, locations, max_movement_id, outcomes, lock))
+        for i in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f'{args.threads * args.requests} requests in {elapsed:.1f}s: {outcomes}')
+
+    with app.app_context():
+        negative = StockBalance.query.filter(StockBalance.qty < 0).all()
+        ledger_negative = [r for r in ProductMovement.ledger_balance_query() if r['qty'] < 0]
+        mismatches = StockBalance.verify()
+        counters, actual = InventoryCounter.counts(), InventoryCounter.actual()
+    failed = False
+    if negative or ledger_negative:
+        print(f'!! negative balances: {negative or ledger_negative}')
+        failed = True
+    if mismatches:
+        print(f'!! stock_balances differs from the ledger: {mismatches}')
+        failed = True
+    if counters != actual:
+        print(f'!! counters {counters} differ from the tables {actual}')
+        failed = True
+    if outcomes.get('error'):
+        print(f'!! {outcomes["error"]} requests failed')
+        failed = True
+    if failed:
+        sys.exit(1)
+    print('No negative balances; stock_balances and the counters match the tables.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""gunicorn settings: ``gunicorn -c gunicorn.conf.py run:app``
+
+WEB_CONCURRENCY sets worker processes and WEB_THREADS threads per worker.
+With SQLite keep workers low and add threads; WAL mode lets readers run
+alongside the single writer. Live-update streams are capped at half of each
+worker's threads unless EVENTS_MAX_STREAMS is set.
+"""
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 4)))
+threads = int(os.environ.get('WEB_THREADS', 4))
+# Each /events stream holds a thread; keep the rest for ordinary requests
+os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(threads // 2, 1)))
+worker_class = 'gthread'
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+accesslog = '-'
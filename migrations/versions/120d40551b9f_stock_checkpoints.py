@@ -0,0 +1,44 @@
+"""stock checkpoints
+
+Revision ID: 120d40551b9f
+Revises: 1df950052997
+Create Date: 2026-10-18 15:51:13.530107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '120d40551b9f'
+down_revision = '1df950052997'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_checkpoints',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('cutoff', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stock_checkpoints', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_checkpoints_cutoff'), ['cutoff'], unique=True)
+
+    op.create_table('stock_checkpoint_balances',
+        sa.Column('checkpoint_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.String(length=40), nullable=False),
+        sa.Column('location_id', sa.String(length=40), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['checkpoint_id'], ['stock_checkpoints.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('checkpoint_id', 'product_id', 'location_id')
+    )
+
+
+def downgrade():
+    op.drop_table('stock_checkpoint_balances')
+    with op.batch_alter_table('stock_checkpoints', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stock_checkpoints_cutoff'))
+
+    op.drop_table('stock_checkpoints')
@@ -0,0 +1,53 @@
+"""daily movement stats
+
+Revision ID: 1df950052997
+Revises: 8dd76632c0cf
+Create Date: 2026-10-18 15:49:20.308574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1df950052997'
+down_revision = '8dd76632c0cf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_movement_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.String(length=40), nullable=False),
+        sa.Column('location_id', sa.String(length=40), nullable=False),
+        sa.Column('in_qty', sa.Integer(), nullable=False),
+        sa.Column('out_qty', sa.Integer(), nullable=False),
+        sa.Column('movement_count', sa.Integer(), nullable=False),
+        sa.Column('moved_qty', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['locations.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('day', 'product_id', 'location_id')
+    )
+    # Backfill from the existing ledger
+    op.execute("""
+        INSERT INTO daily_movement_stats
+            (day, product_id, location_id, in_qty, out_qty, movement_count, moved_qty)
+        SELECT day, product_id, location_id, SUM(in_qty), SUM(out_qty), SUM(movement_count), SUM(moved_qty)
+        FROM (
+            SELECT date(timestamp) AS day, product_id, to_location_id AS location_id,
+                   qty AS in_qty, 0 AS out_qty, 1 AS movement_count, qty AS moved_qty
+            FROM product_movements WHERE to_location_id IS NOT NULL
+            UNION ALL
+            SELECT date(timestamp) AS day, product_id, from_location_id AS location_id,
+                   0 AS in_qty, qty AS out_qty,
+                   CASE WHEN to_location_id IS NULL THEN 1 ELSE 0 END AS movement_count,
+                   CASE WHEN to_location_id IS NULL THEN qty ELSE 0 END AS moved_qty
+            FROM product_movements WHERE from_location_id IS NOT NULL
+        ) AS deltas
+        GROUP BY day, product_id, location_id
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_movement_stats')
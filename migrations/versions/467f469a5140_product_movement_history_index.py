@@ -0,0 +1,26 @@
+"""product movement history index
+
+Revision ID: 467f469a5140
+Revises: 476b69c0d807
+Create Date: 2026-10-18 16:20:16.680174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '467f469a5140'
+down_revision = '476b69c0d807'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product_movements', schema=None) as batch_op:
+        batch_op.create_index('ix_product_movements_product_timestamp', ['product_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product_movements', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_movements_product_timestamp')
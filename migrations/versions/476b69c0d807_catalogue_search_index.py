@@ -0,0 +1,57 @@
+"""catalogue search index
+
+Revision ID: 476b69c0d807
+Revises: c7ac110afcca
+Create Date: 2026-10-18 16:17:36.016257
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '476b69c0d807'
+down_revision = 'c7ac110afcca'
+branch_labels = None
+depends_on = None
+
+
+# table -> indexed columns, as in app/search.py
+INDEXED_COLUMNS = {
+    'products': ('id', 'name', 'description'),
+    'locations': ('id', 'name'),
+}
+
+
+def upgrade():
+    # SQLite only: FTS5 trigram indexes kept in sync by triggers. Other
+    # backends (and SQLite builds without FTS5) use the LIKE fallback.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+        return
+    for table, columns in INDEXED_COLUMNS.items():
+        fts = f'{table}_fts'
+        names = ', '.join(columns)
+        new = ', '.join(f'new.{c}' for c in columns)
+        old = ', '.join(f'old.{c}' for c in columns)
+        op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, "
+                   f"content='{table}', content_rowid='rowid', tokenize='trigram')")
+        op.execute(f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+                   f"INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new}); END")
+        op.execute(f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old}); END")
+        op.execute(f"CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN "
+                   f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old}); "
+                   f"INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new}); END")
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in INDEXED_COLUMNS:
+        for suffix in ('insert', 'delete', 'update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+        op.execute(f'DROP TABLE IF EXISTS {table}_fts')
@@ -0,0 +1,54 @@
+"""add jobs and report snapshots
+
+Revision ID: 4a78bfe6e313
+Revises: 120d40551b9f
+Create Date: 2026-10-18 16:02:23.749873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a78bfe6e313'
+down_revision = '120d40551b9f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('params', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_kind_status', ['kind', 'status'], unique=False)
+
+    op.create_table('report_snapshots',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('report_snapshots', schema=None) as batch_op:
+        batch_op.create_index('ix_report_snapshots_key', ['key', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report_snapshots', schema=None) as batch_op:
+        batch_op.drop_index('ix_report_snapshots_key')
+
+    op.drop_table('report_snapshots')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_kind_status')
+
+    op.drop_table('jobs')
@@ -0,0 +1,35 @@
+"""inventory counters
+
+Revision ID: 5baae6c368a2
+Revises: 4a78bfe6e313
+Create Date: 2026-10-18 16:08:00.808344
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5baae6c368a2'
+down_revision = '4a78bfe6e313'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('inventory_counters',
+        sa.Column('name', sa.String(length=40), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("""
+        INSERT INTO inventory_counters (name, value)
+        SELECT 'products', COUNT(*) FROM products
+        UNION ALL SELECT 'locations', COUNT(*) FROM locations
+        UNION ALL SELECT 'movements', COUNT(*) FROM product_movements
+        UNION ALL SELECT 'active_balances', COUNT(*) FROM stock_balances WHERE qty > 0
+    """)
+
+
+def downgrade():
+    op.drop_table('inventory_counters')
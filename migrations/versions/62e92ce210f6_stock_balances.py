@@ -0,0 +1,44 @@
+"""stock balances
+
+Revision ID: 62e92ce210f6
+Revises: c649a308a985
+Create Date: 2026-10-18 15:42:35.207195
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '62e92ce210f6'
+down_revision = 'c649a308a985'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_balances',
+        sa.Column('product_id', sa.String(length=40), nullable=False),
+        sa.Column('location_id', sa.String(length=40), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['locations.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.PrimaryKeyConstraint('product_id', 'location_id')
+    )
+    # Backfill from the existing ledger
+    op.execute("""
+        INSERT INTO stock_balances (product_id, location_id, qty)
+        SELECT product_id, location_id, SUM(delta) FROM (
+            SELECT product_id, to_location_id AS location_id, qty AS delta
+            FROM product_movements WHERE to_location_id IS NOT NULL
+            UNION ALL
+            SELECT product_id, from_location_id AS location_id, -qty AS delta
+            FROM product_movements WHERE from_location_id IS NOT NULL
+        ) AS deltas
+        GROUP BY product_id, location_id
+        HAVING SUM(delta) != 0
+    """)
+
+
+def downgrade():
+    op.drop_table('stock_balances')
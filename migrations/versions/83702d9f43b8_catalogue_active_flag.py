@@ -0,0 +1,36 @@
+"""catalogue active flag
+
+Revision ID: 83702d9f43b8
+Revises: 467f469a5140
+Create Date: 2026-10-18 16:22:11.225830
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import install_all
+
+
+# revision identifiers, used by Alembic.
+revision = '83702d9f43b8'
+down_revision = '467f469a5140'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN: on SQLite batch_alter_table would recreate both tables
+    # and drop the search index triggers with them.
+    op.add_column('locations', sa.Column('active', sa.Boolean(), server_default=sa.text('1'), nullable=False))
+    op.add_column('products', sa.Column('active', sa.Boolean(), server_default=sa.text('1'), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('active')
+
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.drop_column('active')
+
+    # The recreate above dropped the search triggers and may have renumbered rowids
+    install_all(op.get_bind())
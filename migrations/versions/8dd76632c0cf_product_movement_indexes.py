@@ -0,0 +1,40 @@
+"""product movement indexes
+
+Revision ID: 8dd76632c0cf
+Revises: 62e92ce210f6
+Create Date: 2026-10-18 15:42:36.501091
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8dd76632c0cf'
+down_revision = '62e92ce210f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product_movements', schema=None) as batch_op:
+        batch_op.create_index('ix_product_movements_product_to', ['product_id', 'to_location_id', 'qty'], unique=False)
+        batch_op.create_index('ix_product_movements_product_from', ['product_id', 'from_location_id', 'qty'], unique=False)
+        batch_op.create_index('ix_product_movements_to_location', ['to_location_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_product_movements_from_location', ['from_location_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_product_movements_timestamp', ['timestamp', 'id'], unique=False)
+
+    with op.batch_alter_table('stock_balances', schema=None) as batch_op:
+        batch_op.create_index('ix_stock_balances_location', ['location_id', 'product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stock_balances', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_balances_location')
+
+    with op.batch_alter_table('product_movements', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_movements_timestamp')
+        batch_op.drop_index('ix_product_movements_from_location')
+        batch_op.drop_index('ix_product_movements_to_location')
+        batch_op.drop_index('ix_product_movements_product_from')
+        batch_op.drop_index('ix_product_movements_product_to')
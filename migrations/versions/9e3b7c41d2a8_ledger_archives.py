@@ -0,0 +1,37 @@
+"""ledger archives
+
+Revision ID: 9e3b7c41d2a8
+Revises: d523530cbccf
+Create Date: 2026-10-18 17:20:41.508713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b7c41d2a8'
+down_revision = 'd523530cbccf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ledger_archives',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('cutoff', sa.DateTime(), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('archived', sa.Integer(), nullable=False),
+        sa.Column('openings', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ledger_archives', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ledger_archives_cutoff'), ['cutoff'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ledger_archives', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ledger_archives_cutoff'))
+
+    op.drop_table('ledger_archives')
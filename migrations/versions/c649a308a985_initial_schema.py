@@ -0,0 +1,50 @@
+"""initial schema
+
+Revision ID: c649a308a985
+Revises: 
+Create Date: 2026-10-18 15:42:32.416287
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c649a308a985'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('products',
+        sa.Column('id', sa.String(length=40), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('locations',
+        sa.Column('id', sa.String(length=40), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table('product_movements',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('from_location_id', sa.String(length=40), nullable=True),
+        sa.Column('to_location_id', sa.String(length=40), nullable=True),
+        sa.Column('product_id', sa.String(length=40), nullable=False),
+        sa.Column('qty', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['from_location_id'], ['locations.id']),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+        sa.ForeignKeyConstraint(['to_location_id'], ['locations.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('product_movements')
+    op.drop_table('locations')
+    op.drop_table('products')
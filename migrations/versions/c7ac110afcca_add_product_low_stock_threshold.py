@@ -0,0 +1,26 @@
+"""add product low stock threshold
+
+Revision ID: c7ac110afcca
+Revises: 5baae6c368a2
+Create Date: 2026-10-18 16:11:21.245034
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7ac110afcca'
+down_revision = '5baae6c368a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('low_stock_threshold', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('low_stock_threshold')
@@ -0,0 +1,54 @@
+"""reorder thresholds and stock alerts
+
+Revision ID: d523530cbccf
+Revises: 83702d9f43b8
+Create Date: 2026-10-18 16:27:53.920042
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd523530cbccf'
+down_revision = '83702d9f43b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reorder_thresholds',
+    sa.Column('product_id', sa.String(length=40), nullable=False),
+    sa.Column('location_id', sa.String(length=40), nullable=False),
+    sa.Column('threshold', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'location_id')
+    )
+    with op.batch_alter_table('reorder_thresholds', schema=None) as batch_op:
+        batch_op.create_index('ix_reorder_thresholds_location', ['location_id', 'product_id'], unique=False)
+
+    op.create_table('stock_alerts',
+    sa.Column('product_id', sa.String(length=40), nullable=False),
+    sa.Column('location_id', sa.String(length=40), nullable=False),
+    sa.Column('qty', sa.Integer(), nullable=False),
+    sa.Column('threshold', sa.Integer(), nullable=False),
+    sa.Column('opened_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'location_id')
+    )
+    with op.batch_alter_table('stock_alerts', schema=None) as batch_op:
+        batch_op.create_index('ix_stock_alerts_location', ['location_id', 'product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stock_alerts', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_alerts_location')
+
+    op.drop_table('stock_alerts')
+    with op.batch_alter_table('reorder_thresholds', schema=None) as batch_op:
+        batch_op.drop_index('ix_reorder_thresholds_location')
+
+    op.drop_table('reorder_thresholds')
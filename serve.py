@@ -0,0 +1,26 @@
+"""Production server entry point (waitress, works on Windows and Linux).
+
+    python serve.py
+
+Configured through the environment: HOST (default 0.0.0.0), PORT (5000) and
+SERVER_THREADS (8). Live-update streams are capped at half the threads unless
+EVENTS_MAX_STREAMS is set. On Linux, gunicorn can serve the same app with
+``gunicorn -c gunicorn.conf.py run:app``.
+"""
+import os
+from waitress import serve
+from app import create_app
+
+THREADS = int(os.environ.get('SERVER_THREADS', 8))
+# Each /events stream holds a thread; keep the rest for ordinary requests
+os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(THREADS // 2, 1)))
+
+app = create_app()
+
+if __name__ == '__main__':
+    serve(
+        app,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 5000)),
+        threads=THREADS,
+    )
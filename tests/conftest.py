@@ -0,0 +1,57 @@
+import pytest
+from app import create_app, db
+from app.models import Product, Location, StockBalance, InventoryCounter, DailyMovementStat
+
+
+@pytest.fixture
+def app(tmp_path):
+	app = create_app({
+		'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+		'TESTING': True,
+		'JOBS_ENABLED': False,
+		'REPORT_CACHE_TTL': 0,
+		'METRICS_ENABLED': False,
+	})
+	with app.app_context():
+		db.create_all()
+		db.session.add_all([Product(id=p, name=f'Product {p}') for p in ('P1', 'P2')])
+		db.session.add_all([Location(id=l, name=f'Location {l}') for l in ('L1', 'L2')])
+		db.session.commit()
+		yield app
+		db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+	return app.test_client()
+
+
+@pytest.fixture
+def flashes():
+	"""Pop the (category, message) pairs flashed to a test client's session."""
+	def pop(client):
+		with client.session_transaction() as session:
+			return session.pop('_flashes', [])
+	return pop
+
+
+def _rollup_rows():
+	return sorted((r.day, r.product_id, r.location_id, r.in_qty, r.out_qty, r.movement_count, r.moved_qty)
+				  for r in DailyMovementStat.query)
+
+
+@pytest.fixture
+def assert_consistent(app):
+	"""Check that stock_balances, the counters and the daily rollup all match
+	the movement ledger."""
+	def check():
+		db.session.expire_all()
+		assert StockBalance.verify() == []
+		assert StockBalance.query.filter(StockBalance.qty < 0).count() == 0
+		assert InventoryCounter.counts() == InventoryCounter.actual()
+		maintained = _rollup_rows()
+		DailyMovementStat.rebuild()
+		rebuilt = _rollup_rows()
+		db.session.rollback()
+		assert maintained == rebuilt
+	return check
@@ -0,0 +1,45 @@
+import io
+import json
+from app import db
+from app.importer import import_movements
+from app.models import Product, Location, ProductMovement, Job
+
+
+def test_import_keeps_balances_counters_and_rollup(app, assert_consistent):
+	rows = '\n'.join([
+		'product_id,from_location_id,to_location_id,qty,timestamp',
+		'P1,,L1,10,2025-01-01T09:00:00',
+		'P1,L1,L2,4,2025-01-02T09:00:00',
+		'P2,,L2,7,2025-01-02T10:00:00',
+		'P2,L2,,9,2025-01-03T10:00:00',  # more than L2 holds: rejected
+	])
+	result = import_movements(io.StringIO(rows), batch_size=2)
+	assert (result['imported'], result['error_count']) == (3, 1)
+	assert ProductMovement.query.count() == 3
+	assert_consistent()
+
+
+def test_import_queues_a_snapshot_refresh(app):
+	app.config['JOBS_ENABLED'] = True
+	import_movements(io.StringIO(json.dumps({'product_id': 'P1', 'to_location_id': 'L1', 'qty': 1})), 'jsonl')
+	assert Job.query.filter_by(kind='report_snapshots').count() == 1
+
+
+def test_catalogue_deletes_keep_balances_counters_and_rollup(client, assert_consistent):
+	for form in (
+		{'product_id': 'P1', 'to_location_id': 'L1', 'qty': '10'},
+		{'product_id': 'P2', 'to_location_id': 'L1', 'qty': '5'},
+		{'product_id': 'P1', 'from_location_id': 'L1', 'to_location_id': 'L2', 'qty': '3'},
+		{'product_id': 'P2', 'from_location_id': 'L1', 'to_location_id': 'L2', 'qty': '2'},
+	):
+		assert client.post('/movements/create', data=form).status_code == 302
+
+	assert client.post('/products/P2/delete').status_code == 302
+	assert db.session.get(Product, 'P2') is None
+	assert_consistent()
+
+	# The transfer out of L1 becomes a receipt into L2
+	assert client.post('/locations/L1/delete').status_code == 302
+	assert db.session.get(Location, 'L1') is None
+	assert [(m.from_location_id, m.to_location_id, m.qty) for m in ProductMovement.query] == [(None, 'L2', 3)]
+	assert_consistent()
@@ -0,0 +1,50 @@
+from datetime import datetime
+from app import db
+from app.archive import archive_movements
+from app.models import ProductMovement, StockBalance
+
+
+def record(client, **form):
+	form.setdefault('from_location_id', '')
+	form.setdefault('to_location_id', '')
+	response = client.post('/movements/create', data={key: str(value) for key, value in form.items()})
+	assert response.status_code == 302
+	return db.session.query(db.func.max(ProductMovement.id)).scalar()
+
+
+def balances():
+	db.session.expire_all()
+	return {(b.product_id, b.location_id): b.qty for b in StockBalance.query}
+
+
+def test_delete_reverses_the_movement(client, assert_consistent):
+	record(client, product_id='P1', to_location_id='L1', qty=10)
+	transfer = record(client, product_id='P1', from_location_id='L1', to_location_id='L2', qty=4)
+	assert client.post(f'/movements/{transfer}/delete').status_code == 302
+	assert balances() == {('P1', 'L1'): 10}
+	assert_consistent()
+
+
+def test_delete_that_would_go_negative_is_refused(client, flashes, assert_consistent):
+	receipt = record(client, product_id='P1', to_location_id='L1', qty=10)
+	record(client, product_id='P1', from_location_id='L1', to_location_id='L2', qty=8)
+	flashes(client)
+	assert client.post(f'/movements/{receipt}/delete').status_code == 302
+	assert any(category == 'error' for category, _ in flashes(client))
+	assert balances() == {('P1', 'L1'): 2, ('P1', 'L2'): 8}
+	assert db.session.get(ProductMovement, receipt) is not None
+	assert_consistent()
+
+
+def test_delete_missing_movement_is_404(client):
+	assert client.post('/movements/999/delete').status_code == 404
+
+
+def test_archive_openings_cannot_be_deleted(client, tmp_path, assert_consistent):
+	db.session.add(ProductMovement(product_id='P1', to_location_id='L2', qty=3, timestamp=datetime(2024, 1, 10)))
+	db.session.commit()
+	archive_movements(datetime(2024, 2, 1), str(tmp_path / 'archive.jsonl.gz'))
+	opening = ProductMovement.query.one()
+	assert opening.id > 1  # archived ids are not reused
+	assert client.post(f'/movements/{opening.id}/delete').status_code == 400
+	assert balances() == {('P1', 'L2'): 3}
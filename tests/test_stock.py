@@ -0,0 +1,62 @@
+import threading
+import pytest
+from app import db
+from app.models import ProductMovement, StockBalance
+from app.stock import InsufficientStock, run_with_retry
+
+
+def receive(product_id, location_id, qty):
+	db.session.add(ProductMovement(product_id=product_id, to_location_id=location_id, qty=qty))
+	db.session.commit()
+
+
+def balance(product_id, location_id):
+	db.session.expire_all()
+	row = db.session.get(StockBalance, (product_id, location_id))
+	return row.qty if row else 0
+
+
+def test_debit_beyond_balance_is_rejected(app, assert_consistent):
+	receive('P1', 'L1', 5)
+	with pytest.raises(InsufficientStock) as exc:
+		run_with_retry(lambda: db.session.add(
+			ProductMovement(product_id='P1', from_location_id='L1', to_location_id='L2', qty=6)))
+	assert (exc.value.available, exc.value.requested) == (5, 6)
+	assert balance('P1', 'L1') == 5
+	assert ProductMovement.query.count() == 1
+	assert_consistent()
+
+
+def test_concurrent_transfers_cannot_oversell(app, assert_consistent):
+	receive('P1', 'L1', 10)
+	outcomes = []
+
+	def transfer():
+		with app.app_context():
+			try:
+				run_with_retry(lambda: db.session.add(
+					ProductMovement(product_id='P1', from_location_id='L1', to_location_id='L2', qty=3)))
+				outcomes.append('moved')
+			except InsufficientStock:
+				outcomes.append('refused')
+			finally:
+				db.session.remove()
+
+	threads = [threading.Thread(target=transfer) for _ in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert outcomes.count('moved') == 3
+	assert balance('P1', 'L1') == 1
+	assert balance('P1', 'L2') == 9
+	assert_consistent()
+
+
+def test_create_form_reports_insufficient_stock(client, app, flashes):
+	receive('P1', 'L1', 2)
+	response = client.post('/movements/create', data={
+		'product_id': 'P1', 'from_location_id': 'L1', 'to_location_id': 'L2', 'qty': '3'})
+	assert response.status_code == 200
+	assert b'Insufficient stock' in response.data
+	assert balance('P1', 'L1') == 2